@@ -0,0 +1,101 @@
+"""
+Benchmarks for the hot task queries under the psycopg 3 binding modes, and for streaming large lists.
+
+Creates a throwaway user with tasks in the configured database, and deletes it afterwards.
+
+Run from the project root: python -m benchmarks.queries [--tasks 20000] [--number 500]
+"""
+import argparse
+import os
+import timeit
+import tracemalloc
+import uuid
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ustudy_test_task.settings')
+django.setup()
+
+from django.db import connections  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from tasks.models import TaskModel  # noqa: E402
+from tasks.serializers import TaskSerializer  # noqa: E402
+from users.models import UserModel  # noqa: E402
+
+# Connection options per mode, on top of the default database's
+MODES = {
+    'client-side binding': {'server_side_binding': False},
+    'server-side, unprepared': {'server_side_binding': True, 'prepare_threshold': None},
+    'server-side, prepared': {'server_side_binding': True, 'prepare_threshold': 0},
+}
+
+
+def add_alias(alias, options):
+    settings_dict = dict(connections['default'].settings_dict)
+    settings_dict['OPTIONS'] = {
+        **{key: value for key, value in settings_dict['OPTIONS'].items() if key != 'pool'},
+        **options,
+    }
+    connections.settings[alias] = settings_dict
+    return alias
+
+
+def hot_queries(alias, user, pk, year):
+    start = timezone.now().replace(year=year, month=3, day=1, hour=0, minute=0, second=0, microsecond=0)
+    tasks = TaskModel.objects.using(alias)
+    return {
+        # TaskDetailView and cache misses
+        'task by pk+user': lambda: list(tasks.filter(user=user, pk__in=[pk])),
+        # TaskListView with ?status=&year=&month=&day=
+        'list by user+filters': lambda: list(tasks.filter(user=user, status='new',
+                                                         deadline__range=[start, start + timedelta(days=1)])),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--tasks', type=int, default=20000)
+    parser.add_argument('--number', type=int, default=500)
+    args = parser.parse_args()
+
+    user = UserModel.objects.create_user(username=f'benchmark-{uuid.uuid4().hex[:8]}', password=uuid.uuid4().hex)
+    try:
+        now = timezone.now()
+        # Server-side binding allows at most 65535 parameters per statement
+        TaskModel.objects.bulk_create((
+            TaskModel(user=user, title=f'Task {i}', description='Lorem ipsum dolor sit amet ' * 4,
+                      status=('new', 'in_progress', 'completed')[i % 3], deadline=now + timedelta(days=i % 730))
+            for i in range(args.tasks)
+        ), batch_size=1000)
+        pk = TaskModel.objects.filter(user=user).values_list('pk', flat=True).first()
+
+        print(f'{"query":<22} {"mode":<26} {"us/query":>9} {"speedup":>8}')
+        baselines = {}
+        for index, (mode, options) in enumerate(MODES.items()):
+            alias = add_alias(f'benchmark_{index}', options)
+            for name, query in hot_queries(alias, user, pk, now.year + 1).items():
+                query()
+                seconds = min(timeit.repeat(query, number=args.number, repeat=3)) / args.number
+                baselines.setdefault(name, seconds)
+                print(f'{name:<22} {mode:<26} {seconds * 1_000_000:>9.0f} {baselines[name] / seconds:>7.2f}x')
+            connections[alias].close()
+
+        print(f'\n{"serialize all tasks":<26} {"ms":>8} {"peak MB":>8}')
+        tasks = TaskModel.objects.filter(user=user)
+        for name, rows in (('fetch all rows', lambda: tasks), ('named cursor, 2000/chunk',
+                                                               lambda: tasks.iterator(chunk_size=2000))):
+            tracemalloc.start()
+            started = timeit.default_timer()
+            TaskSerializer(rows(), many=True).data
+            elapsed = timeit.default_timer() - started
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{name:<26} {elapsed * 1000:>8.0f} {peak / 1_000_000:>8.1f}')
+    finally:
+        user.delete()
+
+
+if __name__ == '__main__':
+    main()
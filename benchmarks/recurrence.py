@@ -0,0 +1,70 @@
+"""
+Benchmark expanding recurring tasks: a year of daily occurrences for every user, compared with storing them as rows.
+
+Creates throwaway users with a daily recurring task each in the configured database, and deletes them afterwards.
+
+Run from the project root: python -m benchmarks.recurrence [--users 10000] [--sample 200]
+"""
+import argparse
+import os
+import statistics
+import timeit
+import uuid
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ustudy_test_task.settings')
+django.setup()
+
+from django.contrib.auth.hashers import make_password  # noqa: E402
+from django.utils import timezone  # noqa: E402
+
+from tasks import recurrence  # noqa: E402
+from tasks.models import TaskModel  # noqa: E402
+from users.models import UserModel  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--sample', type=int, default=200, help='Users whose year is listed through the API path')
+    args = parser.parse_args()
+
+    prefix = f'benchmark-{uuid.uuid4().hex[:8]}'
+    password = make_password(None)
+    start = timezone.now().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+    end = start.replace(year=start.year + 1)
+    users = UserModel.objects.bulk_create(
+        (UserModel(username=f'{prefix}-{i}', password=password) for i in range(args.users)), batch_size=1000,
+    )
+    try:
+        TaskModel.objects.bulk_create((
+            TaskModel(user=user, title='Standup', recurrence='RRULE:FREQ=DAILY', deadline=start + timedelta(hours=9))
+            for user in users
+        ), batch_size=1000)
+        series = list(TaskModel.objects.filter(user__in=users))
+
+        started = timeit.default_timer()
+        expanded = sum(len(recurrence.occurrences(task, start, end)) for task in series)
+        elapsed = timeit.default_timer() - started
+        print(f'Expanded {expanded} occurrences of {len(series)} daily tasks for a year in {elapsed:.1f}s, '
+              f'{elapsed / len(series) * 1000:.2f}ms per user')
+
+        # What TaskListView does for ?year=, including the query for changed occurrences and serialization
+        timings = []
+        for task in series[:args.sample]:
+            user_series = TaskModel.objects.filter(user_id=task.user_id, deadline__lte=end).exclude(recurrence='')
+            started = timeit.default_timer()
+            recurrence.expand(user_series, start, end)
+            timings.append(timeit.default_timer() - started)
+        print(f'Listing a year per user: median {statistics.median(timings) * 1000:.1f}ms, '
+              f'max {max(timings) * 1000:.1f}ms over {len(timings)} users')
+
+        print(f'Rows stored: {len(series)} instead of {expanded} with materialized occurrences')
+    finally:
+        UserModel.objects.filter(username__startswith=f'{prefix}-').delete()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Microbenchmarks for the API renderers on task list payloads.
+
+Run from the project root: python -m benchmarks.renderers [--sizes 1000,10000,100000]
+"""
+import argparse
+import os
+import timeit
+from datetime import timedelta
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ustudy_test_task.settings')
+django.setup()
+
+from django.utils import timezone  # noqa: E402
+from rest_framework.response import Response  # noqa: E402
+
+from tasks.models import TaskModel  # noqa: E402
+from tasks.serializers import TaskSerializer  # noqa: E402
+from ustudy_test_task.renderers import ApiRenderer, MessagePackApiRenderer, OrjsonApiRenderer  # noqa: E402
+
+RENDERERS = (ApiRenderer, OrjsonApiRenderer, MessagePackApiRenderer)
+
+
+def task_payload(size):
+    """Serialized tasks as TaskListView returns them, built without touching the database."""
+    now = timezone.now()
+    tasks = [
+        TaskModel(id=pk, user_id=pk % 100 + 1, title=f'Task {pk}', description='Lorem ipsum dolor sit amet ' * 4,
+                  status='in_progress', priority='medium', deadline=now + timedelta(days=pk % 365),
+                  created_at=now, updated_at=now)
+        for pk in range(1, size + 1)
+    ]
+    return TaskSerializer(tasks, many=True).data
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', default='1000,10000,100000')
+    args = parser.parse_args()
+
+    context = {'response': Response(status=200)}
+    print(f'{"tasks":>8} {"renderer":<24} {"ms/render":>10} {"MB":>8} {"speedup":>8}')
+    for size in map(int, args.sizes.split(',')):
+        data = task_payload(size)
+        number = max(1, 100000 // size)
+        baseline = None
+        for renderer_class in RENDERERS:
+            renderer = renderer_class()
+            body = renderer.render(data, renderer_context=context)
+            seconds = min(timeit.repeat(lambda: renderer.render(data, renderer_context=context),
+                                        number=number, repeat=5)) / number
+            baseline = baseline or seconds
+            print(f'{size:>8} {renderer_class.__name__:<24} {seconds * 1000:>10.2f} '
+                  f'{len(body) / 1_000_000:>8.2f} {baseline / seconds:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
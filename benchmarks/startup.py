@@ -0,0 +1,63 @@
+"""
+Import-time report of a worker's cold start: Django setup and the URLconf, which imports every view.
+
+Run from the project root: python -m benchmarks.startup [--top 25]
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+# What a web worker imports before serving its first request
+STARTUP_CODE = """
+import os
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ustudy_test_task.settings')
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+"""
+
+
+def measure_startup(*flags, code=STARTUP_CODE):
+    """Run the startup in a fresh interpreter, returning its wall time in seconds and its stderr."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, *flags, '-c', code], capture_output=True, text=True, check=True,
+                            env={**os.environ, 'PYTHONDONTWRITEBYTECODE': '1'})
+    return time.perf_counter() - started, result.stderr
+
+
+def import_times(stderr):
+    """Parse `-X importtime` output into (self us, cumulative us, nesting depth, module) tuples."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line.removeprefix('import time:').split('|')
+        imports.append((int(own), int(cumulative), (len(name) - len(name.lstrip()) - 1) // 2, name.strip()))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+
+    wall = min(measure_startup()[0] for _ in range(3))
+    _, stderr = measure_startup('-X', 'importtime')
+    imports = import_times(stderr)
+    print(f'Startup: {wall * 1000:.0f}ms wall, {len(imports)} modules imported\n')
+
+    print(f'{"cumulative ms":>13}  top-level import')
+    top_level = sorted((entry for entry in imports if entry[2] == 0), key=lambda entry: -entry[1])
+    for _, cumulative, _, name in top_level[:args.top]:
+        print(f'{cumulative / 1000:>13.1f}  {name}')
+
+    print(f'\n{"self ms":>13}  module')
+    for own, _, _, name in sorted(imports, key=lambda entry: -entry[0])[:args.top]:
+        print(f'{own / 1000:>13.1f}  {name}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import gc
+import os
+
+bind = '0.0.0.0:8000'
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Import the app once in the master instead of in every worker, so workers start in milliseconds and share the
+# imported modules' memory with the master until they write to it
+preload_app = os.getenv('GUNICORN_PRELOAD_APP', 'True') == 'True'
+
+if preload_app:
+    # Garbage collections in the master would leave freed holes in pages the workers share
+    gc.disable()
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far to a permanent generation that collections in the workers never touch, as
+    # updating their GC headers would copy the pages
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    gc.enable()
+
+
+def when_ready(server):
+    if preload_app:
+        # Django imports the URLconf, and with it every view, on the first request. Do it once before forking.
+        from django.urls import get_resolver
+        get_resolver().url_patterns
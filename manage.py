@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ustudy_test_task.settings')
+    # Tests add a stand-in read replica, see ustudy_test_task/test_settings.py
+    settings_module = 'ustudy_test_task.test_settings' if sys.argv[1:2] == ['test'] else 'ustudy_test_task.settings'
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
@@ -1,11 +1,15 @@
+import io
 import os
+import re
 from datetime import datetime
+from pathlib import Path
 import time
 from click import style
 from invoke import task
 from rich.console import Console
 from rich.style import Style
 from rich.panel import Panel
+from rich.progress import BarColumn, MofNCompleteColumn, Progress, TextColumn, TimeElapsedColumn
 from rich.text import Text
 from dotenv import load_dotenv
 
@@ -128,6 +132,9 @@ def prepare(c):
     with console.status("[bold green]Collecting static files..."):
         c.run(f'docker exec -i {os.getenv("WEB_CONTAINER_NAME")} python manage.py collectstatic --noinput')
     console.print("Static files collected.", style=success_style)
+    with console.status("[bold green]Rebuilding the username filter..."):
+        c.run(f'docker exec -i {os.getenv("WEB_CONTAINER_NAME")} python manage.py rebuild_username_filter')
+    console.print("Username filter rebuilt.", style=success_style)
     print_footer("Application prepared.")
 
 
@@ -191,55 +198,175 @@ def logs(c, tail=10, follow=True, container=None):
     c.run(cmd, pty=True)
 
 
-@task
-def backupdb(c):
+# Backups are written by the database container straight into ./backups on the host, see docker-compose.yml
+BACKUP_DIR = "backups"
+FINISHED_TABLE_DATA = re.compile(r"finished item \d+ TABLE DATA (\S+)")
+
+
+class TableProgress:
+    """Stream for the verbose output of pg_dump/pg_restore that advances a progress bar per table copied."""
+
+    def __init__(self, progress, task_id):
+        self.progress = progress
+        self.task_id = task_id
+        self.pending = ""
+
+    def write(self, data):
+        *lines, self.pending = (self.pending + data).split("\n")
+        for line in lines:
+            match = FINISHED_TABLE_DATA.search(line)
+            if match:
+                self.progress.update(self.task_id, advance=1, description=match.group(1))
+            elif "error" in line.lower() or "warning" in line.lower():
+                self.progress.console.print(line, style=warning_style)
+
+    def flush(self):
+        pass
+
+
+def db_exec(c, cmd, **kwargs):
+    return c.run(f'docker exec -i {os.getenv("POSTGRES_CONTAINER_NAME")} {cmd}', **kwargs)
+
+
+def db_jobs(c, jobs):
+    """The requested number of parallel jobs, or one per CPU of the database container."""
+    if jobs:
+        return jobs
+    return int(db_exec(c, "nproc", hide=True).stdout.strip())
+
+
+def run_with_progress(c, cmd, total, label):
+    with Progress(TextColumn(f"{label} [bold cyan]{{task.description}}"), BarColumn(), MofNCompleteColumn(),
+                  TimeElapsedColumn(), console=console) as progress:
+        task_id = progress.add_task("", total=total or None)
+        return db_exec(c, cmd, warn=True, hide="out", err_stream=TableProgress(progress, task_id))
+
+
+@task(
+    help={
+        "jobs": "Tables dumped in parallel. Default: the CPU count of the database container",
+        "compress": "pg_dump compression of every table file. Default: zstd:3",
+    },
+)
+def backupdb(c, jobs=0, compress="zstd:3"):
+    """Dump the database in parallel to ./backups/<timestamp>, with a SHA256SUMS file of its contents."""
     print_header("Backing Up Database")
-    console.print("Backing up the database...", style=info_style)
-    backup_cmd = (
-        f'docker exec -i {os.getenv("POSTGRES_CONTAINER_NAME")} pg_dump -U postgres -d ustudy_task -F c -b -v -f /tmp/backup.sql'
-    )
-    result = c.run(backup_cmd, warn=True)
+    jobs = db_jobs(c, jobs)
+    name = f'ustudy_task-{datetime.now().strftime("%Y%m%d-%H%M%S")}'
+    console.print(f"Backing up the database to {BACKUP_DIR}/{name} with {jobs} jobs...", style=info_style)
+
+    tables = db_exec(c, "psql -U postgres -d ustudy_task -tAc "
+                        "\"SELECT count(*) FROM pg_tables WHERE schemaname NOT IN ('pg_catalog', 'information_schema')\"",
+                     hide=True).stdout.strip()
+    # The directory format writes one compressed file per table, which is what lets pg_dump and pg_restore use
+    # several connections at once
+    backup_cmd = f"pg_dump -U postgres -d ustudy_task -F d -j {jobs} -Z {compress} -b -v -f /{BACKUP_DIR}/{name}"
+    result = run_with_progress(c, backup_cmd, int(tables), "Dumping")
     if result.failed:
         console.print("Backup failed.", style=error_style)
         raise Exception("Backup failed.")
 
-    # Copy the backup file from the Docker container to the local machine
-    c.run(f'docker cp {os.getenv("POSTGRES_CONTAINER_NAME")}:/tmp/backup.sql ./backup.sql')
+    console.print("Computing checksums...", style=info_style)
+    checksum_result = db_exec(
+        c, f"sh -c 'cd /{BACKUP_DIR}/{name} && find . -type f ! -name SHA256SUMS -print0 | xargs -0 -P {jobs} sha256sum > SHA256SUMS'",
+        warn=True,
+    )
+    if checksum_result.failed:
+        console.print("Computing checksums failed.", style=error_style)
+        raise Exception("Backup failed.")
 
+    size = db_exec(c, f"du -sh /{BACKUP_DIR}/{name}", hide=True).stdout.split()[0]
+    console.print(f"Backup written to {BACKUP_DIR}/{name} ({size}).", style=success_style)
     print_footer("Backup completed.")
 
 
-@task
-def restoredb(c):
-    print_header("Restoring Database")
-    console.print("Restoring the database...", style=info_style)
-    drop_cmd = (
-        f'docker exec -i {os.getenv("POSTGRES_CONTAINER_NAME")} psql -U postgres -c "DROP DATABASE IF EXISTS ustudy_task;"'
-    )
-    create_cmd = (
-        f'docker exec -i {os.getenv("POSTGRES_CONTAINER_NAME")} psql -U postgres -c "CREATE DATABASE ustudy_task;"'
-    )
-    restore_cmd = (
-        f'docker exec -i {os.getenv("POSTGRES_CONTAINER_NAME")} pg_restore -U postgres -d ustudy_task /tmp/backup.sql'
-    )
+def latest_backup():
+    backups = sorted(path.name for path in Path(BACKUP_DIR).glob("ustudy_task-*") if path.is_dir())
+    if not backups:
+        console.print(f"No backups found in {BACKUP_DIR}/.", style=error_style)
+        raise Exception("Restore failed.")
+    return backups[-1]
+
+
+def table_data_entries(c, name, tables):
+    """The table of contents entries restoring the rows of `tables` and the sequences of their ids."""
+    toc = db_exec(c, f"pg_restore -l /{BACKUP_DIR}/{name}", hide=True).stdout.splitlines()
+    entries, found = [], set()
+    for entry in toc:
+        fields = entry.split()
+        # "<id>; <oid> <oid> TABLE DATA <schema> <name> <owner>"
+        if len(fields) < 8 or entry.startswith(";"):
+            continue
+        kind, tag = " ".join(fields[3:5]), fields[6]
+        if kind == "TABLE DATA" and tag in tables:
+            entries.append(entry)
+            found.add(tag)
+        # Identity sequences are named <table>_<column>_seq
+        elif kind == "SEQUENCE SET" and tag.removesuffix("_seq").rsplit("_", 1)[0] in tables:
+            entries.append(entry)
+    missing = set(tables) - found
+    if missing:
+        console.print(f"Tables not in the backup: {', '.join(sorted(missing))}", style=error_style)
+        raise Exception("Restore failed.")
+    return entries
 
-    # Copy the backup file from the local machine to the Docker container
-    c.run(f'docker cp ./backup.sql {os.getenv("POSTGRES_CONTAINER_NAME")}:/tmp/backup.sql')
 
-    console.print("Dropping the existing database...", style=info_style)
-    drop_result = c.run(drop_cmd, warn=True)
-    if drop_result.failed:
-        console.print("Failed to drop the existing database.", style=error_style)
-        raise Exception("Database drop failed.")
+@task(
+    help={
+        "name": "Backup in ./backups to restore. Default: the latest",
+        "tables": "Comma-separated tables to restore the rows of, leaving the rest of the database as is."
+                  " Tables referenced by foreign keys must be restored together with the tables referencing them."
+                  " Default: None (recreate the whole database)",
+        "jobs": "Tables restored in parallel. Default: the CPU count of the database container",
+    },
+)
+def restoredb(c, name=None, tables=None, jobs=0):
+    """Verify a backup's checksums and restore it, or only some of its tables, in parallel."""
+    print_header("Restoring Database")
+    name = name or latest_backup()
+    jobs = db_jobs(c, jobs)
 
-    console.print("Creating a new database...", style=info_style)
-    create_result = c.run(create_cmd, warn=True)
-    if create_result.failed:
-        console.print("Failed to create a new database.", style=error_style)
-        raise Exception("Database creation failed.")
+    console.print(f"Verifying the checksums of {BACKUP_DIR}/{name}...", style=info_style)
+    verify_result = db_exec(c, f"sh -c 'cd /{BACKUP_DIR}/{name} && sha256sum -c --quiet SHA256SUMS'", warn=True)
+    if verify_result.failed:
+        console.print("The backup is corrupt, the database was left untouched.", style=error_style)
+        raise Exception("Restore failed.")
 
-    console.print("Restoring the database from the backup...", style=info_style)
-    restore_result = c.run(restore_cmd, warn=True)
+    if tables:
+        tables = [table.strip() for table in tables.split(",")]
+        entries = table_data_entries(c, name, tables)
+        db_exec(c, "sh -c 'cat > /tmp/restore.list'", in_stream=io.StringIO("\n".join(entries) + "\n"), hide=True)
+
+        console.print(f"Truncating {', '.join(tables)}...", style=info_style)
+        truncate_result = db_exec(c, f'psql -U postgres -d ustudy_task -v ON_ERROR_STOP=1 '
+                                     f'-c "TRUNCATE ONLY {", ".join(tables)}"', warn=True)
+        if truncate_result.failed:
+            console.print("Failed to truncate the tables.", style=error_style)
+            raise Exception("Restore failed.")
+
+        # Triggers, including foreign key checks, are off while rows are copied in parallel in no particular order
+        restore_cmd = (f"pg_restore -U postgres -d ustudy_task --data-only --disable-triggers -j {jobs} "
+                       f"-L /tmp/restore.list -v /{BACKUP_DIR}/{name}")
+        total = len(tables)
+    else:
+        console.print("Dropping the existing database...", style=info_style)
+        drop_result = db_exec(c, 'psql -U postgres -c "DROP DATABASE IF EXISTS ustudy_task;"', warn=True)
+        if drop_result.failed:
+            console.print("Failed to drop the existing database.", style=error_style)
+            raise Exception("Database drop failed.")
+
+        console.print("Creating a new database...", style=info_style)
+        create_result = db_exec(c, 'psql -U postgres -c "CREATE DATABASE ustudy_task;"', warn=True)
+        if create_result.failed:
+            console.print("Failed to create a new database.", style=error_style)
+            raise Exception("Database creation failed.")
+
+        restore_cmd = f"pg_restore -U postgres -d ustudy_task -j {jobs} -v /{BACKUP_DIR}/{name}"
+        total = sum(" TABLE DATA " in entry for entry in
+                    db_exec(c, f"pg_restore -l /{BACKUP_DIR}/{name}", hide=True).stdout.splitlines())
+
+    console.print(f"Restoring the database from {BACKUP_DIR}/{name} with {jobs} jobs...", style=info_style)
+    restore_result = run_with_progress(c, restore_cmd, total, "Restoring")
     if restore_result.failed:
         console.print("Restore failed.", style=error_style)
         raise Exception("Restore failed.")
@@ -1,3 +1,84 @@
+from collections import defaultdict
+
 from django.contrib import admin
+from django.db import transaction
+
+from ustudy_test_task.admin import ScalableAdminMixin
+from .cache import cache_task, invalidate_tasks
+from .deletion import delete_task
+from .events import TASK_CREATED, TASK_UPDATED, publish_task_event, publish_task_events
+from .models import PriorityChoiceField, TaskModel
+from .serializers import TaskSerializer
+
+
+@admin.register(TaskModel)
+class TaskAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = ('id', 'title', 'user', 'status', 'priority', 'deadline', 'overdue')
+    list_select_related = ('user',)
+    # Backed by the indexes for admin filters, see TaskModel.Meta
+    list_filter = ('status', 'priority', ('deadline', admin.DateFieldListFilter))
+    autocomplete_fields = ('user',)
+    raw_id_fields = ('parent', 'series')
+    readonly_fields = ('overdue', 'created_at', 'updated_at')
+    actions = ('mark_new', 'mark_in_progress', 'mark_completed',
+               'set_low_priority', 'set_medium_priority', 'set_high_priority')
+
+    def get_actions(self, request):
+        # Its confirmation page lists every selected task
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_model(self, request, obj):
+        # Like deletes through the API, with the subtree's tombstones, cache invalidation and events
+        delete_task(obj.pk, obj.user_id)
+
+    def delete_queryset(self, request, queryset):
+        with transaction.atomic():
+            for pk, user_id in queryset.values_list('pk', 'user_id'):
+                delete_task(pk, user_id)
+
+    def save_model(self, request, obj, form, change):
+        # Like TaskSerializer.validate, the sweeper marks the task again if it becomes overdue
+        if 'deadline' in form.changed_data or obj.status == 'completed':
+            obj.overdue = False
+        super().save_model(request, obj, form, change)
+        data = TaskSerializer(obj).data
+        cache_task(data)
+        publish_task_event(obj.user_id, TASK_UPDATED if change else TASK_CREATED, data)
+
+    def update_tasks(self, request, queryset, **fields):
+        """Apply an action to all the selected tasks with one UPDATE, however many are selected."""
+        updated = queryset.update_returning(**fields)
+        invalidate_tasks([task.pk for task in updated])
+        by_user = defaultdict(list)
+        for task in updated:
+            by_user[task.user_id].append(task)
+        for user_id, tasks in by_user.items():
+            publish_task_events(user_id, TASK_UPDATED, TaskSerializer(tasks, many=True).data)
+        self.message_user(request, f'{len(updated)} task(s) updated.')
+
+    @admin.action(description='Mark selected tasks as new')
+    def mark_new(self, request, queryset):
+        self.update_tasks(request, queryset, status='new')
+
+    @admin.action(description='Mark selected tasks as in progress')
+    def mark_in_progress(self, request, queryset):
+        self.update_tasks(request, queryset, status='in_progress')
+
+    @admin.action(description='Mark selected tasks as completed')
+    def mark_completed(self, request, queryset):
+        # A completed task is never overdue, like updates through the API
+        self.update_tasks(request, queryset, status='completed', overdue=False)
+
+    @admin.action(description='Set priority of selected tasks to low')
+    def set_low_priority(self, request, queryset):
+        self.update_tasks(request, queryset, priority=PriorityChoiceField.LOW)
+
+    @admin.action(description='Set priority of selected tasks to medium')
+    def set_medium_priority(self, request, queryset):
+        self.update_tasks(request, queryset, priority=PriorityChoiceField.MEDIUM)
 
-# Register your models here.
+    @admin.action(description='Set priority of selected tasks to high')
+    def set_high_priority(self, request, queryset):
+        self.update_tasks(request, queryset, priority=PriorityChoiceField.HIGH)
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.db import router, transaction
+from django_redis import get_redis_connection
+
+from .models import TaskModel
+from .serializers import TaskSerializer
+
+
+def task_cache_key(pk):
+    return f'task:{pk}'
+
+
+def get_tasks(user, pks):
+    """
+    Return the user's serialized tasks among `pks`, in the given order.
+
+    Hits come from one MGET, misses are loaded with a single `id__in` query and cached. Cached tasks of other
+    users are dropped, so ownership is enforced either way.
+
+    Like every cache write here, misses are only cached once the surrounding transaction commits, so a rolled back
+    write, e.g. in an atomic batch, is never served from the cache. They are cached only where the key is still
+    missing then, so a task loaded before a concurrent update never replaces the one the update cached.
+    """
+    pks = list(dict.fromkeys(pks))
+    cached = cache.get_many([task_cache_key(pk) for pk in pks])
+    found = {pk: cached[task_cache_key(pk)] for pk in pks if task_cache_key(pk) in cached}
+
+    misses = [pk for pk in pks if pk not in found]
+    if misses:
+        # Read from the primary so that a lagging replica can't put a stale task in the cache
+        tasks = TaskModel.objects.using(router.db_for_write(TaskModel)).filter(user=user, pk__in=misses)
+        loaded = {task.pk: dict(TaskSerializer(task).data) for task in tasks}
+        entries = {task_cache_key(pk): data for pk, data in loaded.items()}
+        transaction.on_commit(lambda: add_many(entries))
+        found.update(loaded)
+
+    return [found[pk] for pk in pks if pk in found and found[pk]['user'] == user.pk]
+
+
+def add_many(entries):
+    """Cache the entries whose keys aren't set, with one SET NX each in a single round trip."""
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for key, data in entries.items():
+        cache.client.set(key, data, settings.TASK_CACHE_TIMEOUT, client=pipe, nx=True)
+    pipe.execute()
+
+
+def cache_task(data):
+    """Replace the cached task after a write with the row the write returned."""
+    key, data = task_cache_key(data['id']), dict(data)
+    transaction.on_commit(lambda: cache.set(key, data, settings.TASK_CACHE_TIMEOUT))
+
+
+def invalidate_tasks(pks):
+    keys = [task_cache_key(pk) for pk in pks]
+    transaction.on_commit(lambda: cache.delete_many(keys))
@@ -0,0 +1,33 @@
+from django.db import transaction
+from django.db.models import Q
+
+from . import recurrence
+from .cache import invalidate_tasks
+from .events import TASK_DELETED, publish_task_events
+from .models import TaskModel, TaskTombstone
+
+
+def delete_task(pk, user_id):
+    """
+    Delete the user's task with everything deleted with it, returning the deleted ids, none if there is no such task.
+
+    Subtasks and the changed occurrences of recurring tasks go with it. Tombstones are recorded for delta sync and,
+    once committed, the tasks are dropped from the cache and the deletions published. Both the API and the admin
+    delete through here.
+    """
+    with transaction.atomic():
+        subtree = TaskModel.objects.subtree_ids(pk, user_id)
+        rows = list(TaskModel.objects.filter(Q(pk__in=subtree) | Q(series__in=subtree), user_id=user_id)
+                    .values_list('pk', 'series_id', 'occurrence'))
+        # Filtering by user enforces ownership
+        deleted, _ = TaskModel.objects.filter(pk=pk, user_id=user_id).delete()
+        if not deleted:
+            return []
+        TaskTombstone.objects.bulk_create([TaskTombstone(task_id=row[0], user_id=user_id) for row in rows])
+        # A deleted changed occurrence must not be expanded from its series again
+        series = [(series_id, occurrence) for row_pk, series_id, occurrence in rows if row_pk == pk and series_id]
+        for series_id, occurrence in series:
+            recurrence.exclude_occurrence(series_id, occurrence)
+        invalidate_tasks([row[0] for row in rows] + [series_id for series_id, _ in series])
+        publish_task_events(user_id, TASK_DELETED, [{'id': row[0]} for row in rows])
+    return [row[0] for row in rows]
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+TASK_CREATED = 'created'
+TASK_UPDATED = 'updated'
+TASK_DELETED = 'deleted'
+# Sent instead of a replay when events after Last-Event-ID were already trimmed from the buffer, clients reload
+TASK_EVENTS_RESET = 'reset'
+
+# Numbers, buffers and publishes events in one step, so that concurrent writers can't publish ids out of order.
+# KEYS: seq, buffer. ARGV: channel, buffer size, JSON event type, then one JSON task per event.
+PUBLISH_SCRIPT = """
+local count = #ARGV - 3
+local last_id = redis.call('INCRBY', KEYS[1], count)
+for i = 1, count do
+    local message = string.format('{"id": %d, "type": %s, "task": %s}', last_id - count + i, ARGV[3], ARGV[i + 3])
+    redis.call('RPUSH', KEYS[2], message)
+    redis.call('PUBLISH', ARGV[1], message)
+end
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+return last_id
+"""
+
+
+def _channel(user_id):
+    return f'task-events:{user_id}'
+
+
+def format_event(event):
+    """Format an event as a Server-Sent Events message."""
+    return f'id: {event["id"]}\nevent: {event["type"]}\ndata: {json.dumps(event["task"])}\n\n'
+
+
+def format_reset(last_id):
+    return f'id: {last_id}\nevent: {TASK_EVENTS_RESET}\ndata: {json.dumps({"last_event_id": last_id})}\n\n'
+
+
+def publish_task_event(user_id, event_type, task):
+    """
+    Append a task change to the user's bounded event buffer and publish it to their channel.
+
+    Published once the surrounding transaction commits, so a rolled back write is never announced. The feed is best
+    effort: a Redis outage is logged and never fails the write that caused it.
+    """
+    publish_task_events(user_id, event_type, [task])
+
+
+def publish_task_events(user_id, event_type, tasks):
+    """Publish the same change to many tasks, e.g. a whole subtree, in one round trip, see `publish_task_event`."""
+    if not tasks:
+        return
+    tasks = list(tasks)
+    transaction.on_commit(lambda: _publish(user_id, event_type, tasks))
+
+
+def _publish(user_id, event_type, tasks):
+    channel = _channel(user_id)
+    try:
+        get_redis_connection('default').eval(
+            PUBLISH_SCRIPT, 2, f'{channel}:seq', f'{channel}:buffer',
+            channel, settings.TASK_EVENTS_BUFFER_SIZE, json.dumps(event_type),
+            *(json.dumps(task, cls=DjangoJSONEncoder) for task in tasks),
+        )
+    except RedisError as e:
+        logger.error(f'Error while publishing task events: user={user_id} type={event_type}', exc_info=e)
+
+
+async def stream_task_events(user_id, last_event_id=None):
+    """
+    Yield the user's task events as SSE messages, starting with buffered events after `last_event_id`.
+
+    Subscribing happens before the buffer is read so nothing published in between is lost; events
+    seen in both are only sent once. If events after `last_event_id` were already trimmed from the buffer, a reset
+    event is sent instead, telling the client to reload its tasks rather than miss changes.
+    """
+    channel = _channel(user_id)
+    redis = aioredis.from_url(settings.REDIS_URL)
+    pubsub = redis.pubsub()
+    try:
+        await pubsub.subscribe(channel)
+        last_sent = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+        if last_sent is not None:
+            # In one MULTI, so that the buffer and the sequence agree
+            pipe = redis.pipeline()
+            pipe.lrange(f'{channel}:buffer', 0, -1)
+            pipe.get(f'{channel}:seq')
+            messages, last_id = await pipe.execute()
+            events = [json.loads(message) for message in messages]
+            last_id = int(last_id or 0)
+            oldest_id = events[0]['id'] if events else last_id + 1
+            # Events were trimmed after the last one sent, or the sequence started over
+            if last_sent < oldest_id - 1 or last_sent > last_id:
+                last_sent = last_id
+                yield format_reset(last_id)
+            for event in events:
+                if event['id'] > last_sent:
+                    last_sent = event['id']
+                    yield format_event(event)
+        # Clients reconnect after 3s
+        yield 'retry: 3000\n\n'
+
+        loop = asyncio.get_running_loop()
+        sent_at = loop.time()
+        while True:
+            message = await pubsub.get_message(ignore_subscribe_messages=True,
+                                               timeout=settings.TASK_EVENTS_KEEPALIVE_SECONDS)
+            if message is None:
+                # Comments keep proxies from closing idle connections. None is also returned early
+                # for skipped subscribe confirmations.
+                if loop.time() - sent_at >= settings.TASK_EVENTS_KEEPALIVE_SECONDS:
+                    sent_at = loop.time()
+                    yield ': keepalive\n\n'
+                continue
+            event = json.loads(message['data'])
+            if last_sent is not None and event['id'] <= last_sent:
+                continue
+            last_sent = event['id']
+            sent_at = loop.time()
+            yield format_event(event)
+    finally:
+        await pubsub.aclose()
+        await redis.aclose()
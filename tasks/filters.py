@@ -0,0 +1,226 @@
+"""
+Query parameter filters shared by the task list views.
+
+Every filter compiles to a predicate an index can serve: choices to `=`/`IN`, and all the bounds given for a
+datetime field, e.g. `?year=2025&month=3&deadline_after=2025-03-10`, to a single half-open `>= start AND < end` range.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Case, F, IntegerField, Value, When
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ParseError
+from rest_framework.filters import BaseFilterBackend
+
+from .models import PriorityChoiceField, TaskModel
+
+
+def values(params, name):
+    """Comma-separated and repeated values of a query parameter, e.g. `?status=new,in_progress&status=completed`."""
+    return [value.strip() for param in params.getlist(name) for value in param.split(',') if value.strip()]
+
+
+STATUSES = [choice for choice, _ in TaskModel.STATUS_CHOICES]
+
+
+def rank(field, choices):
+    """Sort a choice field in the order of its choices rather than alphabetically."""
+    return Case(*(When(**{field: choice}, then=Value(index)) for index, choice in enumerate(choices)),
+                output_field=IntegerField())
+
+
+class TaskFilterBackend(BaseFilterBackend):
+    """
+    Filters and orders tasks by the list query parameters, raising ParseError for invalid ones.
+
+    Subclasses extend it through the class attributes, e.g. another choice field or datetime range.
+    """
+    # Query parameter -> allowed values, several values match any of them
+    choice_filters = {
+        'status': STATUSES,
+        'priority': PriorityChoiceField.values,
+    }
+    # Field -> query parameters of its inclusive lower and exclusive upper bound, ISO 8601 dates or datetimes
+    range_filters = {
+        'deadline': ('deadline_after', 'deadline_before'),
+        'created_at': ('created_after', 'created_before'),
+    }
+    # Field narrowed by ?year=&month=&day=
+    calendar_field = 'deadline'
+    # ?ordering= values, `-` for descending. Ties are broken by id.
+    ordering_fields = {
+        'id': F('id'),
+        'title': F('title'),
+        'deadline': F('deadline'),
+        'created_at': F('created_at'),
+        'updated_at': F('updated_at'),
+        'priority': rank('priority', PriorityChoiceField.values),
+        'status': rank('status', STATUSES),
+    }
+    # Ordering field -> what its serialized value sorts by in `sort`, the value itself if missing
+    sort_keys = {
+        'deadline': parse_datetime,
+        'created_at': parse_datetime,
+        'updated_at': parse_datetime,
+        'priority': PriorityChoiceField.values.index,
+        'status': STATUSES.index,
+    }
+
+    def parameters(self):
+        """The query parameters that narrow the list, all but ordering."""
+        bounds = [name for names in self.range_filters.values() for name in names]
+        return [*self.choice_filters, 'tags', 'tags_match', *bounds, 'year', 'month', 'day', 'overdue']
+
+    def filter_queryset(self, request, queryset, view=None):
+        params = request.query_params
+        queryset = self.filter_shared(request, queryset)
+        queryset = self.filter_range(queryset, 'deadline', *self.range(params, 'deadline'))
+        overdue = self.overdue(params)
+        if overdue is not None:
+            # overdue=true is served from a partial index
+            queryset = queryset.filter(overdue=overdue)
+        return self.order(params, queryset)
+
+    def filter_shared(self, request, queryset):
+        """
+        Apply the filters a recurring task and all of its occurrences agree on, all but the deadline and overdue.
+
+        Lists expand the occurrences of the recurring tasks this returns, see TaskListView.expand.
+        """
+        params = request.query_params
+        for name in self.choice_filters:
+            choices = self.choices(params, name)
+            if len(choices) == 1:
+                queryset = queryset.filter(**{name: choices[0]})
+            elif choices:
+                queryset = queryset.filter(**{f'{name}__in': choices})
+
+        tags = [tag.lower() for tag in values(params, 'tags')]
+        if tags:
+            # Both served by the GIN index on the tags column
+            match = params.get('tags_match', 'all')
+            if match not in ('all', 'any'):
+                raise ParseError('Invalid tags_match. Use any or all.')
+            queryset = queryset.filter(**{'tags__contains' if match == 'all' else 'tags__overlap': tags})
+
+        for field in self.range_filters:
+            if field != self.calendar_field:
+                queryset = self.filter_range(queryset, field, *self.range(params, field))
+        return queryset
+
+    def choices(self, params, name):
+        choices = list(dict.fromkeys(values(params, name)))
+        if any(choice not in self.choice_filters[name] for choice in choices):
+            raise ParseError(f'Invalid {name} filter. Use {", ".join(self.choice_filters[name])}.')
+        return choices
+
+    @staticmethod
+    def overdue(params):
+        overdue = params.get('overdue')
+        if not overdue:
+            return None
+        if overdue not in ('true', 'false'):
+            raise ParseError('Invalid overdue filter. Use true or false.')
+        return overdue == 'true'
+
+    def range(self, params, field):
+        """Return the half-open `[start, end)` of `field` all its parameters allow, None for an unbounded side."""
+        after, before = self.range_filters[field]
+        starts, ends = [self.bound(params, after)], [self.bound(params, before)]
+        if field == self.calendar_field:
+            start, end = self.calendar(params)
+            starts.append(start)
+            ends.append(end)
+        return (max((start for start in starts if start), default=None),
+                min((end for end in ends if end), default=None))
+
+    @staticmethod
+    def filter_range(queryset, field, start, end):
+        if start:
+            queryset = queryset.filter(**{f'{field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{field}__lt': end})
+        return queryset
+
+    @staticmethod
+    def bound(params, name):
+        value = params.get(name)
+        if not value:
+            return None
+        try:
+            # A `+` in an unencoded UTC offset arrives as a space
+            bound = parse_datetime(value.replace(' ', '+'))
+            if bound is None:
+                date = parse_date(value)
+                bound = date and datetime.combine(date, time())
+        except ValueError:
+            bound = None
+        if bound is None:
+            raise ParseError(f'Invalid {name} format. Use an ISO 8601 date or datetime.')
+        return timezone.make_aware(bound) if timezone.is_naive(bound) else bound
+
+    @staticmethod
+    def calendar(params):
+        """The `[start, end)` of the year, month or day in ?year=&month=&day=, in the current time zone."""
+        year, month, day = params.get('year'), params.get('month'), params.get('day')
+        if not year:
+            if month:
+                raise ParseError('Year must be provided with month.')
+            if day:
+                raise ParseError('Year and month must be provided with day.')
+            return None, None
+        if day and not month:
+            raise ParseError('Year and month must be provided with day.')
+
+        try:
+            year = int(year)
+            start, end = datetime(year, 1, 1), datetime(year + 1, 1, 1)
+        except ValueError:
+            raise ParseError('Invalid year format. Year must be an integer.')
+        if month:
+            try:
+                month = int(month)
+                start, end = datetime(year, month, 1), datetime(year + month // 12, month % 12 + 1, 1)
+            except ValueError:
+                raise ParseError('Invalid month format. Month must be an integer between 1 and 12.')
+        if day:
+            try:
+                start = datetime(year, month, int(day))
+                end = start + timedelta(days=1)
+            except (ValueError, OverflowError):
+                raise ParseError('Invalid day format. Day must be an integer.')
+        return timezone.make_aware(start), timezone.make_aware(end)
+
+    def order(self, params, queryset):
+        names = values(params, 'ordering')
+        if not names:
+            return queryset
+        ordering = []
+        for name in names:
+            expression = self.ordering_fields.get(name.removeprefix('-'))
+            if expression is None:
+                raise ParseError(f'Invalid ordering. Use {", ".join(self.ordering_fields)}, - for descending.')
+            ordering.append(expression.desc() if name.startswith('-') else expression.asc())
+        if 'id' not in (name.removeprefix('-') for name in names):
+            ordering.append(F('id').asc())
+        return queryset.order_by(*ordering)
+
+    def sort(self, params, tasks):
+        """
+        Sort serialized tasks in place like `order` sorts rows, for lists that aren't only rows.
+
+        Missing values, like the ids of expanded occurrences, sort like NULLs do in PostgreSQL: last in ascending order
+        and first in descending order.
+        """
+        names = values(params, 'ordering')
+        if not names:
+            return tasks
+        if 'id' not in (name.removeprefix('-') for name in names):
+            names.append('id')
+        # Stable sorts from the last key to the first
+        for name in reversed(names):
+            field = name.removeprefix('-')
+            key = self.sort_keys.get(field, lambda value: value)
+            tasks.sort(key=lambda task: (task[field] is None, None if task[field] is None else key(task[field])),
+                       reverse=name.startswith('-'))
+        return tasks
@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import socket
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from .events import TASK_CREATED, publish_task_event
+from .models import TaskModel
+from .serializers import TaskSerializer
+
+logger = logging.getLogger(__name__)
+
+STREAM = 'task-ingest'
+GROUP = 'task-ingest-workers'
+
+PENDING = 'pending'
+CREATED = 'created'
+FAILED = 'failed'
+
+
+def _status_key(tracking_id):
+    return f'task-ingest:{tracking_id}'
+
+
+def enqueue_task(user_id, validated_data):
+    """Queue a validated task for insertion and return its tracking id."""
+    tracking_id = str(uuid.uuid4())
+    redis = get_redis_connection('default')
+    pipe = redis.pipeline()
+    pipe.hset(_status_key(tracking_id), mapping={'user_id': user_id, 'status': PENDING})
+    pipe.expire(_status_key(tracking_id), settings.TASK_INGEST_STATUS_TTL)
+    pipe.xadd(STREAM, {
+        'tracking_id': tracking_id,
+        'user_id': user_id,
+        # Related tasks, like the parent, are queued by id
+        'data': json.dumps({TaskModel._meta.get_field(name).attname: getattr(value, 'pk', value)
+                            for name, value in validated_data.items()}, cls=DjangoJSONEncoder),
+    })
+    pipe.execute()
+    return tracking_id
+
+
+def ingestion_status(user_id, tracking_id):
+    """Return the status of a queued task, or None if it is unknown or belongs to another user."""
+    status = get_redis_connection('default').hgetall(_status_key(tracking_id))
+    if not status or int(status[b'user_id']) != user_id:
+        return None
+    result = {'tracking_id': str(tracking_id), 'status': status[b'status'].decode()}
+    if b'task_id' in status:
+        result['task_id'] = int(status[b'task_id'])
+    return result
+
+
+def drain(batch_size=None, max_seconds=None):
+    """
+    Insert queued tasks in micro-batches as a member of the consumer group, returning how many were handled.
+
+    Delivery is at least once: messages are acknowledged only after their batch is committed, and messages
+    left pending by a consumer that died are claimed again. The unique `ingest_id` turns redeliveries into no-ops.
+    Acknowledged messages are trimmed from the stream afterwards.
+    """
+    batch_size = batch_size or settings.TASK_INGEST_BATCH_SIZE
+    deadline = time.monotonic() + (max_seconds or settings.TASK_INGEST_DRAIN_SECONDS)
+    consumer = f'{socket.gethostname()}-{os.getpid()}'
+    redis = get_redis_connection('default')
+    try:
+        redis.xgroup_create(STREAM, GROUP, id='0', mkstream=True)
+    except ResponseError as e:
+        if 'BUSYGROUP' not in str(e):
+            raise
+
+    _, claimed, *_ = redis.xautoclaim(STREAM, GROUP, consumer, min_idle_time=settings.TASK_INGEST_CLAIM_IDLE_MS,
+                                      count=batch_size)
+    handled = _insert_batch(redis, claimed) if claimed else 0
+    while time.monotonic() < deadline:
+        response = redis.xreadgroup(GROUP, consumer, {STREAM: '>'}, count=batch_size)
+        if not response:
+            break
+        handled += _insert_batch(redis, response[0][1])
+    _trim_acknowledged(redis)
+    return handled
+
+
+def _trim_acknowledged(redis):
+    """
+    Drop the messages before the oldest one not yet acknowledged, which the group will never read again.
+
+    The pending messages and the last delivered one are read in one transaction. Messages delivered after it have
+    later ids than both, so they are never trimmed unacknowledged.
+    """
+    pipe = redis.pipeline()
+    pipe.xpending(STREAM, GROUP)
+    pipe.xinfo_groups(STREAM)
+    pending, groups = pipe.execute()
+
+    def stream_id(value):
+        return tuple(int(part) for part in value.decode().split('-'))
+
+    # Everything up to and including the last delivered message was read, and is acknowledged unless pending
+    milliseconds, sequence = stream_id(next(group for group in groups
+                                            if group['name'] == GROUP.encode())['last-delivered-id'])
+    min_id = (milliseconds, sequence + 1)
+    if pending['pending']:
+        min_id = min(min_id, stream_id(pending['min']))
+    redis.xtrim(STREAM, minid='{}-{}'.format(*min_id), approximate=False)
+
+
+def _insert_batch(redis, messages):
+    entries = {}
+    for message_id, fields in messages:
+        data = json.loads(fields[b'data'])
+        entries[message_id] = TaskModel(
+            ingest_id=uuid.UUID(fields[b'tracking_id'].decode()),
+            user_id=int(fields[b'user_id']),
+            **{name: TaskModel._meta.get_field(name).to_python(value) for name, value in data.items()},
+        )
+
+    try:
+        with transaction.atomic():
+            TaskModel.objects.bulk_create(entries.values(), ignore_conflicts=True)
+    except IntegrityError:
+        # A row the batch can't contain, e.g. of a deleted user. Insert one by one to isolate it.
+        for task in entries.values():
+            try:
+                with transaction.atomic():
+                    TaskModel.objects.bulk_create([task], ignore_conflicts=True)
+            except IntegrityError as e:
+                logger.error(f'Error while ingesting task: tracking_id={task.ingest_id}', exc_info=e)
+
+    created = {task.ingest_id: task for task in
+               TaskModel.objects.filter(ingest_id__in=[task.ingest_id for task in entries.values()])}
+    pipe = redis.pipeline()
+    for message_id, task in entries.items():
+        key = _status_key(task.ingest_id)
+        if task.ingest_id in created:
+            pipe.hset(key, mapping={'status': CREATED, 'task_id': created[task.ingest_id].pk})
+        else:
+            pipe.hset(key, 'status', FAILED)
+        pipe.expire(key, settings.TASK_INGEST_STATUS_TTL)
+    pipe.xack(STREAM, GROUP, *entries)
+    pipe.execute()
+
+    for task in created.values():
+        publish_task_event(task.user_id, TASK_CREATED, TaskSerializer(task).data)
+    logger.info(f'Ingested {len(created)} of {len(entries)} queued tasks')
+    return len(entries)
@@ -0,0 +1,53 @@
+from collections import Counter, defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ustudy_test_task import profiling
+
+
+class Command(BaseCommand):
+    help = 'Report the hottest functions in the sampled request profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=20,
+            help='Number of functions to report'
+        )
+        parser.add_argument(
+            '--route',
+            help='Only include traces of this URL name'
+        )
+
+    def handle(self, *args, **options):
+        stacks = Counter()
+        latencies = defaultdict(list)
+        for path in sorted(Path(settings.PROFILING_DIR).glob('*.folded')):
+            url_name, latency = profiling.parse_trace_name(path)
+            if options['route'] and url_name != options['route']:
+                continue
+            latencies[url_name].append(latency)
+            stacks.update(profiling.read_trace(path))
+
+        if not latencies:
+            self.stdout.write(self.style.WARNING(f'No traces found in {settings.PROFILING_DIR}'))
+            return
+
+        self.stdout.write(self.style.SUCCESS('Traces per route'))
+        for url_name, values in sorted(latencies.items(), key=lambda item: -sum(item[1])):
+            values.sort()
+            self.stdout.write(f'{url_name:<30} {len(values):>6} traces  '
+                              f'median {values[len(values) // 2]}ms  max {values[-1]}ms')
+
+        samples = sum(stacks.values())
+        if not samples:
+            self.stdout.write(self.style.WARNING('\nThe traces hold no samples, lower PROFILING_INTERVAL'))
+            return
+        own, total = profiling.hot_functions(stacks)
+        self.stdout.write(self.style.SUCCESS(f'\nTop {options["top"]} functions of {samples} samples'))
+        self.stdout.write(f'{"self %":>8} {"total %":>8}  function')
+        for function, count in own.most_common(options['top']):
+            self.stdout.write(f'{count / samples:>8.1%} {total[function] / samples:>8.1%}  {function}')
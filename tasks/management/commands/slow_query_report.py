@@ -0,0 +1,57 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg, Count, Max, Sum
+from django.utils import timezone
+
+from tasks.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = 'Report the queries that spent the most time above the slow query threshold'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=10,
+            help='Number of queries to report'
+        )
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=24,
+            help='Only include queries captured in the last hours'
+        )
+        parser.add_argument(
+            '--plans',
+            action='store_true',
+            help='Print the latest EXPLAIN plan of every query'
+        )
+
+    def handle(self, *args, **options):
+        queries = SlowQuery.objects.filter(created_at__gte=timezone.now() - timedelta(hours=options['hours']))
+        worst = queries.values('fingerprint').annotate(
+            count=Count('pk'), total=Sum('duration'), average=Avg('duration'), slowest=Max('duration'),
+        ).order_by('-total')[:options['top']]
+
+        if not worst:
+            self.stdout.write(self.style.WARNING(f'No slow queries in the last {options["hours"]} hours'))
+            return
+
+        for rank, stats in enumerate(worst, 1):
+            executions = queries.filter(fingerprint=stats['fingerprint'])
+            latest = executions.latest('created_at')
+            views = sorted(set(executions.exclude(view='').values_list('view', flat=True)))
+            self.stdout.write(self.style.SUCCESS(
+                f'#{rank} {stats["total"]:.0f}ms total, {stats["count"]} times, '
+                f'{stats["average"]:.0f}ms average, {stats["slowest"]:.0f}ms slowest'
+            ))
+            self.stdout.write(f'  views: {", ".join(views) or "-"}')
+            self.stdout.write(f'  call site: {latest.call_site or "-"}'
+                              f'{f" (serializer {latest.serializer})" if latest.serializer else ""}')
+            self.stdout.write(f'  sql: {latest.sql}')
+            if options['plans']:
+                plan = executions.exclude(plan='').order_by('-created_at').values_list('plan', flat=True).first()
+                self.stdout.write('  plan:\n    ' + (plan or 'not captured').replace('\n', '\n    '))
+            self.stdout.write('')
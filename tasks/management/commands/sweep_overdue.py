@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from tasks import overdue
+
+
+class Command(BaseCommand):
+    help = 'Mark tasks past their deadline as overdue now, or report the periodic sweep\'s progress'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Tasks marked per UPDATE (default: OVERDUE_SWEEP_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--progress',
+            action='store_true',
+            help='Only print the sweep counters and the number of tasks waiting to be marked'
+        )
+
+    def handle(self, *args, **options):
+        if options['progress']:
+            for key, value in sorted(overdue.sweep_progress().items()):
+                self.stdout.write(f'{key}: {value}')
+            return
+
+        # Without a time limit, so a backfill runs to completion
+        marked = overdue.sweep(batch_size=options['batch_size'], max_seconds=float('inf'))
+        self.stdout.write(self.style.SUCCESS(f'Marked {marked} tasks overdue'))
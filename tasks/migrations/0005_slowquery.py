@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-19 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0004_taskmodel_ingest_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fingerprint', models.CharField(max_length=40)),
+                ('sql', models.TextField()),
+                ('params_fingerprint', models.CharField(blank=True, max_length=40)),
+                ('duration', models.FloatField(help_text='Milliseconds')),
+                ('database', models.CharField(max_length=64)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('call_site', models.CharField(blank=True, max_length=500)),
+                ('serializer', models.CharField(blank=True, max_length=255)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['fingerprint', 'created_at'], name='tasks_slowq_fingerp_16574e_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1 on 2026-10-19 01:18
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the task table are built concurrently, which can't run in a transaction, so that writes to it
+    # aren't blocked while they're built
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0005_slowquery'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskmodel',
+            name='overdue',
+            field=models.BooleanField(default=False),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(condition=models.Q(('overdue', True)), fields=['user', 'deadline'], name='task_overdue_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(condition=models.Q(('overdue', False), models.Q(('status', 'completed'), _negated=True)), fields=['deadline'], name='task_overdue_due_idx'),
+        ),
+    ]
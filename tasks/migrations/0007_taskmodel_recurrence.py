@@ -0,0 +1,60 @@
+# Generated by Django 5.1 on 2026-10-19 01:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the task table are built concurrently, which can't run in a transaction, so that writes to it
+    # aren't blocked while they're built. The unique constraint takes over an index built that way.
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0006_taskmodel_overdue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskmodel',
+            name='occurrence',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskmodel',
+            name='recurrence',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='taskmodel',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='overrides', to='tasks.taskmodel'),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(condition=models.Q(('recurrence', ''), _negated=True), fields=['user', 'deadline'], name='task_series_idx'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE UNIQUE INDEX CONCURRENTLY task_series_occurrence_unique '
+                    'ON tasks_taskmodel (series_id, occurrence)',
+                    'DROP INDEX CONCURRENTLY IF EXISTS task_series_occurrence_unique',
+                ),
+                migrations.RunSQL(
+                    'ALTER TABLE tasks_taskmodel ADD CONSTRAINT task_series_occurrence_unique '
+                    'UNIQUE USING INDEX task_series_occurrence_unique',
+                    'ALTER TABLE tasks_taskmodel DROP CONSTRAINT task_series_occurrence_unique',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='taskmodel',
+                    constraint=models.UniqueConstraint(fields=('series', 'occurrence'),
+                                                       name='task_series_occurrence_unique'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.1 on 2026-10-19 01:38
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the task table are built concurrently, which can't run in a transaction, so that writes to it
+    # aren't blocked while they're built
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0007_taskmodel_recurrence'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskmodel',
+            name='tags',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=50), blank=True, default=list, size=None),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='task_tags_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1 on 2026-10-19 01:51
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the task table are built concurrently, which can't run in a transaction, so that writes to it
+    # aren't blocked while they're built
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0009_taskmodel_parent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(fields=['status', 'id'], name='task_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(fields=['priority', 'id'], name='task_priority_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(fields=['deadline'], name='task_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1 on 2026-10-19 02:01
+
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Indexes on the task table are built concurrently, which can't run in a transaction, so that writes to it
+    # aren't blocked while they're built
+    atomic = False
+
+    dependencies = [
+        ('tasks', '0010_admin_filter_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(fields=['user', 'deadline'], name='task_user_deadline_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='taskmodel',
+            index=models.Index(fields=['user', 'created_at'], name='task_user_created_at_idx'),
+        ),
+    ]
@@ -1,5 +1,13 @@
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.conf import settings
+from django.db import connections, models
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
 from users.models import UserModel
+from ustudy_test_task.querysets import estimated_count
 
 
 class PriorityChoiceField(models.TextChoices):
@@ -7,12 +15,136 @@ class PriorityChoiceField(models.TextChoices):
     MEDIUM = 'medium', 'Medium'
     HIGH = 'high', 'High'
 
+class TaskQuerySet(models.QuerySet):
+    def update_returning(self, **fields):
+        """
+        Update the matching rows with a single ``UPDATE ... RETURNING`` and return them as instances.
+
+        Only the given columns are written. Unlike ``update()``, ``auto_now`` fields are bumped too.
+        """
+        meta = self.model._meta
+        for field in meta.concrete_fields:
+            if getattr(field, 'auto_now', False):
+                fields.setdefault(field.name, timezone.now())
+
+        self._for_write = True
+        query = self.query.chain(UpdateQuery)
+        query.add_update_values(fields)
+        connection = connections[self.db]
+        sql, params = query.get_compiler(self.db).as_sql()
+        returning = ', '.join(connection.ops.quote_name(field.column) for field in meta.concrete_fields)
+        with connection.cursor() as cursor:
+            cursor.execute(f'{sql} RETURNING {returning}', params)
+            rows = cursor.fetchall()
+        field_names = [field.attname for field in meta.concrete_fields]
+        return [self.model.from_db(self.db, field_names, row) for row in rows]
+
+    def estimated_count(self, exact_below):
+        """Return ``(count, exact)``, see ``ustudy_test_task.querysets.estimated_count``."""
+        return estimated_count(self, exact_below)
+
+    def transition(self, status, expected=None):
+        """
+        Move the matching tasks to ``status`` with one ``UPDATE ... WHERE status IN (...) RETURNING`` and return them.
+
+        Only tasks in ``expected``, or in any status allowed to move to ``status`` if not given, are moved. The UPDATE
+        checks the status itself, so of two concurrent transitions of a task only one applies. Tasks already in
+        ``status`` aren't written.
+        """
+        sources = [expected] if expected else [source for source, targets in self.model.STATUS_TRANSITIONS.items()
+                                               if status in targets]
+        fields = {'status': status}
+        if status == 'completed':
+            # A completed task is never overdue, like updates through TaskSerializer
+            fields['overdue'] = False
+        return self.filter(status__in=[source for source in sources if source != status]).update_returning(**fields)
+
+    def _subtree_cte(self):
+        # A user's task and its subtasks with their depth below it, stopping at TASK_MAX_DEPTH in case of a cycle
+        table = self.model._meta.db_table
+        return f"""
+            WITH RECURSIVE tree (id, depth) AS (
+                SELECT id, 0 FROM {table} WHERE id = %s AND user_id = %s
+                UNION ALL
+                SELECT child.id, tree.depth + 1 FROM {table} child JOIN tree ON child.parent_id = tree.id
+                WHERE tree.depth < %s
+            )"""
+
+    def subtree(self, pk, user_id):
+        """
+        Return a user's task and all of its subtasks, parents before their subtasks, from one recursive query.
+
+        Every task has a ``depth`` attribute, 0 for the task itself. Empty if the task doesn't exist.
+        """
+        table = self.model._meta.db_table
+        return list(self.raw(
+            f'{self._subtree_cte()} SELECT task.*, tree.depth FROM {table} task JOIN tree ON task.id = tree.id '
+            f'ORDER BY tree.depth, task.id',
+            [pk, user_id, settings.TASK_MAX_DEPTH],
+        ))
+
+    def subtree_ids(self, pk, user_id):
+        """The ids of a user's task and all of its subtasks as a subquery, e.g. to update them with one statement."""
+        return RawSQL(f'{self._subtree_cte()} SELECT id FROM tree', (pk, user_id, settings.TASK_MAX_DEPTH))
+
+    def subtree_progress(self, pk, user_id):
+        """
+        Return the completed and total subtasks of a user's task, directly under it and at any depth.
+
+        Counted by the database in one query without loading the subtasks. None if the task doesn't exist.
+        """
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"""
+                {self._subtree_cte()}
+                SELECT count(*),
+                       count(*) FILTER (WHERE tree.depth = 1),
+                       count(*) FILTER (WHERE tree.depth = 1 AND task.status = 'completed'),
+                       count(*) FILTER (WHERE tree.depth > 0),
+                       count(*) FILTER (WHERE tree.depth > 0 AND task.status = 'completed'),
+                       max(tree.depth)
+                FROM tree JOIN {table} task ON task.id = tree.id
+            """, [pk, user_id, settings.TASK_MAX_DEPTH])
+            found, subtasks, subtasks_completed, descendants, descendants_completed, height = cursor.fetchone()
+        if not found:
+            return None
+        return {
+            'subtasks': subtasks,
+            'subtasks_completed': subtasks_completed,
+            'descendants': descendants,
+            'descendants_completed': descendants_completed,
+            'levels': height,
+        }
+
+    def ancestor_ids(self, pk):
+        """Return the ids of a task, its parent, its parent's parent and so on up to the top-level task."""
+        table = self.model._meta.db_table
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(f"""
+                WITH RECURSIVE ancestors (id, parent_id, depth) AS (
+                    SELECT id, parent_id, 0 FROM {table} WHERE id = %s
+                    UNION ALL
+                    SELECT parent.id, parent.parent_id, ancestors.depth + 1
+                    FROM {table} parent JOIN ancestors ON parent.id = ancestors.parent_id
+                    WHERE ancestors.depth < %s
+                )
+                SELECT id FROM ancestors ORDER BY depth
+            """, [pk, settings.TASK_MAX_DEPTH])
+            return [row[0] for row in cursor.fetchall()]
+
+
 class TaskModel(models.Model):
     STATUS_CHOICES = [
         ('new', 'New'),
         ('in_progress', 'In Progress'),
         ('completed', 'Completed'),
     ]
+    # Statuses a task can move to from each status through the transition endpoints, see TaskQuerySet.transition
+    STATUS_TRANSITIONS = {
+        'new': {'in_progress', 'completed'},
+        'in_progress': {'new', 'completed'},
+        'completed': {'in_progress'},
+    }
 
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True)
@@ -20,9 +152,87 @@ class TaskModel(models.Model):
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
     deadline = models.DateTimeField()
     user = models.ForeignKey(UserModel, on_delete=models.CASCADE, related_name='tasks')
+    # Stored on the row, so lists get them without another query
+    tags = ArrayField(models.CharField(max_length=50), default=list, blank=True)
+    # Tracking id of tasks created through async ingestion, unique so that redelivered messages insert once
+    ingest_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
+    # Set by the overdue sweeper once the deadline passes, see tasks/overdue.py
+    overdue = models.BooleanField(default=False)
+    # RRULE/EXDATE lines of a recurring task, whose deadline is the first occurrence, see tasks/recurrence.py
+    recurrence = models.TextField(blank=True)
+    # A changed occurrence of a recurring task, stored as a row of its own
+    series = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='overrides')
+    occurrence = models.DateTimeField(null=True, blank=True)
+    # Subtasks are deleted with their parent, see TaskQuerySet.subtree for whole trees
+    parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE, related_name='subtasks')
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = TaskQuerySet.as_manager()
+
     def __str__(self):
         return self.title
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'updated_at']),
+            # Deadline and created_at ranges of the list filters, see tasks/filters.py
+            models.Index(fields=['user', 'deadline'], name='task_user_deadline_idx'),
+            models.Index(fields=['user', 'created_at'], name='task_user_created_at_idx'),
+            # ?overdue=true lists, which only ever cover a small part of the table
+            models.Index(fields=['user', 'deadline'], condition=Q(overdue=True), name='task_overdue_idx'),
+            # What the sweeper still has to mark
+            models.Index(fields=['deadline'], condition=Q(overdue=False) & ~Q(status='completed'),
+                         name='task_overdue_due_idx'),
+            # ?tags= filters, `&&` for any and `@>` for all of them
+            GinIndex(fields=['tags'], name='task_tags_idx'),
+            # Recurring tasks of a user, expanded by every windowed list
+            models.Index(fields=['user', 'deadline'], condition=~Q(recurrence=''), name='task_series_idx'),
+            # Django admin filters, read in the id order its pages are keyed by, see tasks/admin.py
+            models.Index(fields=['status', 'id'], name='task_status_idx'),
+            models.Index(fields=['priority', 'id'], name='task_priority_idx'),
+            models.Index(fields=['deadline'], name='task_deadline_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['series', 'occurrence'], name='task_series_occurrence_unique'),
+        ]
+
+
+class TaskTombstone(models.Model):
+    """Marks a deleted task so that delta sync can report the deletion."""
+    task_id = models.BigIntegerField()
+    user = models.ForeignKey(UserModel, on_delete=models.CASCADE, related_name='task_tombstones')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'Task {self.task_id} deleted at {self.deleted_at}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'deleted_at']),
+            models.Index(fields=['deleted_at']),
+        ]
+
+
+class SlowQuery(models.Model):
+    """A query that took longer than SLOW_QUERY_THRESHOLD_MS, see tasks/slow_queries.py."""
+    # Hash of the normalized SQL, groups executions of the same query
+    fingerprint = models.CharField(max_length=40)
+    sql = models.TextField()
+    params_fingerprint = models.CharField(max_length=40, blank=True)
+    duration = models.FloatField(help_text='Milliseconds')
+    database = models.CharField(max_length=64)
+    view = models.CharField(max_length=255, blank=True)
+    call_site = models.CharField(max_length=500, blank=True)
+    serializer = models.CharField(max_length=255, blank=True)
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.duration:.0f}ms {self.sql[:80]}'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['fingerprint', 'created_at']),
+        ]
@@ -0,0 +1,99 @@
+import logging
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .cache import invalidate_tasks
+from .events import TASK_UPDATED, publish_task_events
+from .models import TaskModel
+from .serializers import TaskSerializer
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_KEY = 'overdue-sweep:progress'
+
+
+def sweep(batch_size=None, max_seconds=None):
+    """
+    Mark tasks whose deadline has passed as overdue in batches, returning how many were marked.
+
+    Each batch is one ``UPDATE ... WHERE id IN (SELECT ... LIMIT n FOR UPDATE SKIP LOCKED)``, so locks are held for
+    a single short statement and concurrent sweepers, or a user editing a task, never wait for each other: rows
+    locked elsewhere are skipped and picked up by a later batch or run.
+    """
+    batch_size = batch_size or settings.OVERDUE_SWEEP_BATCH_SIZE
+    deadline = time.monotonic() + (max_seconds or settings.OVERDUE_SWEEP_MAX_SECONDS)
+    started_at = timezone.now()
+    marked = batches = 0
+    while True:
+        batch_started = time.monotonic()
+        # The deadline of a recurring task is its first occurrence, expanded occurrences are checked on read
+        due = TaskModel.objects.filter(overdue=False, deadline__lt=timezone.now(), recurrence='') \
+            .exclude(status='completed')
+        with transaction.atomic():
+            tasks = TaskModel.objects.filter(
+                pk__in=due.select_for_update(skip_locked=True).values('pk')[:batch_size],
+            ).update_returning(overdue=True)
+        marked += len(tasks)
+        batches += 1
+        record_batch(len(tasks), time.monotonic() - batch_started)
+
+        # Like bulk updates in the admin: most swept tasks aren't cached, so drop the cached ones instead of caching
+        # them all, and publish one event call per user
+        invalidate_tasks([task.pk for task in tasks])
+        by_user = defaultdict(list)
+        for task in tasks:
+            by_user[task.user_id].append(task)
+        for user_id, user_tasks in by_user.items():
+            publish_task_events(user_id, TASK_UPDATED, TaskSerializer(user_tasks, many=True).data)
+
+        if len(tasks) < batch_size or time.monotonic() >= deadline:
+            break
+
+    record_run(started_at, marked, batches)
+    logger.info(f'Marked {marked} tasks overdue in {batches} batches')
+    return marked
+
+
+def record_batch(marked, duration):
+    try:
+        pipe = get_redis_connection('default').pipeline()
+        pipe.hincrby(PROGRESS_KEY, 'marked_total', marked)
+        pipe.hincrby(PROGRESS_KEY, 'batches_total', 1)
+        pipe.hset(PROGRESS_KEY, mapping={'last_batch_marked': marked, 'last_batch_ms': round(duration * 1000)})
+        pipe.execute()
+    except RedisError as e:
+        logger.error('Error while recording overdue sweep progress', exc_info=e)
+
+
+def record_run(started_at, marked, batches):
+    try:
+        get_redis_connection('default').hset(PROGRESS_KEY, mapping={
+            'last_run_started_at': started_at.isoformat(),
+            'last_run_finished_at': timezone.now().isoformat(),
+            'last_run_marked': marked,
+            'last_run_batches': batches,
+        })
+    except RedisError as e:
+        logger.error('Error while recording overdue sweep progress', exc_info=e)
+
+
+def sweep_progress():
+    """
+    Return the sweeper's counters, shared by every worker, and how many tasks are due but not marked yet.
+
+    A backlog that keeps growing means the sweep can't keep up with OVERDUE_SWEEP_BATCH_SIZE per statement.
+    """
+    progress = {key.decode(): value.decode() for key, value in
+                get_redis_connection('default').hgetall(PROGRESS_KEY).items()}
+    for key, value in progress.items():
+        if value.lstrip('-').isdigit():
+            progress[key] = int(value)
+    due = TaskModel.objects.filter(overdue=False, deadline__lt=timezone.now(), recurrence='').exclude(status='completed')
+    progress['backlog'] = due.count()
+    return progress
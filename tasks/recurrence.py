@@ -0,0 +1,131 @@
+"""
+Recurring tasks.
+
+A recurring task is a single row, the series, whose `recurrence` holds RFC 5545 `RRULE`/`EXDATE` lines and whose
+deadline is the first occurrence. Occurrences are expanded on read for the window a list asks for and only become
+rows, overrides pointing back at the series, when one is changed. Deleting an occurrence adds an `EXDATE`.
+"""
+from datetime import datetime, timezone as dt_timezone
+
+from dateutil.rrule import rrulestr
+from django.conf import settings
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+from django.utils import timezone
+
+from .models import TaskModel
+
+OCCURRENCE_FORMAT = '%Y%m%dT%H%M%SZ'
+# Finer frequencies could expand into millions of occurrences per window
+FREQUENCIES = {'DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY'}
+
+
+def normalize(recurrence):
+    """
+    Validate a recurrence and return it as `RRULE:`/`EXDATE:` lines, raising ValueError if it is invalid.
+
+    A bare rule like `FREQ=WEEKLY;BYDAY=MO,WE` is accepted as the `RRULE`. The start is always the task's deadline.
+    """
+    lines = [line.strip() for line in recurrence.strip().splitlines() if line.strip()]
+    if lines and ':' not in lines[0]:
+        lines[0] = f'RRULE:{lines[0]}'
+    rules = [line for line in lines if line.upper().startswith('RRULE:')]
+    if len(rules) != 1:
+        raise ValueError('Exactly one RRULE is required')
+    if any(not line.upper().startswith(('RRULE:', 'EXDATE:')) for line in lines):
+        raise ValueError('Only RRULE and EXDATE lines are supported, the deadline is the first occurrence')
+    parts = dict(part.split('=', 1) for part in rules[0][6:].upper().split(';') if '=' in part)
+    if parts.get('FREQ') not in FREQUENCIES:
+        raise ValueError(f'FREQ must be one of {", ".join(sorted(FREQUENCIES))}')
+    recurrence = '\n'.join(lines)
+    parse(recurrence, timezone.now())
+    return recurrence
+
+
+def parse(recurrence, start):
+    try:
+        # Expanded in local time, so that occurrences keep their wall clock time across DST changes
+        return rrulestr(recurrence, dtstart=timezone.localtime(start), forceset=True)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f'Invalid recurrence: {e}') from e
+
+
+def occurrence_key(occurrence):
+    return occurrence.astimezone(dt_timezone.utc).strftime(OCCURRENCE_FORMAT)
+
+
+def parse_occurrence_key(key):
+    """Return the occurrence a key like `20250301T040000Z` stands for, or None if it is malformed."""
+    try:
+        return datetime.strptime(key, OCCURRENCE_FORMAT).replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        return None
+
+
+def is_occurrence(series, occurrence):
+    return occurrence in parse(series.recurrence, series.deadline)
+
+
+def occurrences(series, start, end):
+    """Occurrences of a series in `[start, end]`, at most TASK_RECURRENCE_MAX_OCCURRENCES."""
+    found = []
+    for occurrence in parse(series.recurrence, series.deadline).xafter(start, settings.TASK_RECURRENCE_MAX_OCCURRENCES,
+                                                                       inc=True):
+        if occurrence > end:
+            break
+        found.append(occurrence)
+    return found
+
+
+def expand(series_tasks, start, end, overdue=None):
+    """
+    Serialize the occurrences of `series_tasks` in `[start, end]` that weren't changed, in chronological order.
+
+    Each series is serialized once, occurrences are copies with their own deadline, no id, and the `series` and
+    `occurrence` keys that address them. `overdue` filters them like the list's query filters rows, the series are
+    already filtered by everything else.
+    """
+    # Imported here as the serializers validate recurrences with this module
+    from .serializers import TaskSerializer
+
+    series_tasks = list(series_tasks)
+    overridden = set(TaskModel.objects.filter(
+        series__in=series_tasks, occurrence__range=(start, end),
+    ).values_list('series_id', 'occurrence'))
+    now = timezone.now()
+
+    expanded = []
+    for series in series_tasks:
+        data = dict(TaskSerializer(series).data)
+        for occurrence in occurrences(series, start, end):
+            if (series.pk, occurrence) in overridden:
+                continue
+            is_overdue = occurrence < now and series.status != 'completed'
+            if overdue is not None and is_overdue != overdue:
+                continue
+            expanded.append((occurrence, {
+                **data,
+                'id': None,
+                'recurrence': '',
+                'series': series.pk,
+                'occurrence': occurrence_key(occurrence),
+                'deadline': isoformat(occurrence),
+                'overdue': is_overdue,
+            }))
+    expanded.sort(key=lambda item: item[0])
+    return [data for _, data in expanded]
+
+
+def isoformat(occurrence):
+    # What DateTimeField.to_representation returns, occurrences are already in the current time zone. Calling it for
+    # every occurrence would look the time zone up every time, which took most of the time of a year's expansion.
+    value = occurrence.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def exclude_occurrence(series_id, occurrence):
+    """Add an `EXDATE` to the series with a single UPDATE, so concurrent deletes of occurrences don't race."""
+    TaskModel.objects.filter(pk=series_id).update(
+        recurrence=Concat(F('recurrence'), Value(f'\nEXDATE:{occurrence_key(occurrence)}')),
+        updated_at=timezone.now(),
+    )
@@ -0,0 +1,630 @@
+"""
+OpenAPI descriptions of the task views, imported only when the API docs are generated, see ustudy_test_task/docs.py.
+
+Each is the keyword arguments of drf_yasg's `swagger_auto_schema` for one view method.
+"""
+from drf_yasg import openapi
+
+from .serializers import TaskSerializer
+
+
+# Query parameters of tasks.filters.TaskFilterBackend, shared by the task lists
+task_filter_parameters = [
+    openapi.Parameter(
+        'status', openapi.IN_QUERY,
+        description="Filter tasks by status (new, in_progress, completed), comma-separated or repeated for any of "
+                    "several",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        'priority', openapi.IN_QUERY,
+        description="Filter tasks by priority (low, medium, high), comma-separated or repeated for any of several",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        'tags', openapi.IN_QUERY,
+        description="Comma-separated tags, tasks with all of them are listed",
+        type=openapi.TYPE_STRING
+    ),
+    openapi.Parameter(
+        'tags_match', openapi.IN_QUERY,
+        description="`all` (default) lists tasks with all of the tags, `any` tasks with at least one",
+        type=openapi.TYPE_STRING, enum=['all', 'any']
+    ),
+    openapi.Parameter(
+        'year', openapi.IN_QUERY,
+        description="Filter tasks by deadline year",
+        type=openapi.TYPE_INTEGER
+    ),
+    openapi.Parameter(
+        'month', openapi.IN_QUERY,
+        description="Filter tasks by deadline month, with year",
+        type=openapi.TYPE_INTEGER
+    ),
+    openapi.Parameter(
+        'day', openapi.IN_QUERY,
+        description="Filter tasks by deadline day, with year and month",
+        type=openapi.TYPE_INTEGER
+    ),
+    openapi.Parameter(
+        'deadline_after', openapi.IN_QUERY,
+        description="Tasks due at or after this ISO 8601 date or datetime, combined with year, month and day",
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+    ),
+    openapi.Parameter(
+        'deadline_before', openapi.IN_QUERY,
+        description="Tasks due before this ISO 8601 date or datetime",
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+    ),
+    openapi.Parameter(
+        'created_after', openapi.IN_QUERY,
+        description="Tasks created at or after this ISO 8601 date or datetime",
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+    ),
+    openapi.Parameter(
+        'created_before', openapi.IN_QUERY,
+        description="Tasks created before this ISO 8601 date or datetime",
+        type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+    ),
+    openapi.Parameter(
+        'overdue', openapi.IN_QUERY,
+        description="Filter tasks marked overdue, which happens within a minute of their deadline passing",
+        type=openapi.TYPE_BOOLEAN
+    ),
+    openapi.Parameter(
+        'ordering', openapi.IN_QUERY,
+        description="Comma-separated fields to sort by, `-` for descending: id, title, deadline, created_at, "
+                    "updated_at, priority, status",
+        type=openapi.TYPE_STRING
+    ),
+]
+
+
+task_list_get = dict(
+    tags=['Tasks'],
+    operation_id='List tasks',
+    operation_description='List all tasks. With both ends of a deadline range, from `year`, `month`, `day`, '
+                          '`deadline_after` or `deadline_before`, recurring tasks are listed as their occurrences in '
+                          'the range, which have no id and are addressed by `series` and `occurrence`.',
+    manual_parameters=[
+        *task_filter_parameters,
+        openapi.Parameter(
+            'ids', openapi.IN_QUERY,
+            description="Comma-separated task ids to fetch in one request, other filters are ignored",
+            type=openapi.TYPE_STRING
+        ),
+        openapi.Parameter(
+            'updated_since', openapi.IN_QUERY,
+            description="Delta sync: only return tasks changed and ids deleted after this ISO 8601 cursor. "
+                        "The response contains the cursor for the next sync, which overlaps with this one, so "
+                        "apply tasks and deletions by id. Cannot be combined with filters.",
+            type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME
+        )
+    ],
+    responses={
+        200: openapi.Response('List of tasks', TaskSerializer(many=True)),
+        400: openapi.Response('Invalid filter', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Invalid status filter. Use new, '
+                                                                               'in_progress, completed.')
+            }
+        )),
+        410: openapi.Response('Sync cursor expired', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Sync cursor expired, re-download all tasks')
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        404: openapi.Response('No tasks found', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='No tasks found')
+            }
+        )),
+        500: openapi.Response('Internal server error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Internal server error')
+            }
+        )),
+    }
+)
+
+
+task_list_post = dict(
+    tags=['Tasks'],
+    operation_id='Create a task',
+    operation_description='Create a task. With `Prefer: respond-async` the task is validated and queued, and '
+                          'inserted in the background; poll the Location of the 202 response for its status.',
+    request_body=TaskSerializer,
+    manual_parameters=[
+        openapi.Parameter(
+            'Prefer', openapi.IN_HEADER,
+            description="respond-async to queue the task instead of inserting it during the request",
+            type=openapi.TYPE_STRING
+        ),
+    ],
+    responses={
+        201: openapi.Response('Task created', TaskSerializer),
+        202: openapi.Response('Task queued', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'tracking_id': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
+                'status': openapi.Schema(type=openapi.TYPE_STRING, description='pending'),
+            }
+        )),
+        400: openapi.Response('Validation error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+    }
+)
+
+
+task_detail_get = dict(
+    tags=['Tasks'],
+    operation_id='Get a task',
+    operation_description='Get a task',
+    responses={
+        200: openapi.Response('Task details', TaskSerializer),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        404: openapi.Response('Task does not exist', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
+            }
+        )),
+    }
+)
+
+
+task_detail_put = dict(
+    tags=['Tasks'],
+    operation_id='Update a task',
+    operation_description='Update a task',
+    request_body=TaskSerializer,
+    responses={
+        200: openapi.Response('Task updated', TaskSerializer),
+        400: openapi.Response('Validation error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        404: openapi.Response('Task does not exist', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
+            }
+        )),
+    }
+)
+
+
+task_detail_patch = dict(
+    tags=['Tasks'],
+    operation_id='Partial update a task',
+    operation_description='Partial update a task',
+    request_body=TaskSerializer,
+    responses={
+        200: openapi.Response('Task updated', TaskSerializer),
+        400: openapi.Response('Validation error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        404: openapi.Response('Task does not exist', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
+            }
+        )),
+    }
+)
+
+
+task_detail_delete = dict(
+    tags=['Tasks'],
+    operation_id='Delete a task',
+    operation_description='Delete a task',
+    responses={
+        204: openapi.Response('Task deleted', None),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        404: openapi.Response('Task does not exist', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
+            }
+        )),
+        500: openapi.Response('Internal server error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Internal server error')
+            }
+        )),
+    }
+)
+
+
+occurrence_parameter = openapi.Parameter(
+    'occurrence', openapi.IN_PATH,
+    description="UTC start of the occurrence as listed in its `occurrence` key, like 20250301T040000Z",
+    type=openapi.TYPE_STRING
+)
+occurrence_responses = {
+    400: openapi.Response('Validation error', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+        }
+    )),
+    401: openapi.Response('Unauthorized', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                     description='Authentication credentials were not provided.')
+        }
+    )),
+    404: openapi.Response('Occurrence does not exist', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Occurrence does not exist')
+        }
+    )),
+}
+
+
+task_occurrence_put = dict(
+    tags=['Tasks'],
+    operation_id='Update an occurrence',
+    operation_description='Update one occurrence of a recurring task. The first change stores it as a task of its '
+                          'own, with `series` and `occurrence` pointing back at the recurring task.',
+    manual_parameters=[occurrence_parameter],
+    request_body=TaskSerializer,
+    responses={200: openapi.Response('Occurrence updated', TaskSerializer), **occurrence_responses},
+)
+
+
+task_occurrence_patch = dict(
+    tags=['Tasks'],
+    operation_id='Partial update an occurrence',
+    operation_description='Partially update one occurrence of a recurring task, see PUT',
+    manual_parameters=[occurrence_parameter],
+    request_body=TaskSerializer,
+    responses={200: openapi.Response('Occurrence updated', TaskSerializer), **occurrence_responses},
+)
+
+
+task_occurrence_delete = dict(
+    tags=['Tasks'],
+    operation_id='Delete an occurrence',
+    operation_description='Skip one occurrence of a recurring task',
+    manual_parameters=[occurrence_parameter],
+    responses={204: openapi.Response('Occurrence deleted', None),
+               **{code: response for code, response in occurrence_responses.items() if code != 400}},
+)
+
+
+task_not_found_responses = {
+    401: openapi.Response('Unauthorized', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                     description='Authentication credentials were not provided.')
+        }
+    )),
+    404: openapi.Response('Task does not exist', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
+        }
+    )),
+}
+progress_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'subtasks': openapi.Schema(type=openapi.TYPE_INTEGER, description='Subtasks directly under the task'),
+        'subtasks_completed': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'descendants': openapi.Schema(type=openapi.TYPE_INTEGER, description='Subtasks at any depth'),
+        'descendants_completed': openapi.Schema(type=openapi.TYPE_INTEGER),
+    }
+)
+
+
+task_subtree_get = dict(
+    tags=['Tasks'],
+    operation_id='Get a task tree',
+    operation_description='A task with its subtasks nested under it at every level, in `subtasks`, each with the '
+                          'completed and total counts of its subtasks in `progress`. Loaded with one query.',
+    responses={
+        200: openapi.Response('Task tree', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'subtasks': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                                           description='The same structure for every subtask'),
+                'progress': progress_schema,
+            }
+        )),
+        **task_not_found_responses,
+    }
+)
+
+
+task_progress_get = dict(
+    tags=['Tasks'],
+    operation_id='Get task progress',
+    operation_description='Completed and total subtasks of a task, counted without loading them',
+    responses={
+        200: openapi.Response('Progress', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                **progress_schema.properties,
+                'levels': openapi.Schema(type=openapi.TYPE_INTEGER, description='Levels of subtasks below the task'),
+            }
+        )),
+        **task_not_found_responses,
+    }
+)
+
+
+task_subtree_status_post = dict(
+    tags=['Tasks'],
+    operation_id='Set the status of a task tree',
+    operation_description='Set the status of a task and all of its subtasks with a single UPDATE',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['status'],
+        properties={
+            'status': openapi.Schema(type=openapi.TYPE_STRING, enum=['new', 'in_progress', 'completed']),
+        }
+    ),
+    responses={
+        200: openapi.Response('Tasks updated', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'updated': openapi.Schema(type=openapi.TYPE_INTEGER, description='Tasks updated'),
+            }
+        )),
+        400: openapi.Response('Validation error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+            }
+        )),
+        **task_not_found_responses,
+    }
+)
+
+
+transition_properties = {
+    'status': openapi.Schema(type=openapi.TYPE_STRING, enum=['new', 'in_progress', 'completed'],
+                             description='Status to move to'),
+    'expected': openapi.Schema(type=openapi.TYPE_STRING, enum=['new', 'in_progress', 'completed'],
+                               description='Only move tasks still in this status, any status allowed to move to '
+                                           '`status` if omitted'),
+}
+transition_responses = {
+    200: openapi.Response('Tasks moved', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'updated': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                                      description='Tasks moved to the status'),
+            'unchanged': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER),
+                                        description='Ids of tasks already in the status, which were not written'),
+        }
+    )),
+    400: openapi.Response('Validation error', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_OBJECT, description='Validation errors')
+        }
+    )),
+    409: openapi.Response('Conflict, no task was moved', openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'detail': openapi.Schema(type=openapi.TYPE_STRING),
+            'conflicts': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'status': openapi.Schema(type=openapi.TYPE_STRING, description='Current status'),
+                }
+            )),
+        }
+    )),
+    **task_not_found_responses,
+}
+
+
+task_transition_post = dict(
+    tags=['Tasks'],
+    operation_id='Transition a task',
+    operation_description='Move a task along `new -> in_progress -> completed`, back to `new` from `in_progress`, or '
+                          'reopen it from `completed` to `in_progress`, with a single conditional UPDATE. A task '
+                          'that changed status concurrently is a 409, one already in the status is left unchanged.',
+    request_body=openapi.Schema(type=openapi.TYPE_OBJECT, required=['status'], properties=transition_properties),
+    responses=transition_responses,
+)
+
+
+task_transitions_post = dict(
+    tags=['Tasks'],
+    operation_id='Transition tasks',
+    operation_description='Move many tasks with one conditional UPDATE, all of them or, if any conflicts, none',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['ids', 'status'],
+        properties={
+            'ids': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_INTEGER)),
+            **transition_properties,
+        }
+    ),
+    responses=transition_responses,
+)
+
+
+task_events_get = dict(
+    tags=['Tasks'],
+    operation_id='Task events',
+    operation_description='Server-Sent Events stream of created, updated and deleted tasks of the current user. '
+                          'Send the Last-Event-ID header to resume after a reconnect. Requires ASGI.',
+    manual_parameters=[
+        openapi.Parameter(
+            'Last-Event-ID', openapi.IN_HEADER,
+            description="Id of the last event received, buffered events after it are replayed first. If some of "
+                        "them are no longer buffered, a `reset` event is sent instead and the tasks should be "
+                        "reloaded",
+            type=openapi.TYPE_INTEGER
+        ),
+    ],
+    responses={
+        200: openapi.Response('Event stream', openapi.Schema(type=openapi.TYPE_STRING)),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+    }
+)
+
+
+task_ingest_status_get = dict(
+    tags=['Tasks'],
+    operation_id='Get task ingestion status',
+    operation_description='Status of a task created with `Prefer: respond-async`: pending, created or failed',
+    responses={
+        200: openapi.Response('Ingestion status', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'tracking_id': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_UUID),
+                'status': openapi.Schema(type=openapi.TYPE_STRING, description='pending, created or failed'),
+                'task_id': openapi.Schema(type=openapi.TYPE_INTEGER, description='Id of the created task'),
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        404: openapi.Response('Unknown tracking id', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Unknown tracking id')
+            }
+        )),
+    }
+)
+
+
+admin_task_list_get = dict(
+    tags=['Tasks'],
+    operation_id='List all tasks (admin)',
+    operation_description='List all tasks for super admin, or a page of them with `limit`, `after` or `page`. The '
+                          '`X-Total-Count` header and `metadata.total` hold the number of all matching tasks, for '
+                          'pages of large results estimated by the query planner; `X-Total-Count-Exact` and '
+                          '`metadata.total_is_exact` tell whether it is exact. The `Link` header and `metadata.next` '
+                          'hold the URL of the next page.',
+    manual_parameters=[
+        *task_filter_parameters,
+        openapi.Parameter(
+            'limit', openapi.IN_QUERY,
+            description="Return a page of this many tasks, at most 1000. Pages of `after` or `page` hold 100 by "
+                        "default",
+            type=openapi.TYPE_INTEGER
+        ),
+        openapi.Parameter(
+            'after', openapi.IN_QUERY,
+            description="Return the tasks after this id, as given by the next page URL",
+            type=openapi.TYPE_INTEGER
+        ),
+        openapi.Parameter(
+            'page', openapi.IN_QUERY,
+            description="Page number of a list sorted with `ordering`, which is paged by number instead of by id",
+            type=openapi.TYPE_INTEGER
+        ),
+    ],
+    responses={
+        200: openapi.Response('List of all tasks', TaskSerializer(many=True)),
+        400: openapi.Response('Invalid filter', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Invalid status filter. Use new, '
+                                                                               'in_progress, completed.')
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+        403: openapi.Response('Forbidden', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='You do not have permission to perform this action.')
+            }
+        )),
+        404: openapi.Response('No tasks found', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='No tasks found')
+            }
+        )),
+        500: openapi.Response('Internal server error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Internal server error')
+            }
+        )),
+    }
+)
@@ -1,14 +1,16 @@
+from django.conf import settings
 from django.utils import timezone
 
 from rest_framework import serializers
+from . import recurrence
 from .models import TaskModel
 
 
 class TaskSerializer(serializers.ModelSerializer):
     class Meta:
         model = TaskModel
-        fields = '__all__'
-        read_only_fields = ('id', 'user', 'created_at', 'updated_at')
+        exclude = ('ingest_id',)
+        read_only_fields = ('id', 'user', 'overdue', 'series', 'occurrence', 'created_at', 'updated_at')
 
     def validate_deadline(self, value):
         if value < timezone.now():
@@ -20,15 +22,71 @@ class TaskSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError('Status must be new, in_progress or completed')
         return value
 
+    def validate_tags(self, value):
+        # Compared case-insensitively, so stored in lower case and once
+        tags = list(dict.fromkeys(tag.strip().lower() for tag in value if tag.strip()))
+        if len(tags) > settings.TASK_MAX_TAGS:
+            raise serializers.ValidationError(f'A task can have at most {settings.TASK_MAX_TAGS} tags')
+        return tags
+
+    def validate_parent(self, value):
+        if value is None:
+            return value
+        user = self.context['request'].user
+        if value.user_id != user.pk:
+            raise serializers.ValidationError('Parent task does not exist')
+        # The updated task, if any, must not end up under itself, and the tree within TASK_MAX_DEPTH levels
+        task_id = self.context.get('task_id')
+        ancestors = TaskModel.objects.ancestor_ids(value.pk)
+        if task_id in ancestors:
+            raise serializers.ValidationError('A task cannot be a subtask of itself or of its subtasks')
+        progress = TaskModel.objects.subtree_progress(task_id, user.pk) if task_id else None
+        if len(ancestors) + (progress['levels'] if progress else 0) > settings.TASK_MAX_DEPTH:
+            raise serializers.ValidationError(f'Tasks can be nested at most {settings.TASK_MAX_DEPTH} levels deep')
+        return value
+
+    def validate_recurrence(self, value):
+        if not value:
+            return ''
+        try:
+            return recurrence.normalize(value)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+
+    def validate(self, attrs):
+        # A new deadline is in the future and a completed task is never overdue. Clearing the flag here lets updates
+        # stay a single UPDATE, the sweeper marks the task again if it becomes overdue.
+        if 'deadline' in attrs or attrs.get('status') == 'completed':
+            attrs['overdue'] = False
+        return attrs
+
     def create(self, validated_data):
         task = TaskModel.objects.create(user=self.context['request'].user, **validated_data)
         return task
 
     def update(self, instance, validated_data):
-        instance.title = validated_data.get('title', instance.title)
-        instance.description = validated_data.get('description', instance.description)
-        instance.status = validated_data.get('status', instance.status)
-        instance.deadline = validated_data.get('deadline', instance.deadline)
-        instance.save()
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        instance.save(update_fields=[*validated_data, 'updated_at'])
         return instance
 
+
+
+class TaskTransitionSerializer(serializers.Serializer):
+    """A status transition of some of the user's tasks, optionally only from the status the client last saw."""
+    ids = serializers.ListField(child=serializers.IntegerField(), min_length=1)
+    status = serializers.ChoiceField(choices=TaskModel.STATUS_CHOICES)
+    expected = serializers.ChoiceField(choices=TaskModel.STATUS_CHOICES, required=False)
+
+    def validate_ids(self, value):
+        if len(value) > settings.TASK_TRANSITION_MAX_IDS:
+            raise serializers.ValidationError(f'At most {settings.TASK_TRANSITION_MAX_IDS} tasks can be transitioned '
+                                              f'at once')
+        return list(dict.fromkeys(value))
+
+    def validate(self, attrs):
+        # Expecting the target status is a no-op rather than an error, so that retries are safe
+        expected = attrs.get('expected')
+        if expected and expected != attrs['status'] and attrs['status'] not in TaskModel.STATUS_TRANSITIONS[expected]:
+            raise serializers.ValidationError(f'Tasks cannot move from {expected} to {attrs["status"]}')
+        return attrs
@@ -0,0 +1,131 @@
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, connections, transaction
+from django.utils import timezone
+from rest_framework.serializers import BaseSerializer
+
+from .models import SlowQuery
+
+logger = logging.getLogger(__name__)
+
+# Recording runs off the request thread, on its own connection, so it neither slows the request down nor gets rolled
+# back with it
+executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query')
+# Slow queries are dropped rather than queued without bound while the database struggles
+pending = threading.BoundedSemaphore(100)
+
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+VALUE_LIST = re.compile(r'\(\s*(?:(?:%s|\?)\s*,\s*)+(?:%s|\?)\s*\)')
+WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_sql(sql):
+    """Replace literals with `?` and collapse `IN` lists, so executions of the same query look alike."""
+    sql = STRING_LITERAL.sub('?', sql)
+    sql = NUMBER_LITERAL.sub('?', sql)
+    sql = VALUE_LIST.sub('(...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def fingerprint(value):
+    return hashlib.sha1(repr(value).encode()).hexdigest()
+
+
+def call_site():
+    """Return the innermost project frame outside this module as `path:line in function`, and the serializer class."""
+    site, serializer = '', ''
+    frame = sys._getframe(1)
+    while frame is not None and not (site and serializer):
+        filename = frame.f_code.co_filename
+        if not site and filename.startswith(str(settings.BASE_DIR)) and filename != __file__ \
+                and 'site-packages' not in filename:
+            site = f'{os.path.relpath(filename, settings.BASE_DIR)}:{frame.f_lineno} in {frame.f_code.co_qualname}'
+        if not serializer and isinstance(frame.f_locals.get('self'), BaseSerializer):
+            serializer = type(frame.f_locals['self']).__name__
+        frame = frame.f_back
+    return site, serializer
+
+
+class SlowQueryRecorder:
+    """Execute wrapper timing every query, see `django.db.backends.base.base.BaseDatabaseWrapper.execute_wrapper`."""
+
+    def __init__(self, request):
+        self.request = request
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            if duration >= settings.SLOW_QUERY_THRESHOLD_MS:
+                view = getattr(self.request.resolver_match, 'view_name', '') or ''
+                site, serializer = call_site()
+                capture(context['connection'].alias, sql, params, many, duration, view, site, serializer)
+
+
+def capture(alias, sql, params, many, duration, view, site, serializer):
+    if not pending.acquire(blocking=False):
+        logger.warning(f'Dropping slow query, too many are pending: {duration:.0f}ms {sql[:200]}')
+        return
+    future = executor.submit(record, alias, sql, params, many, duration, view, site, serializer)
+    future.add_done_callback(lambda _: pending.release())
+
+
+def record(alias, sql, params, many, duration, view, site, serializer):
+    """Store a slow query, with an `EXPLAIN (ANALYZE, BUFFERS)` plan unless one of the same query is recent."""
+    try:
+        normalized = normalize_sql(sql)
+        query = SlowQuery.objects.create(
+            fingerprint=fingerprint(normalized),
+            sql=normalized,
+            params_fingerprint=fingerprint(params) if params else '',
+            duration=duration,
+            database=alias,
+            view=view[:255],
+            call_site=site[:500],
+            serializer=serializer[:255],
+        )
+        logger.warning(f'Slow query ({duration:.0f}ms) in {view or "unknown view"} at {site}: {normalized[:200]}')
+
+        recently_explained = SlowQuery.objects.filter(
+            fingerprint=query.fingerprint,
+            created_at__gte=timezone.now() - timedelta(seconds=settings.SLOW_QUERY_EXPLAIN_INTERVAL),
+        ).exclude(plan='').exists()
+        if settings.SLOW_QUERY_EXPLAIN and not many and not recently_explained and is_explainable(alias, sql):
+            try:
+                query.plan = explain(alias, sql, params)
+            except DatabaseError as e:
+                query.plan = f'EXPLAIN failed: {e}'
+            query.save(update_fields=['plan'])
+
+        # Keep a ring buffer of the latest SLOW_QUERY_MAX_ROWS
+        SlowQuery.objects.filter(pk__lte=query.pk - settings.SLOW_QUERY_MAX_ROWS).delete()
+    except DatabaseError as e:
+        logger.error('Error while recording slow query', exc_info=e)
+    finally:
+        connections.close_all()
+
+
+def is_explainable(alias, sql):
+    # EXPLAIN ANALYZE runs the statement again, which only reads are safe for
+    return connections[alias].vendor == 'postgresql' and sql.lstrip()[:6].upper() == 'SELECT'
+
+
+def explain(alias, sql, params):
+    with transaction.atomic(using=alias), connections[alias].cursor() as cursor:
+        cursor.execute("SELECT set_config('statement_timeout', %s, true)", [str(settings.SLOW_QUERY_EXPLAIN_TIMEOUT_MS)])
+        cursor.execute(f'EXPLAIN (ANALYZE, BUFFERS) {sql}', params)
+        plan = '\n'.join(row[0] for row in cursor.fetchall())
+        transaction.set_rollback(True, using=alias)
+    return plan
@@ -1,2 +1,40 @@
+import logging
+from datetime import timedelta
+
 from celery import shared_task
-from .models import TaskModel
\ No newline at end of file
+from django.conf import settings
+from django.utils import timezone
+# Configures the app that shared tasks are sent through
+from ustudy_test_task.celery import app  # noqa: F401
+
+from . import ingest, overdue
+from .models import TaskModel, TaskTombstone
+
+logger = logging.getLogger(__name__)
+
+
+@shared_task
+def purge_task_tombstones(batch_size=10000):
+    """Delete tombstones older than the retention window in batches; older sync cursors get a 410."""
+    cutoff = timezone.now() - timedelta(days=settings.TASK_TOMBSTONE_RETENTION_DAYS)
+    expired = TaskTombstone.objects.filter(deleted_at__lt=cutoff)
+    total = 0
+    while True:
+        deleted, _ = TaskTombstone.objects.filter(pk__in=expired.values('pk')[:batch_size]).delete()
+        total += deleted
+        if deleted < batch_size:
+            break
+    logger.info(f'Purged {total} task tombstones older than {cutoff.isoformat()}')
+    return total
+
+
+@shared_task
+def drain_task_ingest():
+    """Insert tasks queued with `Prefer: respond-async`, see `tasks.ingest.drain`."""
+    return ingest.drain()
+
+
+@shared_task
+def sweep_overdue_tasks():
+    """Mark tasks past their deadline as overdue, see `tasks.overdue.sweep`."""
+    return overdue.sweep()
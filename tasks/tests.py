@@ -1,15 +1,44 @@
-from django.test import TestCase
+import itertools
+import json
+import tempfile
+import threading
+import time
+import tracemalloc
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+import msgpack
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections, transaction
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
+from rest_framework.response import Response
 from rest_framework.test import APIClient
-from datetime import datetime, timedelta
+from rest_framework_simplejwt.tokens import RefreshToken
+from datetime import datetime, timedelta, timezone as dt_timezone
 from users.models import UserModel
-from .models import TaskModel
+from ustudy_test_task import admission, memory, profiling, routers
+from ustudy_test_task.renderers import ApiRenderer, OrjsonApiRenderer
+from . import ingest, overdue, slow_queries
+from .events import TASK_CREATED, publish_task_event
+from .models import SlowQuery, TaskModel, TaskTombstone
+from .tasks import purge_task_tombstones, sweep_overdue_tasks
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 
 class TaskTests(TestCase):
     def setUp(self):
+        cache.delete_pattern('task:*')
         self.client = APIClient()
         self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
         self.client.force_authenticate(user=self.user)
@@ -74,3 +103,1582 @@ class TaskTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(TaskModel.objects.count(), 0)
 
+    def test_partial_update_writes_only_changed_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(self.task_detail_url(self.task.pk), {'priority': 'high'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['priority'], 'high')
+        self.assertEqual(response.data['title'], 'Test Task')
+
+        self.assertEqual(len(queries), 1)
+        sql = queries[0]['sql']
+        self.assertTrue(sql.startswith('UPDATE'))
+        self.assertIn('"priority"', sql.split('WHERE')[0])
+        self.assertNotIn('"title"', sql.split('WHERE')[0])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.priority, 'high')
+
+    def test_update_and_delete_other_users_task(self):
+        other_user = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=other_user)
+        response = self.client.patch(self.task_detail_url(self.task.pk), {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.delete(self.task_detail_url(self.task.pk))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'new')
+
+
+
+@override_settings(REPLICA_DATABASES=['replica_test'], REPLICA_PIN_SECONDS=60)
+class ReplicaRoutingTests(TestCase):
+    databases = {'default', 'replica_test'}
+
+    def setUp(self):
+        routers._replica_health.clear()
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        UserModel.objects.using('replica_test').create(pk=self.user.pk, username='testuser')
+        self.client.force_authenticate(user=self.user)
+        self.task_list_url = reverse('task-list')
+        deadline = timezone.now() + timedelta(days=1)
+
+        # The two databases disagree, as a lagging replica would
+        TaskModel.objects.create(user=self.user, title='Primary task', deadline=deadline)
+        TaskModel.objects.using('replica_test').create(user_id=self.user.pk, title='Replica task', deadline=deadline)
+
+    def test_reads_go_to_replica(self):
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data[0]['title'], 'Replica task')
+
+    def test_writes_pin_client_to_primary(self):
+        data = {'title': 'New Task', 'deadline': (timezone.now() + timedelta(days=2)).isoformat()}
+        response = self.client.post(self.task_list_url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn('replica_pin', response.cookies)
+
+        response = self.client.get(self.task_list_url)
+        self.assertEqual({task['title'] for task in response.data}, {'Primary task', 'New Task'})
+
+    def test_pin_expires(self):
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            task = TaskModel.objects.get(title='Primary task')
+            response = self.client.patch(reverse('task-detail', args=[task.pk]), {'status': 'completed'},
+                                         format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(response.data[0]['title'], 'Replica task')
+
+    def test_batch_reads_go_to_replica(self):
+        response = self.client.post(reverse('batch'), {'requests': [{'method': 'GET', 'path': self.task_list_url}]},
+                                    format='json')
+        self.assertEqual(response.data[0]['data'][0]['title'], 'Replica task')
+        self.assertNotIn('replica_pin', response.cookies)
+
+    def test_batch_reads_after_writes_go_to_primary(self):
+        data = {'title': 'New Task', 'deadline': (timezone.now() + timedelta(days=2)).isoformat()}
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'method': 'POST', 'path': self.task_list_url, 'body': data},
+            {'method': 'GET', 'path': self.task_list_url},
+        ]}, format='json')
+        self.assertEqual({task['title'] for task in response.data[1]['data']}, {'Primary task', 'New Task'})
+        self.assertIn('replica_pin', response.cookies)
+
+    def test_unhealthy_replica_falls_back_to_primary(self):
+        with mock.patch.object(connections['replica_test'], 'cursor', side_effect=OperationalError):
+            self.assertFalse(routers.replica_is_healthy('replica_test'))
+            response = self.client.get(self.task_list_url)
+        self.assertEqual(response.data[0]['title'], 'Primary task')
+
+
+class TaskEventsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.access_token = str(RefreshToken.for_user(self.user).access_token)
+
+        self.redis = get_redis_connection('default')
+        self.buffer_key = f'task-events:{self.user.pk}:buffer'
+        self.redis.delete(f'task-events:{self.user.pk}:seq', self.buffer_key)
+
+    def buffered_events(self):
+        return [json.loads(message) for message in self.redis.lrange(self.buffer_key, 0, -1)]
+
+    def publish(self, title):
+        # Events are published on commit
+        with self.captureOnCommitCallbacks(execute=True):
+            publish_task_event(self.user.pk, TASK_CREATED, {'title': title})
+
+    def test_write_paths_publish_events(self):
+        data = {'title': 'New Task', 'deadline': (timezone.now() + timedelta(days=2)).isoformat()}
+        with self.captureOnCommitCallbacks(execute=True):
+            pk = self.client.post(reverse('task-list'), data, format='json').data['id']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(reverse('task-detail', args=[pk]), {'status': 'completed'}, format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(reverse('task-detail', args=[pk]))
+
+        events = self.buffered_events()
+        self.assertEqual([event['type'] for event in events], ['created', 'updated', 'deleted'])
+        self.assertEqual([event['id'] for event in events], [1, 2, 3])
+        self.assertEqual(events[1]['task']['status'], 'completed')
+        self.assertEqual(events[2]['task'], {'id': pk})
+
+    @override_settings(TASK_EVENTS_BUFFER_SIZE=2)
+    def test_buffer_is_bounded(self):
+        for title in ('One', 'Two', 'Three'):
+            self.publish(title)
+        self.assertEqual([event['task']['title'] for event in self.buffered_events()], ['Two', 'Three'])
+
+    async def test_stream_resumes_after_last_event_id(self):
+        for title in ('One', 'Two'):
+            await sync_to_async(self.publish)(title)
+
+        response = await self.async_client.get(reverse('task-events'), headers={
+            'Authorization': f'Bearer {self.access_token}',
+            'Accept': 'text/event-stream',
+            'Last-Event-ID': '1',
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        chunks = response.streaming_content
+        self.assertEqual(await anext(chunks), b'id: 2\nevent: created\ndata: {"title": "Two"}\n\n')
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+
+        await sync_to_async(self.publish)('Three')
+        self.assertEqual(await anext(chunks), b'id: 3\nevent: created\ndata: {"title": "Three"}\n\n')
+        await chunks.aclose()
+
+    @override_settings(TASK_EVENTS_BUFFER_SIZE=200)
+    def test_concurrent_publishers_keep_ids_in_order(self):
+        def publish(writer):
+            try:
+                for i in range(25):
+                    publish_task_event(self.user.pk, TASK_CREATED, {'title': f'{writer}-{i}'})
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=publish, args=(writer,)) for writer in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([event['id'] for event in self.buffered_events()], list(range(1, 101)))
+
+    @override_settings(TASK_EVENTS_BUFFER_SIZE=2)
+    async def test_stream_resets_after_trimmed_events(self):
+        for title in ('One', 'Two', 'Three', 'Four'):
+            await sync_to_async(self.publish)(title)
+
+        response = await self.async_client.get(reverse('task-events'), headers={
+            'Authorization': f'Bearer {self.access_token}',
+            'Accept': 'text/event-stream',
+            'Last-Event-ID': '1',
+        })
+        chunks = response.streaming_content
+        self.assertEqual(await anext(chunks), b'id: 4\nevent: reset\ndata: {"last_event_id": 4}\n\n')
+        self.assertEqual(await anext(chunks), b'retry: 3000\n\n')
+
+        await sync_to_async(self.publish)('Five')
+        self.assertEqual(await anext(chunks), b'id: 5\nevent: created\ndata: {"title": "Five"}\n\n')
+        await chunks.aclose()
+
+    async def test_stream_requires_authentication(self):
+        response = await self.async_client.get(reverse('task-events'), headers={'Accept': 'text/event-stream'})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TaskSyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.task_list_url = reverse('task-list')
+        deadline = timezone.now() + timedelta(days=1)
+        self.unchanged = TaskModel.objects.create(user=self.user, title='Unchanged', deadline=deadline)
+        self.changed = TaskModel.objects.create(user=self.user, title='Changed', deadline=deadline)
+        self.deleted = TaskModel.objects.create(user=self.user, title='Deleted', deadline=deadline)
+
+        # Sync once to get a cursor, without the overlap that would include the tasks above, then make some changes
+        with override_settings(TASK_SYNC_OVERLAP_SECONDS=0):
+            self.cursor = self.client.get(self.task_list_url,
+                                          {'updated_since': timezone.now().isoformat()}).data['cursor']
+        self.client.patch(reverse('task-detail', args=[self.changed.pk]), {'status': 'completed'}, format='json')
+        self.client.delete(reverse('task-detail', args=[self.deleted.pk]))
+
+    def test_returns_only_changes_since_cursor(self):
+        response = self.client.get(self.task_list_url, {'updated_since': self.cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([task['title'] for task in response.data['tasks']], ['Changed'])
+        self.assertEqual(response.data['deleted'], [self.deleted.pk])
+
+        # The next cursor overlaps, changes are seen again until they are TASK_SYNC_OVERLAP_SECONDS old
+        response = self.client.get(self.task_list_url, {'updated_since': response.data['cursor']})
+        self.assertIn('Changed', [task['title'] for task in response.data['tasks']])
+        with override_settings(TASK_SYNC_OVERLAP_SECONDS=0):
+            response = self.client.get(self.task_list_url, {'updated_since': response.data['cursor']})
+            response = self.client.get(self.task_list_url, {'updated_since': response.data['cursor']})
+        self.assertEqual(response.data['tasks'], [])
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_cursor_covers_late_commits(self):
+        cursor = self.client.get(self.task_list_url, {'updated_since': self.cursor}).data['cursor']
+        # Saved just before that cursor was handed out, committed after
+        TaskModel.objects.filter(pk=self.unchanged.pk).update(title='Committed late',
+                                                              updated_at=timezone.now() - timedelta(seconds=1))
+        response = self.client.get(self.task_list_url, {'updated_since': cursor})
+        self.assertIn('Committed late', [task['title'] for task in response.data['tasks']])
+
+    def test_filters_are_rejected(self):
+        response = self.client.get(self.task_list_url, {'updated_since': self.cursor, 'status': 'completed'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('status', response.data['detail'])
+        response = self.client.get(self.task_list_url, {'updated_since': self.cursor, 'ordering': 'title'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_tombstones_are_scoped_to_user(self):
+        other_user = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=other_user)
+        response = self.client.get(self.task_list_url, {'updated_since': self.cursor})
+        self.assertEqual(response.data['deleted'], [])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.task_list_url, {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(TASK_TOMBSTONE_RETENTION_DAYS=7)
+    def test_expired_cursor(self):
+        since = (timezone.now() - timedelta(days=8)).isoformat()
+        response = self.client.get(self.task_list_url, {'updated_since': since})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+    @override_settings(TASK_TOMBSTONE_RETENTION_DAYS=7)
+    def test_purge_task_tombstones(self):
+        TaskTombstone.objects.filter(task_id=self.deleted.pk).update(deleted_at=timezone.now() - timedelta(days=8))
+        TaskTombstone.objects.create(task_id=self.changed.pk, user=self.user)
+        self.assertEqual(purge_task_tombstones(batch_size=1), 1)
+        self.assertEqual(list(TaskTombstone.objects.values_list('task_id', flat=True)), [self.changed.pk])
+
+
+class RendererTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.task_list_url = reverse('task-list')
+        TaskModel.objects.create(user=self.user, title='Test Task', deadline=timezone.now() + timedelta(days=1))
+
+    def render_both(self, data, status_code=200):
+        context = {'response': Response(status=status_code)}
+        rendered = [json.loads(renderer().render(data, renderer_context=context))
+                    for renderer in (OrjsonApiRenderer, ApiRenderer)]
+        for body in rendered:
+            body.get('metadata', {}).pop('timestamp', None)
+        return rendered
+
+    def test_json_matches_stdlib_renderer(self):
+        response = self.client.get(self.task_list_url)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        fast, stdlib = self.render_both(response.data)
+        self.assertEqual(fast, stdlib)
+        self.assertEqual(fast['data'][0]['title'], 'Test Task')
+
+    def test_datetime_and_error_formatting(self):
+        data = {'at': datetime(2024, 9, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)}
+        fast, stdlib = self.render_both(data)
+        self.assertEqual(fast, stdlib)
+        self.assertEqual(fast['data']['at'], '2024-09-01T12:30:15.123456Z')
+
+        fast, stdlib = self.render_both({'detail': 'Task does not exist'}, status_code=404)
+        self.assertEqual(fast, stdlib)
+
+    def test_msgpack_selected_through_accept(self):
+        response = self.client.get(self.task_list_url, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        body = msgpack.unpackb(response.content)
+        self.assertEqual(body['code'], 200)
+        self.assertEqual(body['data'][0]['title'], 'Test Task')
+
+    def test_invalid_json_body(self):
+        response = self.client.post(self.task_list_url, '{"title": ', content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_item_errors(self):
+        response = self.client.post(reverse('task-transitions'), {'ids': ['x'], 'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('0', json.loads(response.content)['errors']['detail']['ids'])
+
+        response = self.client.post(reverse('task-transitions'), {'ids': ['x'], 'status': 'completed'}, format='json',
+                                    HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(0, msgpack.unpackb(response.content, strict_map_key=False)['errors']['detail']['ids'])
+
+
+@override_settings(ADMISSION_CONTROL_ENABLED=True, ADMISSION_MAX_CONCURRENCY=10)
+class AdmissionControlTests(TestCase):
+    def setUp(self):
+        cache.delete_pattern('task:*')
+        self.redis = get_redis_connection('default')
+        self.clear_admission_state()
+        self.addCleanup(self.clear_admission_state)
+
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.task = TaskModel.objects.create(user=self.user, title='Test Task',
+                                             deadline=timezone.now() + timedelta(days=1))
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.task_detail_url = reverse('task-detail', args=[self.task.pk])
+        self.admin_task_list_url = reverse('admin-task-list')
+
+    def clear_admission_state(self):
+        for key in self.redis.scan_iter('admission:*'):
+            self.redis.delete(key)
+
+    def simulate_in_flight(self, url_name, count):
+        """Hold slots as requests running on other workers would."""
+        priority, concurrency = admission.route_policy(url_name)
+        for _ in range(count):
+            self.assertIsNotNone(admission.acquire_slot(url_name, priority, concurrency))
+
+    def test_sheds_requests_queued_beyond_budget(self):
+        queued_since = f't={time.time() - 1}'
+        response = self.client.get(self.admin_task_list_url, HTTP_X_REQUEST_START=queued_since)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(response.json()['code'], 503)
+
+        # Cheap, high priority requests may wait longer
+        response = self.client.get(self.task_detail_url, HTTP_X_REQUEST_START=queued_since)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(ADMISSION_USER_BURST=3, ADMISSION_USER_RATE=0.5)
+    def test_token_bucket_per_user(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(self.task_detail_url).status_code, status.HTTP_200_OK)
+        response = self.client.get(self.task_detail_url)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '2')
+
+        other_user = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other_user).access_token}')
+        self.assertEqual(self.client.get(self.admin_task_list_url).status_code, status.HTTP_200_OK)
+
+    def test_route_concurrency_limit(self):
+        self.simulate_in_flight('admin-task-list', settings.ADMISSION_ROUTES['admin-task-list']['concurrency'])
+        response = self.client.get(self.admin_task_list_url)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.client.get(self.task_detail_url).status_code, status.HTTP_200_OK)
+
+    def test_low_priority_cannot_take_reserved_capacity(self):
+        # Low priority may fill half of the 10 slots, normal 8 and high all of them
+        self.simulate_in_flight('task-list', 5)
+        self.assertEqual(self.client.get(self.admin_task_list_url).status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.client.get(reverse('task-list')).status_code, status.HTTP_200_OK)
+
+        self.simulate_in_flight('task-list', 3)
+        self.assertEqual(self.client.get(reverse('task-list')).status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.client.get(self.task_detail_url).status_code, status.HTTP_200_OK)
+
+    @override_settings(ADMISSION_USER_BURST=3, ADMISSION_USER_RATE=0.01)
+    def test_batch_sub_requests_are_charged(self):
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'method': 'PATCH', 'path': self.task_detail_url, 'body': {'title': 'Renamed'}} for _ in range(4)
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # One token went to the batch itself
+        self.assertEqual([result['status'] for result in response.data], [200, 200, 429, 429])
+
+    def test_batch_sub_requests_respect_route_limits(self):
+        self.simulate_in_flight('admin-task-list', settings.ADMISSION_ROUTES['admin-task-list']['concurrency'])
+        response = self.client.post(reverse('batch'), {'requests': [
+            {'method': 'GET', 'path': self.admin_task_list_url},
+        ]}, format='json')
+        self.assertEqual(response.data[0]['status'], status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_slot_released_after_response(self):
+        self.client.get(self.admin_task_list_url)
+        self.assertEqual(self.redis.zcard('admission:global'), 0)
+        self.assertEqual(self.redis.zcard('admission:route:admin-task-list'), 0)
+
+    def test_admits_when_redis_is_unavailable(self):
+        with mock.patch.object(admission, 'take_token', side_effect=RedisError):
+            self.assertEqual(self.client.get(self.task_detail_url).status_code, status.HTTP_200_OK)
+
+    def test_anonymous_clients_are_keyed_by_trusted_address(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.2', HTTP_X_FORWARDED_FOR='1.1.1.1, 203.0.113.7')
+        self.assertEqual(admission.request_identity(request), 'ip:10.0.0.2')
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(admission.request_identity(request), 'ip:203.0.113.7')
+        with override_settings(TRUSTED_PROXY_COUNT=3):
+            self.assertEqual(admission.request_identity(request), 'ip:1.1.1.1')
+
+
+class TaskCacheTests(TestCase):
+    def setUp(self):
+        cache.delete_pattern('task:*')
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.task_list_url = reverse('task-list')
+        self.task_detail_url = lambda pk: reverse('task-detail', args=[pk])
+        deadline = timezone.now() + timedelta(days=1)
+        self.tasks = [TaskModel.objects.create(user=self.user, title=f'Task {i}', deadline=deadline) for i in range(3)]
+        other_user = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        self.other_task = TaskModel.objects.create(user=other_user, title='Other Task', deadline=deadline)
+
+    def test_detail_is_read_through(self):
+        # Misses are cached on commit
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            self.client.get(self.task_detail_url(self.tasks[0].pk))
+        with self.assertNumQueries(0):
+            response = self.client.get(self.task_detail_url(self.tasks[0].pk))
+        self.assertEqual(response.data['title'], 'Task 0')
+
+    def test_writes_invalidate_cache(self):
+        pk = self.tasks[0].pk
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(self.task_detail_url(pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.task_detail_url(pk), {'title': 'Renamed'}, format='json')
+        self.assertEqual(self.client.get(self.task_detail_url(pk)).data['title'], 'Renamed')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.delete(self.task_detail_url(pk))
+        self.assertEqual(self.client.get(self.task_detail_url(pk)).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_multi_get_loads_misses_in_one_query(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(self.task_detail_url(self.tasks[1].pk))
+        ids = [self.tasks[2].pk, self.tasks[1].pk, self.tasks[0].pk]
+        with self.assertNumQueries(1), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(self.task_list_url, {'ids': ','.join(map(str, ids))})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([task['title'] for task in response.data], ['Task 2', 'Task 1', 'Task 0'])
+
+        with self.assertNumQueries(0):
+            self.client.get(self.task_list_url, {'ids': ','.join(map(str, ids))})
+
+    def test_fill_never_overwrites_a_write(self):
+        pk = self.tasks[0].pk
+        with self.captureOnCommitCallbacks() as fills:
+            self.client.get(self.task_detail_url(pk))
+        # An update commits after the read loaded the task, but before the read's fill runs
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.task_detail_url(pk), {'title': 'Renamed'}, format='json')
+        for fill in fills:
+            fill()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.task_detail_url(pk)).data['title'], 'Renamed')
+
+    def test_multi_get_enforces_ownership(self):
+        # Cached by its owner first, then requested by someone else
+        self.client.force_authenticate(user=self.other_task.user)
+        self.client.get(self.task_detail_url(self.other_task.pk))
+        self.client.force_authenticate(user=self.user)
+
+        response = self.client.get(self.task_list_url, {'ids': f'{self.tasks[0].pk},{self.other_task.pk}'})
+        self.assertEqual([task['title'] for task in response.data], ['Task 0'])
+        response = self.client.get(self.task_detail_url(self.other_task.pk))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_multi_get_invalid_ids(self):
+        response = self.client.get(self.task_list_url, {'ids': '1,two'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.task_list_url, {'ids': ','.join(map(str, range(101)))})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BatchTests(TransactionTestCase):
+    def setUp(self):
+        cache.delete_pattern('task:*')
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        self.batch_url = reverse('batch')
+        self.task = TaskModel.objects.create(user=self.user, title='Test Task',
+                                             deadline=timezone.now() + timedelta(days=1))
+
+    def test_read_only_batch(self):
+        response = self.client.post(self.batch_url, {'requests': [
+            {'method': 'GET', 'path': '/users/me/'},
+            {'method': 'GET', 'path': '/tasks/my/?status=new'},
+            {'method': 'GET', 'path': f'/tasks/my/{self.task.pk}/'},
+            {'method': 'GET', 'path': '/tasks/my/0/'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data
+        self.assertEqual([result['status'] for result in results], [200, 200, 200, 404])
+        self.assertEqual(results[0]['data']['username'], 'testuser')
+        self.assertEqual(results[1]['data'][0]['title'], 'Test Task')
+        self.assertEqual(results[2]['data']['title'], 'Test Task')
+
+    def test_writes_run_in_order(self):
+        deadline = (timezone.now() + timedelta(days=2)).isoformat()
+        response = self.client.post(self.batch_url, {'requests': [
+            {'method': 'POST', 'path': '/tasks/my/', 'body': {'title': 'New Task', 'deadline': deadline}},
+            {'method': 'PATCH', 'path': f'/tasks/my/{self.task.pk}/', 'body': {'status': 'completed'}},
+            {'method': 'GET', 'path': '/tasks/my/?status=new'},
+        ]}, format='json')
+        self.assertEqual([result['status'] for result in response.data], [201, 200, 200])
+        self.assertEqual([task['title'] for task in response.data[2]['data']], ['New Task'])
+
+    def test_atomic_batch_rolls_back_on_failure(self):
+        deadline = (timezone.now() + timedelta(days=2)).isoformat()
+        response = self.client.post(self.batch_url, {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/tasks/my/', 'body': {'title': 'New Task', 'deadline': deadline}},
+            {'method': 'DELETE', 'path': '/tasks/my/0/'},
+        ]}, format='json')
+        self.assertEqual([result['status'] for result in response.data], [201, 404])
+        self.assertFalse(TaskModel.objects.filter(title='New Task').exists())
+
+    def test_rolled_back_batch_leaves_cache_and_events_alone(self):
+        redis = get_redis_connection('default')
+        redis.delete(f'task-events:{self.user.pk}:buffer')
+        self.client.get(f'/tasks/my/{self.task.pk}/')
+        response = self.client.post(self.batch_url, {'atomic': True, 'requests': [
+            {'method': 'PATCH', 'path': f'/tasks/my/{self.task.pk}/', 'body': {'title': 'Rolled back'}},
+            {'method': 'GET', 'path': f'/tasks/my/?ids={self.task.pk}'},
+            {'method': 'GET', 'path': '/tasks/my/999999/'},
+        ]}, format='json')
+        self.assertEqual([result['status'] for result in response.data], [200, 200, 404])
+
+        self.assertEqual(self.client.get(f'/tasks/my/{self.task.pk}/').data['title'], 'Test Task')
+        self.assertEqual(self.client.get(f'/tasks/my/?ids={self.task.pk}').data[0]['title'], 'Test Task')
+        self.assertEqual(redis.llen(f'task-events:{self.user.pk}:buffer'), 0)
+
+    def test_paths_that_cannot_be_batched(self):
+        response = self.client.post(self.batch_url, {'requests': [
+            {'method': 'POST', 'path': '/batch/'},
+            {'method': 'GET', 'path': '/tasks/my/events/'},
+            {'method': 'GET', 'path': '/nowhere/'},
+        ]}, format='json')
+        self.assertEqual([result['status'] for result in response.data], [400, 400, 404])
+
+    def test_requires_authentication(self):
+        self.client.credentials()
+        response = self.client.post(self.batch_url, {'requests': [{'method': 'GET', 'path': '/users/me/'}]},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_invalid_batch(self):
+        response = self.client.post(self.batch_url, {'requests': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskIngestTests(TestCase):
+    def setUp(self):
+        self.redis = get_redis_connection('default')
+        self.redis.delete(ingest.STREAM, *self.redis.keys('task-ingest:*'))
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.task_list_url = reverse('task-list')
+        self.deadline = (timezone.now() + timedelta(days=1)).isoformat()
+
+    def post_async(self, title):
+        return self.client.post(self.task_list_url, {'title': title, 'deadline': self.deadline, 'priority': 'high'},
+                                format='json', HTTP_PREFER='respond-async')
+
+    def test_queued_tasks_are_inserted_in_batches(self):
+        responses = [self.post_async(f'Task {i}') for i in range(3)]
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_202_ACCEPTED})
+        self.assertEqual(responses[0]['Preference-Applied'], 'respond-async')
+        self.assertFalse(TaskModel.objects.exists())
+
+        status_url = responses[0]['Location']
+        self.assertEqual(self.client.get(status_url).data['status'], 'pending')
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(ingest.drain(), 3)
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('INSERT')]), 1)
+        self.assertEqual(list(TaskModel.objects.order_by('title').values_list('title', 'priority', 'user')),
+                         [(f'Task {i}', 'high', self.user.pk) for i in range(3)])
+        response = self.client.get(status_url)
+        self.assertEqual(response.data['status'], 'created')
+        self.assertEqual(TaskModel.objects.get(pk=response.data['task_id']).title, 'Task 0')
+        self.assertEqual(self.redis.xlen(ingest.STREAM), 0)
+
+    def test_invalid_task_is_rejected_before_queueing(self):
+        response = self.client.post(self.task_list_url, {'title': 'Task'}, format='json', HTTP_PREFER='respond-async')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.redis.xlen(ingest.STREAM), 0)
+
+    def test_redelivered_message_is_inserted_once(self):
+        self.post_async('Task')
+        messages = self.redis.xrange(ingest.STREAM)
+        ingest.drain()
+        # A consumer that committed but died before acknowledging gets the same message again
+        ingest._insert_batch(self.redis, messages)
+        self.assertEqual(TaskModel.objects.count(), 1)
+
+    def test_unacknowledged_messages_are_claimed(self):
+        self.post_async('Task')
+        self.redis.xgroup_create(ingest.STREAM, ingest.GROUP, id='0')
+        self.redis.xreadgroup(ingest.GROUP, 'dead-consumer', {ingest.STREAM: '>'})
+        with override_settings(TASK_INGEST_CLAIM_IDLE_MS=0):
+            self.assertEqual(ingest.drain(), 1)
+        self.assertEqual(TaskModel.objects.count(), 1)
+
+    def test_acknowledged_messages_are_trimmed(self):
+        for i in range(3):
+            self.post_async(f'Task {i}')
+        self.redis.xgroup_create(ingest.STREAM, ingest.GROUP, id='0')
+        [(_, first)] = self.redis.xreadgroup(ingest.GROUP, 'busy-consumer', {ingest.STREAM: '>'}, count=1)
+        [(_, rest)] = self.redis.xreadgroup(ingest.GROUP, 'consumer', {ingest.STREAM: '>'})
+        ingest._insert_batch(self.redis, rest)
+        # The consumer still working on the first message keeps it and everything after it in the stream
+        ingest._trim_acknowledged(self.redis)
+        self.assertEqual(self.redis.xlen(ingest.STREAM), 3)
+
+        ingest._insert_batch(self.redis, first)
+        ingest._trim_acknowledged(self.redis)
+        self.assertEqual(self.redis.xlen(ingest.STREAM), 0)
+        self.assertEqual(TaskModel.objects.count(), 3)
+
+    def test_messages_delivered_while_trimming_are_kept(self):
+        self.redis.xgroup_create(ingest.STREAM, ingest.GROUP, id='0', mkstream=True)
+        self.post_async('Task 0')
+        [(_, messages)] = self.redis.xreadgroup(ingest.GROUP, 'consumer', {ingest.STREAM: '>'})
+        ingest._insert_batch(self.redis, messages)
+        self.post_async('Task 1')
+
+        def delivering_first(command):
+            # Another consumer reads the new message before the command runs, and has yet to acknowledge it
+            def run(*args, **kwargs):
+                if not self.redis.xpending(ingest.STREAM, ingest.GROUP)['pending']:
+                    self.redis.xreadgroup(ingest.GROUP, 'other-consumer', {ingest.STREAM: '>'})
+                return command(*args, **kwargs)
+            return run
+
+        # Between reading what is pending and what was delivered, or before trimming
+        with mock.patch.object(self.redis, 'xinfo_groups', delivering_first(self.redis.xinfo_groups)), \
+                mock.patch.object(self.redis, 'xtrim', delivering_first(self.redis.xtrim)):
+            ingest._trim_acknowledged(self.redis)
+        self.assertEqual(self.redis.xlen(ingest.STREAM), 1)
+        self.assertEqual(self.redis.xpending(ingest.STREAM, ingest.GROUP)['pending'], 1)
+
+    def test_status_is_private(self):
+        status_url = self.post_async('Task')['Location']
+        other_user = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=other_user)
+        self.assertEqual(self.client.get(status_url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_falls_back_to_synchronous_insert(self):
+        with mock.patch.object(ingest, 'get_redis_connection', side_effect=RedisError):
+            response = self.post_async('Task')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(TaskModel.objects.filter(title='Task').exists())
+
+
+class AdminTaskCountTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.admin_task_list_url = reverse('admin-task-list')
+        deadline = timezone.now() + timedelta(days=1)
+        TaskModel.objects.bulk_create([TaskModel(user=self.user, title=f'Task {i}', deadline=deadline,
+                                                 status='completed' if i % 4 == 0 else 'new') for i in range(200)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE tasks_taskmodel')
+
+    def test_small_totals_are_exact(self):
+        response = self.client.get(self.admin_task_list_url, {'status': 'completed'})
+        self.assertEqual(response['X-Total-Count'], '50')
+        self.assertEqual(response['X-Total-Count-Exact'], 'true')
+        metadata = json.loads(response.content)['metadata']
+        self.assertEqual((metadata['total'], metadata['total_is_exact']), (50, True))
+
+    @override_settings(ADMIN_TASK_EXACT_COUNT_THRESHOLD=10)
+    def test_large_totals_are_estimated_without_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.admin_task_list_url, {'limit': 100})
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        self.assertEqual(response['X-Total-Count-Exact'], 'false')
+        self.assertEqual(response['X-Total-Count'], '200')
+
+        response = self.client.get(self.admin_task_list_url, {'status': 'new', 'limit': 100})
+        self.assertEqual(response['X-Total-Count-Exact'], 'false')
+        self.assertAlmostEqual(int(response['X-Total-Count']), 150, delta=30)
+
+    @override_settings(ADMIN_TASK_EXACT_COUNT_THRESHOLD=10)
+    def test_unpaged_list_returns_every_task(self):
+        response = self.client.get(self.admin_task_list_url)
+        body = json.loads(response.content)
+        self.assertEqual(len(body['data']), 200)
+        self.assertEqual((response['X-Total-Count'], response['X-Total-Count-Exact']), ('200', 'true'))
+        self.assertIsNone(body['metadata']['next'])
+        self.assertFalse(response.has_header('Link'))
+
+    def test_pages_follow_each_other_by_id(self):
+        ids, url, pages = [], self.admin_task_list_url + '?limit=30', 0
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+            body = json.loads(response.content)
+            self.assertEqual(body['metadata']['total'], 200)
+            ids += [task['id'] for task in body['data']]
+            url, pages = body['metadata']['next'], pages + 1
+            if url:
+                self.assertEqual(response['Link'], f'<{url}>; rel="next"')
+        self.assertEqual(pages, 7)
+        self.assertEqual(ids, sorted(TaskModel.objects.values_list('pk', flat=True)))
+
+    def test_sorted_lists_are_numbered(self):
+        response = self.client.get(self.admin_task_list_url, {'ordering': '-id', 'limit': 150})
+        metadata = json.loads(response.content)['metadata']
+        self.assertIn('page=2', metadata['next'])
+        response = self.client.get(metadata['next'])
+        body = json.loads(response.content)
+        self.assertEqual(len(body['data']), 50)
+        self.assertIsNone(body['metadata']['next'])
+        self.assertEqual(body['data'][-1]['id'], TaskModel.objects.order_by('pk').first().pk)
+
+    def test_invalid_pages(self):
+        for params in ({'limit': 0}, {'limit': 1001}, {'after': 'x'}, {'ordering': 'id', 'page': -1}):
+            response = self.client.get(self.admin_task_list_url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.trace_dir = Path(directory.name)
+        overrides = override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=0, PROFILING_DIR=directory.name,
+                                      PROFILING_INTERVAL=0.001)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(user=UserModel.objects.create_user(username='testuser',
+                                                                          password='testpassword123'))
+
+    def test_signed_header_is_profiled(self):
+        self.client.get(reverse('task-list'), HTTP_X_PROFILE=profiling.profile_token())
+        self.client.get(reverse('task-list'), HTTP_X_PROFILE='forged')
+        self.client.get(reverse('task-list'))
+        traces = list(self.trace_dir.glob('*.folded'))
+        self.assertEqual(len(traces), 1)
+        self.assertEqual(profiling.parse_trace_name(traces[0])[0], 'task-list')
+
+    @override_settings(PROFILING_SAMPLE_RATE=1, PROFILING_MAX_FILES=3)
+    def test_sampled_traces_rotate(self):
+        for _ in range(5):
+            self.client.get(reverse('task-list'))
+            time.sleep(0.002)
+        self.assertEqual(len(list(self.trace_dir.glob('*.folded'))), 3)
+
+    def test_sampler_collects_stacks(self):
+        def busy_function():
+            time.sleep(0.05)
+
+        sampler = profiling.StackSampler(threading.get_ident(), 0.001).start()
+        busy_function()
+        stacks = sampler.stop()
+        self.assertTrue(any(stack.endswith('busy_function') for stack in stacks))
+
+    def test_report(self):
+        (self.trace_dir / '1-task-list-12ms.folded').write_text('a.main;a.view;a.query 3\na.main;a.view 1\n')
+        (self.trace_dir / '2-admin-task-list-40ms.folded').write_text('a.main;a.view;a.serialize 4\n')
+        out = StringIO()
+        call_command('profile_report', top=2, stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertIn('admin-task-list', lines[1])
+        self.assertIn('50.0%', lines[-2])
+        self.assertTrue(lines[-2].endswith('a.serialize'))
+        self.assertTrue(lines[-1].endswith('a.query'))
+
+        out = StringIO()
+        call_command('profile_report', route='task-list', stdout=out)
+        self.assertNotIn('a.serialize', out.getvalue())
+
+
+@override_settings(MEMORY_PROFILING_CHECK_INTERVAL=0, MEMORY_PROFILING_SNAPSHOT_INTERVAL=0)
+class MemoryProfilingTests(TestCase):
+    def setUp(self):
+        memory.set_enabled(False)
+        self.addCleanup(self.stop_tracing)
+        self.client = APIClient()
+        self.staff = UserModel.objects.create_user(username='staff', password='testpassword123', is_staff=True)
+        self.client.force_authenticate(user=self.staff)
+        self.memory_url = reverse('memory-profiling')
+
+    @staticmethod
+    def stop_tracing():
+        memory.set_enabled(False)
+        tracemalloc.stop()
+        memory.state.__init__()
+
+    def test_toggled_at_runtime(self):
+        response = self.client.post(self.memory_url, {'enabled': True}, format='json')
+        self.assertTrue(response.data['enabled'])
+        self.client.get(reverse('task-list'))
+        self.assertTrue(tracemalloc.is_tracing())
+
+        response = self.client.get(self.memory_url)
+        report = response.data['workers'][memory.worker_name()]
+        self.assertGreater(report['traced_bytes'], 0)
+        self.assertIsInstance(report['top_growth'], list)
+
+        self.client.post(self.memory_url, {'enabled': False}, format='json')
+        self.client.get(reverse('task-list'))
+        self.assertFalse(tracemalloc.is_tracing())
+        self.assertEqual(self.client.get(self.memory_url).data['workers'], {})
+
+    @override_settings(MEMORY_PROFILING_REQUEST_THRESHOLD=0)
+    def test_logs_allocating_requests(self):
+        memory.set_enabled(True)
+        with self.assertLogs('ustudy_test_task.middleware', 'WARNING') as logs:
+            self.client.get(reverse('task-list'))
+        self.assertIn('GET /tasks/my/ allocated', logs.output[0])
+
+    def test_staff_only(self):
+        self.client.force_authenticate(user=UserModel.objects.create_user(username='testuser',
+                                                                          password='testpassword123'))
+        self.assertEqual(self.client.get(self.memory_url).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.post(self.memory_url, {'enabled': True}, format='json').status_code,
+                         status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(SLOW_QUERY_THRESHOLD_MS=0.001)
+class SlowQueryTests(TransactionTestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        TaskModel.objects.create(user=self.user, title='Test Task', deadline=timezone.now() + timedelta(days=1))
+
+    @staticmethod
+    def wait_for_recording():
+        slow_queries.executor.submit(lambda: None).result()
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            slow_queries.normalize_sql("SELECT *  FROM t1 WHERE id IN (%s, %s, %s) AND name = 'it''s'\n LIMIT 21"),
+            'SELECT * FROM t1 WHERE id IN (...) AND name = ? LIMIT ?',
+        )
+
+    def test_captures_queries_with_view_and_plan(self):
+        self.client.get(reverse('task-list'), {'year': timezone.now().year + 1})
+        self.wait_for_recording()
+
+        query = SlowQuery.objects.get(sql__contains='"tasks_taskmodel"."deadline" >=')
+        self.assertEqual(query.view, 'task-list')
+        self.assertTrue(query.call_site.startswith('tasks/views.py:'))
+        self.assertIn('actual time', query.plan)
+        self.assertIn('Buffers', query.plan)
+
+    def test_writes_are_not_explained(self):
+        self.client.patch(reverse('task-detail', args=[TaskModel.objects.get().pk]), {'title': 'Renamed'},
+                          format='json')
+        self.wait_for_recording()
+        query = SlowQuery.objects.get(sql__startswith='UPDATE')
+        self.assertEqual(query.plan, '')
+        self.assertEqual(TaskModel.objects.get().title, 'Renamed')
+
+    @override_settings(SLOW_QUERY_THRESHOLD_MS=0)
+    def test_disabled(self):
+        self.client.get(reverse('task-list'))
+        self.wait_for_recording()
+        self.assertFalse(SlowQuery.objects.exists())
+
+    def test_report(self):
+        for _ in range(2):
+            self.client.get(reverse('task-list'), {'year': timezone.now().year + 1})
+        self.wait_for_recording()
+        out = StringIO()
+        call_command('slow_query_report', plans=True, stdout=out)
+        self.assertIn('views: task-list', out.getvalue())
+        self.assertIn('Buffers', out.getvalue())
+
+
+class PreparedStatementTests(TestCase):
+    def test_hot_queries_are_prepared(self):
+        user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        task = TaskModel.objects.create(user=user, title='Test Task', deadline=timezone.now() + timedelta(days=1))
+        for _ in range(settings.DATABASES['default']['OPTIONS']['prepare_threshold'] + 1):
+            list(TaskModel.objects.filter(user=user, pk__in=[task.pk]))
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT statement FROM pg_prepared_statements WHERE statement LIKE '%%tasks_taskmodel%%'")
+            statements = [row[0] for row in cursor.fetchall()]
+        self.assertTrue(any('"tasks_taskmodel"."user_id" = $2' in statement for statement in statements))
+
+
+class StartupTests(TestCase):
+    # Generous for CI machines, the startup takes about a second locally
+    STARTUP_BUDGET_SECONDS = 3.0
+
+    def test_heavy_modules_are_not_imported_at_startup(self):
+        from benchmarks.startup import STARTUP_CODE, measure_startup
+        _, stderr = measure_startup(code=STARTUP_CODE + """
+import sys
+for module in ('drf_yasg.openapi', 'drf_yasg.generators', 'celery', 'celery.schedules'):
+    if module in sys.modules:
+        sys.stderr.write(f'imported {module}\\n')
+""")
+        self.assertNotIn('imported', stderr)
+
+    def test_startup_time(self):
+        from benchmarks.startup import measure_startup
+        wall = min(measure_startup()[0] for _ in range(3))
+        self.assertLess(wall, self.STARTUP_BUDGET_SECONDS)
+
+    def test_docs_are_served(self):
+        for name in ('schema-swagger-ui', 'schema-redoc'):
+            self.assertEqual(self.client.get(reverse(name)).status_code, status.HTTP_200_OK)
+
+
+class OverdueSweepTests(TransactionTestCase):
+    def setUp(self):
+        cache.delete_pattern('task:*')
+        get_redis_connection('default').delete(overdue.PROGRESS_KEY)
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        past = timezone.now() - timedelta(hours=1)
+        self.late = [TaskModel.objects.create(user=self.user, title=f'Late {i}', deadline=past) for i in range(5)]
+        self.completed = TaskModel.objects.create(user=self.user, title='Done', status='completed', deadline=past)
+        self.upcoming = TaskModel.objects.create(user=self.user, title='Upcoming',
+                                                 deadline=timezone.now() + timedelta(days=1))
+
+    def test_sweep_marks_tasks_past_their_deadline_in_batches(self):
+        self.assertEqual(overdue.sweep(batch_size=2), 5)
+        self.assertEqual(set(TaskModel.objects.filter(overdue=True)), set(self.late))
+
+        progress = overdue.sweep_progress()
+        self.assertEqual(progress['marked_total'], 5)
+        self.assertEqual(progress['last_run_batches'], 3)
+        self.assertEqual(progress['backlog'], 0)
+        # Marked tasks are not updated again
+        self.assertEqual(sweep_overdue_tasks(), 0)
+
+    def test_sweep_invalidates_and_publishes_per_user(self):
+        self.client.get(reverse('task-detail', args=[self.late[0].pk]))
+        other_user = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        TaskModel.objects.create(user=other_user, title='Other', deadline=timezone.now() - timedelta(hours=1))
+        with mock.patch.object(overdue, 'publish_task_events') as publish:
+            self.assertEqual(overdue.sweep(), 6)
+        self.assertEqual(sorted((call.args[0], len(call.args[2])) for call in publish.call_args_list),
+                         sorted([(self.user.pk, 5), (other_user.pk, 1)]))
+        self.assertEqual(cache.keys('task:*'), [])
+        self.assertTrue(self.client.get(reverse('task-detail', args=[self.late[0].pk])).data['overdue'])
+
+    def test_sweep_skips_tasks_locked_by_another_transaction(self):
+        locked, released = threading.Event(), threading.Event()
+
+        def hold_lock():
+            with transaction.atomic():
+                TaskModel.objects.select_for_update().get(pk=self.late[0].pk)
+                locked.set()
+                released.wait(10)
+            connection.close()
+
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        locked.wait(10)
+        try:
+            self.assertEqual(overdue.sweep(batch_size=2), 4)
+        finally:
+            released.set()
+            thread.join()
+        self.assertFalse(TaskModel.objects.get(pk=self.late[0].pk).overdue)
+        self.assertEqual(overdue.sweep(), 1)
+
+    def test_overdue_filter(self):
+        overdue.sweep()
+        response = self.client.get(reverse('task-list'), {'overdue': 'true'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({task['title'] for task in response.data}, {task.title for task in self.late})
+        self.assertTrue(all(task['overdue'] for task in response.data))
+
+        response = self.client.get(reverse('task-list'), {'overdue': 'false'})
+        self.assertEqual({task['title'] for task in response.data}, {'Done', 'Upcoming'})
+
+        response = self.client.get(reverse('task-list'), {'overdue': 'yes'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_overdue_filter_uses_partial_index(self):
+        tasks = TaskModel.objects.filter(user=self.user, overdue=True)
+        sql, params = tasks.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            # The tables are too small for the planner to prefer any index otherwise, and without statistics it can't
+            # tell the partial index from the other indexes starting with the user
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('ANALYZE tasks_taskmodel')
+            cursor.execute(f'EXPLAIN {sql}', params)
+            plan = '\n'.join(row[0] for row in cursor.fetchall())
+        self.assertIn('task_overdue_idx', plan)
+
+    def test_new_deadline_or_completion_clears_overdue(self):
+        overdue.sweep()
+        response = self.client.patch(reverse('task-detail', args=[self.late[0].pk]),
+                                     {'deadline': (timezone.now() + timedelta(days=1)).isoformat()}, format='json')
+        self.assertFalse(response.data['overdue'])
+        response = self.client.patch(reverse('task-detail', args=[self.late[1].pk]), {'status': 'completed'},
+                                     format='json')
+        self.assertFalse(response.data['overdue'])
+        response = self.client.patch(reverse('task-detail', args=[self.late[2].pk]), {'overdue': False},
+                                     format='json')
+        self.assertTrue(response.data['overdue'])
+
+
+class RecurringTaskTests(TestCase):
+    def setUp(self):
+        cache.delete_pattern('task:*')
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        self.year = timezone.now().year + 1
+        response = self.client.post(reverse('task-list'), {
+            'title': 'Standup',
+            'deadline': datetime(self.year, 3, 1, 9, tzinfo=dt_timezone.utc).isoformat(),
+            'recurrence': 'FREQ=DAILY;COUNT=10',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.series = TaskModel.objects.get(pk=response.data['id'])
+
+    def list_month(self):
+        response = self.client.get(reverse('task-list'), {'year': self.year, 'month': 3})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def occurrence_url(self, day):
+        return reverse('task-occurrence', args=[self.series.pk, f'{self.year}03{day:02}T090000Z'])
+
+    def test_occurrences_are_expanded_for_the_window(self):
+        self.assertEqual(self.series.recurrence, 'RRULE:FREQ=DAILY;COUNT=10')
+        tasks = self.list_month()
+        self.assertEqual(len(tasks), 10)
+        self.assertEqual(tasks[4]['occurrence'], f'{self.year}0305T090000Z')
+        self.assertEqual(tasks[4]['deadline'], f'{self.year}-03-05T09:00:00Z')
+        self.assertEqual({(task['id'], task['series'], task['title']) for task in tasks},
+                         {(None, self.series.pk, 'Standup')})
+
+        response = self.client.get(reverse('task-list'), {'year': self.year, 'month': 3, 'day': 5})
+        self.assertEqual([task['occurrence'] for task in response.data], [f'{self.year}0305T090000Z'])
+        response = self.client.get(reverse('task-list'), {'year': self.year, 'month': 3, 'status': 'completed'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        # Without a range the recurring task itself is listed
+        self.assertEqual([task['id'] for task in self.client.get(reverse('task-list')).data], [self.series.pk])
+        self.assertEqual(TaskModel.objects.count(), 1)
+
+    def test_changed_occurrence_is_stored(self):
+        response = self.client.patch(self.occurrence_url(3), {'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['series'], self.series.pk)
+        self.assertEqual(response.data['title'], 'Standup')
+        override = TaskModel.objects.get(pk=response.data['id'])
+        self.assertEqual(override.status, 'completed')
+        self.assertEqual(override.recurrence, '')
+
+        # Changed again, the stored occurrence is updated
+        response = self.client.patch(self.occurrence_url(3), {'title': 'Retro'}, format='json')
+        self.assertEqual(response.data['id'], override.pk)
+        self.assertEqual(TaskModel.objects.count(), 2)
+
+        tasks = self.list_month()
+        self.assertEqual(len(tasks), 10)
+        self.assertEqual([task['title'] for task in tasks if task['id']], ['Retro'])
+
+    def test_deleted_occurrence_is_skipped(self):
+        self.assertEqual(self.client.delete(self.occurrence_url(4)).status_code, status.HTTP_204_NO_CONTENT)
+        self.assertNotIn(f'{self.year}0304T090000Z', [task['occurrence'] for task in self.list_month()])
+
+        # Deleting a changed occurrence doesn't bring the original back
+        override = self.client.patch(self.occurrence_url(6), {'title': 'Moved'}, format='json').data
+        self.client.delete(reverse('task-detail', args=[override['id']]))
+        occurrences = [task['occurrence'] for task in self.list_month()]
+        self.assertEqual(len(occurrences), 8)
+        self.assertNotIn(f'{self.year}0306T090000Z', occurrences)
+
+    def test_deleting_the_series_deletes_changed_occurrences(self):
+        override = self.client.patch(self.occurrence_url(2), {'title': 'Changed'}, format='json').data
+        self.client.delete(reverse('task-detail', args=[self.series.pk]))
+        self.assertFalse(TaskModel.objects.exists())
+        self.assertEqual(set(TaskTombstone.objects.values_list('task_id', flat=True)), {self.series.pk, override['id']})
+
+    def test_unknown_occurrence(self):
+        for url in (self.occurrence_url(11), reverse('task-occurrence', args=[self.series.pk, 'tomorrow']),
+                    reverse('task-occurrence', args=[self.series.pk, f'{self.year}0303T100000Z'])):
+            self.assertEqual(self.client.patch(url, {'title': 'x'}, format='json').status_code,
+                             status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_recurrence(self):
+        deadline = (timezone.now() + timedelta(days=1)).isoformat()
+        for rule in ('FREQ=SECONDLY', 'FREQ=DAILY;BYDAY=XX', 'DTSTART:20250101T000000Z\nRRULE:FREQ=DAILY'):
+            response = self.client.post(reverse('task-list'), {'title': 'x', 'deadline': deadline, 'recurrence': rule},
+                                        format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, rule)
+
+
+class TaskTagTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        deadline = timezone.now() + timedelta(days=1)
+        for title, tags in (('Report', ['work', 'urgent']), ('Review', ['work']), ('Groceries', ['home']),
+                            ('Untagged', [])):
+            TaskModel.objects.create(user=self.user, title=title, tags=tags, deadline=deadline)
+
+    def titles(self, url_name, params):
+        response = self.client.get(reverse(url_name), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {task['title'] for task in response.data}
+
+    def test_tags_are_normalized(self):
+        response = self.client.post(reverse('task-list'), {
+            'title': 'New Task', 'deadline': (timezone.now() + timedelta(days=1)).isoformat(),
+            'tags': ['Work', ' work ', 'urgent'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['tags'], ['work', 'urgent'])
+
+    def test_filter_by_tags(self):
+        for url_name in ('task-list', 'admin-task-list'):
+            self.assertEqual(self.titles(url_name, {'tags': 'work'}), {'Report', 'Review'})
+            self.assertEqual(self.titles(url_name, {'tags': 'Work,urgent'}), {'Report'})
+            self.assertEqual(self.titles(url_name, {'tags': 'urgent,home', 'tags_match': 'any'}),
+                             {'Report', 'Groceries'})
+            response = self.client.get(reverse(url_name), {'tags': 'work', 'tags_match': 'some'})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tags_are_listed_without_extra_queries(self):
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('task-list'))
+        deadline = timezone.now() + timedelta(days=1)
+        TaskModel.objects.bulk_create([TaskModel(user=self.user, title=f'Task {i}', tags=['work', f'tag{i}'],
+                                                 deadline=deadline) for i in range(20)])
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('task-list'))
+        self.assertEqual(len(response.data), 24)
+        self.assertEqual(len(many), len(few))
+
+    def test_tag_filters_use_gin_index(self):
+        for tasks in (TaskModel.objects.filter(tags__contains=['work', 'urgent']),
+                      TaskModel.objects.filter(tags__overlap=['urgent', 'home'])):
+            sql, params = tasks.query.sql_with_params()
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute(f'EXPLAIN {sql}', params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+            self.assertIn('task_tags_idx', plan)
+
+
+class TaskHierarchyTests(TestCase):
+    LEVELS = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        deadline = timezone.now() + timedelta(days=1)
+        # A binary tree 12 levels deep, 4095 tasks
+        cls.root = TaskModel.objects.create(user=cls.user, title='Root', deadline=deadline)
+        cls.levels = [[cls.root]]
+        for depth in range(1, cls.LEVELS):
+            cls.levels.append(TaskModel.objects.bulk_create([
+                TaskModel(user=cls.user, parent=parent, title=f'Task {depth}.{i}', deadline=deadline,
+                          status='completed' if i % 3 == 0 else 'new')
+                for parent in cls.levels[-1] for i in range(2)
+            ]))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_subtree_is_loaded_with_one_query(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('task-subtree', args=[self.root.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sum('FROM "tasks_taskmodel"' in query['sql'] or 'tasks_taskmodel task' in query['sql']
+                             for query in queries), 1)
+
+        node, depth = response.data, 0
+        while node['subtasks']:
+            node, depth = node['subtasks'][0], depth + 1
+        self.assertEqual(depth, self.LEVELS - 1)
+
+        total = sum(len(level) for level in self.levels) - 1
+        completed = sum(task.status == 'completed' for level in self.levels[1:] for task in level)
+        self.assertEqual(response.data['progress'], {
+            'subtasks': 2, 'subtasks_completed': 1, 'descendants': total, 'descendants_completed': completed,
+        })
+
+    def test_progress(self):
+        response = self.client.get(reverse('task-progress', args=[self.levels[1][0].pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Half of the tree below the root, minus the task itself
+        self.assertEqual(response.data['descendants'], 2 ** (self.LEVELS - 1) - 2)
+        self.assertEqual(response.data['levels'], self.LEVELS - 2)
+        self.assertEqual(self.client.get(reverse('task-progress', args=[0])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_status_cascades_in_one_statement(self):
+        branch = self.levels[1][1]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('task-subtree-status', args=[branch.pk]), {'status': 'in_progress'},
+                                        format='json')
+        self.assertEqual(response.data, {'updated': 2 ** (self.LEVELS - 1) - 1})
+        self.assertEqual([query['sql'].split()[0] for query in queries], ['UPDATE'])
+        self.assertEqual(TaskModel.objects.filter(status='in_progress').count(), 2 ** (self.LEVELS - 1) - 1)
+        self.assertEqual(TaskModel.objects.get(pk=self.levels[1][0].pk).status, 'completed')
+
+    def test_other_users_cannot_read_or_change_a_tree(self):
+        other = UserModel.objects.create_user(username='otheruser', password='testpassword123')
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.client.get(reverse('task-subtree', args=[self.root.pk])).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('task-subtree-status', args=[self.root.pk]), {'status': 'completed'},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.post(reverse('task-list'), {
+            'title': 'Sneaky', 'deadline': (timezone.now() + timedelta(days=1)).isoformat(), 'parent': self.root.pk,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cycles_are_rejected(self):
+        leaf = self.levels[-1][0]
+        response = self.client.patch(reverse('task-detail', args=[self.root.pk]), {'parent': leaf.pk}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(reverse('task-detail', args=[self.root.pk]), {'parent': self.root.pk},
+                                     format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(TASK_MAX_DEPTH=11)
+    def test_depth_is_limited(self):
+        response = self.client.post(reverse('task-list'), {
+            'title': 'Too deep', 'deadline': (timezone.now() + timedelta(days=1)).isoformat(),
+            'parent': self.levels[-1][0].pk,
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleting_a_task_deletes_its_subtree(self):
+        branch = self.levels[1][0]
+        self.assertEqual(self.client.delete(reverse('task-detail', args=[branch.pk])).status_code,
+                         status.HTTP_204_NO_CONTENT)
+        self.assertEqual(TaskModel.objects.count(), 2 ** (self.LEVELS - 1))
+        self.assertEqual(TaskTombstone.objects.count(), 2 ** (self.LEVELS - 1) - 1)
+
+
+class TaskAdminTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = UserModel.objects.create_superuser(username='admin', password='adminpassword123')
+        cls.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        deadline = timezone.now() + timedelta(days=1)
+        TaskModel.objects.bulk_create([TaskModel(user=cls.user, title=f'Task {i}', deadline=deadline,
+                                                 status='completed' if i % 4 == 0 else 'new') for i in range(30)])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE tasks_taskmodel')
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+        self.changelist_url = reverse('admin:tasks_taskmodel_changelist')
+
+    def test_changelist_queries_dont_grow_with_rows(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Task 29')
+
+        TaskModel.objects.bulk_create([TaskModel(user=UserModel.objects.create_user(username=f'other{i}'),
+                                                 title='Other', deadline=timezone.now()) for i in range(20)])
+        with CaptureQueriesContext(connection) as more:
+            self.client.get(self.changelist_url)
+        self.assertEqual(len(more), len(queries))
+
+    @override_settings(ADMIN_EXACT_COUNT_THRESHOLD=1)
+    def test_counts_are_estimated(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url, {'status__exact': 'completed'})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+        self.assertFalse(response.context['cl'].result_count_is_exact)
+
+    @mock.patch('tasks.admin.TaskAdmin.list_per_page', 20)
+    def test_pages_are_keyed_by_id(self):
+        response = self.client.get(self.changelist_url)
+        cl = response.context['cl']
+        self.assertEqual(len(cl.result_list), 20)
+        self.assertEqual(cl.next_cursor, cl.result_list[-1].pk)
+        self.assertContains(response, f'?after={cl.next_cursor}')
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.changelist_url + cl.next_page_url)
+        cl = response.context['cl']
+        self.assertEqual([task.title for task in cl.result_list], [f'Task {i}' for i in range(9, -1, -1)])
+        self.assertIsNone(cl.next_cursor)
+        self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+
+        response = self.client.get(self.changelist_url, {'o': '6'})
+        self.assertFalse(response.context['cl'].pages_by_cursor)
+
+    def test_bulk_actions_are_single_updates(self):
+        TaskModel.objects.filter(status='new').update(overdue=True)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(self.changelist_url, {
+                'action': 'mark_completed', 'select_across': '1', 'index': '0',
+                '_selected_action': [TaskModel.objects.first().pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in queries), 1)
+        self.assertEqual(TaskModel.objects.filter(status='completed', overdue=False).count(), 30)
+
+    def test_delete_records_subtree_tombstones(self):
+        task = TaskModel.objects.first()
+        subtask = TaskModel.objects.create(user=self.user, title='Subtask', deadline=task.deadline, parent=task)
+        cache.set(f'task:{task.pk}', {'id': task.pk})
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post(reverse('admin:tasks_taskmodel_delete', args=[task.pk]), {'post': 'yes'})
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(TaskModel.objects.filter(pk__in=[task.pk, subtask.pk]).exists())
+        self.assertEqual(set(TaskTombstone.objects.values_list('task_id', flat=True)), {task.pk, subtask.pk})
+        self.assertIsNone(cache.get(f'task:{task.pk}'))
+        # Cache invalidation and the deleted events
+        self.assertEqual(len(callbacks), 2)
+
+    def test_deadline_change_clears_overdue(self):
+        task = TaskModel.objects.filter(status='new').first()
+        TaskModel.objects.filter(pk=task.pk).update(overdue=True)
+        task.refresh_from_db()
+        task.deadline += timedelta(days=1)
+        task_admin = admin.site._registry[TaskModel]
+        with self.captureOnCommitCallbacks(execute=True):
+            task_admin.save_model(None, task, mock.Mock(changed_data=['deadline']), change=True)
+        task.refresh_from_db()
+        self.assertFalse(task.overdue)
+
+    def test_user_field_is_an_autocomplete(self):
+        response = self.client.get(reverse('admin:tasks_taskmodel_change', args=[TaskModel.objects.first().pk]))
+        self.assertContains(response, 'admin-autocomplete')
+        self.assertNotContains(response, '<option value="%d">' % self.staff.pk)
+        response = self.client.get(reverse('admin:autocomplete'), {
+            'app_label': 'tasks', 'model_name': 'taskmodel', 'field_name': 'user', 'term': 'test',
+        })
+        self.assertEqual([result['text'] for result in response.json()['results']], ['testuser'])
+
+
+class TaskTransitionTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        self.client.force_authenticate(user=self.user)
+        deadline = timezone.now() + timedelta(days=1)
+        self.tasks = TaskModel.objects.bulk_create([TaskModel(user=self.user, title=f'Task {i}', deadline=deadline)
+                                                    for i in range(3)])
+        self.task = self.tasks[0]
+
+    def transition(self, task, **data):
+        return self.client.post(reverse('task-transition', args=[task.pk]), data, format='json')
+
+    def test_transition_is_one_update(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.transition(self.task, status='in_progress', expected='new')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'][0]['status'], 'in_progress')
+        statements = [query['sql'] for query in queries if 'tasks_taskmodel' in query['sql']]
+        self.assertEqual(len(statements), 1)
+        self.assertIn('"status" IN', statements[0])
+
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'in_progress')
+        self.assertEqual(self.transition(self.task, status='completed').status_code, status.HTTP_200_OK)
+
+    def test_conflict(self):
+        TaskModel.objects.filter(pk=self.task.pk).update(status='completed')
+        response = self.transition(self.task, status='in_progress', expected='new')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['conflicts'], [{'id': self.task.pk, 'status': 'completed'}])
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.status, 'completed')
+
+    def test_disallowed_transition(self):
+        TaskModel.objects.filter(pk=self.task.pk).update(status='completed')
+        self.assertEqual(self.transition(self.task, status='new', expected='completed').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.transition(self.task, status='new').status_code, status.HTTP_409_CONFLICT)
+
+    def test_noop_writes_nothing(self):
+        TaskModel.objects.filter(pk=self.task.pk).update(status='completed')
+        self.task.refresh_from_db()
+        with mock.patch('tasks.views.publish_task_events') as publish:
+            response = self.transition(self.task, status='completed', expected='in_progress')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'updated': [], 'unchanged': [self.task.pk]})
+        publish.assert_not_called()
+        self.assertEqual(TaskModel.objects.get(pk=self.task.pk).updated_at, self.task.updated_at)
+
+    def test_completing_clears_overdue(self):
+        TaskModel.objects.filter(pk=self.task.pk).update(overdue=True)
+        self.transition(self.task, status='completed')
+        self.assertFalse(TaskModel.objects.get(pk=self.task.pk).overdue)
+
+    def test_batch_moves_all_or_none(self):
+        ids = [task.pk for task in self.tasks]
+        TaskModel.objects.filter(pk=ids[0]).update(status='in_progress')
+        response = self.client.post(reverse('task-transitions'), {'ids': ids, 'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sorted(task['id'] for task in response.data['updated']), ids[1:])
+        self.assertEqual(response.data['unchanged'], [ids[0]])
+
+        TaskModel.objects.filter(pk=ids[0]).update(status='completed')
+        response = self.client.post(reverse('task-transitions'), {'ids': ids, 'status': 'completed',
+                                                                  'expected': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        TaskModel.objects.filter(pk=ids[0]).update(status='new')
+        response = self.client.post(reverse('task-transitions'), {'ids': ids, 'status': 'in_progress',
+                                                                  'expected': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['conflicts'], [{'id': ids[0], 'status': 'new'}])
+        self.assertEqual(TaskModel.objects.filter(status='completed').count(), 2)
+
+    @override_settings(TASK_TRANSITION_MAX_IDS=2)
+    def test_batch_size_is_limited(self):
+        response = self.client.post(reverse('task-transitions'),
+                                    {'ids': [task.pk for task in self.tasks], 'status': 'completed'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_users_tasks(self):
+        other = UserModel.objects.create_user(username='other', password='testpassword123')
+        task = TaskModel.objects.create(user=other, title='Theirs', deadline=timezone.now() + timedelta(days=1))
+        response = self.client.post(reverse('task-transitions'), {'ids': [self.task.pk, task.pk],
+                                                                  'status': 'in_progress'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data['ids'], [task.pk])
+        self.assertFalse(TaskModel.objects.filter(status='in_progress').exists())
+
+
+class TaskFilterTests(TestCase):
+    STATUSES = ('new', 'in_progress', 'completed')
+    PRIORITIES = ('low', 'medium', 'high')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserModel.objects.create_user(username='testuser', password='testpassword123')
+        cls.year = year = timezone.now().year + 1
+        tz = timezone.get_current_timezone()
+        # Around the edges of the ranges filtered by below
+        deadlines = [datetime(*parts, tzinfo=tz) for parts in (
+            (year, 1, 1), (year, 2, 28, 23, 59, 59), (year, 3, 1), (year, 3, 1, 12), (year, 3, 31, 23),
+            (year, 4, 1), (year, 12, 31, 23, 59), (year + 1, 1, 1),
+        )]
+        cls.created = timezone.now().replace(microsecond=0) - timedelta(days=30)
+        cls.tasks = TaskModel.objects.bulk_create([
+            TaskModel(user=cls.user, title=f'Task {i}', deadline=deadlines[i % 8], status=cls.STATUSES[i % 3],
+                      priority=cls.PRIORITIES[i // 8]) for i in range(24)
+        ])
+        for i, task in enumerate(cls.tasks):
+            task.created_at = cls.created + timedelta(days=i)
+        TaskModel.objects.bulk_update(cls.tasks, ['created_at'])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def list(self, params, url_name='task-list'):
+        response = self.client.get(reverse(url_name), params)
+        if response.status_code == status.HTTP_404_NOT_FOUND:
+            return []
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        return [task['id'] for task in response.data]
+
+    def test_filter_combinations(self):
+        tz = timezone.get_current_timezone()
+        year = self.year
+
+        def at(*parts):
+            return datetime(*parts, tzinfo=tz)
+
+        statuses = {None: self.STATUSES, 'new': ['new'], 'new,completed': ['new', 'completed']}
+        priorities = {None: self.PRIORITIES, 'high': ['high'], 'low,medium': ['low', 'medium']}
+        # Parameters -> the half-open deadline range they should select
+        deadlines = [
+            ({}, (None, None)),
+            ({'year': year}, (at(year, 1, 1), at(year + 1, 1, 1))),
+            ({'year': year, 'month': 3}, (at(year, 3, 1), at(year, 4, 1))),
+            ({'year': year, 'month': 3, 'day': 1}, (at(year, 3, 1), at(year, 3, 2))),
+            ({'deadline_after': f'{year}-03-01'}, (at(year, 3, 1), None)),
+            ({'deadline_before': f'{year}-03-01T00:00:00'}, (None, at(year, 3, 1))),
+            ({'year': year, 'month': 3, 'deadline_after': f'{year}-03-01T06:00:00'},
+             (at(year, 3, 1, 6), at(year, 4, 1))),
+            ({'year': year, 'deadline_before': f'{year}-02-01'}, (at(year, 1, 1), at(year, 2, 1))),
+        ]
+        created = [
+            ({}, (None, None)),
+            ({'created_after': (self.created + timedelta(days=10)).isoformat()},
+             (self.created + timedelta(days=10), None)),
+            ({'created_before': (self.created + timedelta(days=5)).isoformat()},
+             (None, self.created + timedelta(days=5))),
+        ]
+
+        def within(value, bounds):
+            start, end = bounds
+            return (start is None or value >= start) and (end is None or value < end)
+
+        for status_param, priority_param, (deadline_params, deadline_range), (created_params, created_range) in \
+                itertools.product(statuses, priorities, deadlines, created):
+            params = {**deadline_params, **created_params}
+            if status_param:
+                params['status'] = status_param
+            if priority_param:
+                params['priority'] = priority_param
+            expected = sorted(task.pk for task in self.tasks if task.status in statuses[status_param]
+                              and task.priority in priorities[priority_param]
+                              and within(task.deadline, deadline_range) and within(task.created_at, created_range))
+            with self.subTest(**params):
+                self.assertEqual(sorted(self.list(params)), expected)
+
+    def test_deadline_bounds_compile_to_one_range(self):
+        params = {'year': self.year, 'month': 3, 'day': 1, 'deadline_after': f'{self.year}-02-01',
+                  'deadline_before': f'{self.year}-03-01T18:00:00', 'created_after': self.created.isoformat()}
+        with CaptureQueriesContext(connection) as queries:
+            ids = self.list(params)
+        self.assertEqual(sorted(ids), sorted(task.pk for task in self.tasks if task.deadline.month == 3
+                                             and task.deadline.day == 1 and task.deadline.year == self.year))
+        sql = next(query['sql'] for query in queries if 'FROM "tasks_taskmodel"' in query['sql'])
+        self.assertEqual(sql.count('"tasks_taskmodel"."deadline" >='), 1)
+        self.assertEqual(sql.count('"tasks_taskmodel"."deadline" <'), 1)
+        self.assertNotIn('BETWEEN', sql)
+
+    def test_repeated_values(self):
+        self.assertEqual(sorted(self.list({'status': ['new', 'completed'], 'priority': 'high'})),
+                         sorted(task.pk for task in self.tasks
+                                if task.status != 'in_progress' and task.priority == 'high'))
+
+    def test_ordering(self):
+        ids = self.list({'ordering': '-priority,deadline'})
+        expected = sorted(self.tasks, key=lambda task: (-self.PRIORITIES.index(task.priority), task.deadline, task.pk))
+        self.assertEqual(ids, [task.pk for task in expected])
+        self.assertEqual(self.list({'ordering': '-created_at'}), [task.pk for task in reversed(self.tasks)])
+
+    def test_ordering_of_expanded_occurrences(self):
+        series = TaskModel.objects.create(user=self.user, title='Recurring', priority='high',
+                                          deadline=datetime(self.year, 3, 1, 6, tzinfo=timezone.get_current_timezone()),
+                                          recurrence='FREQ=DAILY;COUNT=3')
+        response = self.client.get(reverse('task-list'),
+                                   {'year': self.year, 'month': 3, 'ordering': '-priority,deadline'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        keys = [(-self.PRIORITIES.index(task['priority']), parse_datetime(task['deadline'])) for task in response.data]
+        self.assertEqual(keys, sorted(keys))
+        self.assertEqual(sum(task['series'] == series.pk for task in response.data), 3)
+
+    def test_admin_list_filters_alike(self):
+        params = {'status': 'new,completed', 'priority': 'low', 'year': self.year, 'month': 3}
+        self.assertEqual(sorted(self.list(params, 'admin-task-list')), sorted(self.list(params)))
+
+    def test_invalid_filters(self):
+        for params in ({'status': 'done'}, {'priority': 'urgent'}, {'deadline_after': 'tomorrow'},
+                       {'created_before': '2025-13-01'}, {'month': 3}, {'year': self.year, 'day': 1},
+                       {'year': self.year, 'month': 13}, {'year': 'next'}, {'overdue': 'maybe'},
+                       {'ordering': 'user'}, {'tags': 'x', 'tags_match': 'some'}):
+            for url_name in ('task-list', 'admin-task-list'):
+                with self.subTest(url_name=url_name, **params):
+                    response = self.client.get(reverse(url_name), params)
+                    self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                    self.assertIsInstance(response.data['detail'], str)
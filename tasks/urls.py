@@ -1,8 +1,18 @@
 from django.urls import path
-from .views import TaskListView, TaskDetailView, AdminTaskListView
+from .views import (TaskListView, TaskDetailView, TaskOccurrenceView, TaskSubtreeView, TaskProgressView,
+                    TaskSubtreeStatusView, TaskTransitionView, TaskTransitionsView, TaskEventsView,
+                    TaskIngestStatusView, AdminTaskListView)
 
 urlpatterns = [
     path('my/', TaskListView.as_view(), name='task-list'),
     path('my/<int:pk>/', TaskDetailView.as_view(), name='task-detail'),
+    path('my/<int:pk>/occurrences/<str:occurrence>/', TaskOccurrenceView.as_view(), name='task-occurrence'),
+    path('my/<int:pk>/subtree/', TaskSubtreeView.as_view(), name='task-subtree'),
+    path('my/<int:pk>/subtree/status/', TaskSubtreeStatusView.as_view(), name='task-subtree-status'),
+    path('my/<int:pk>/progress/', TaskProgressView.as_view(), name='task-progress'),
+    path('my/<int:pk>/transition/', TaskTransitionView.as_view(), name='task-transition'),
+    path('my/transitions/', TaskTransitionsView.as_view(), name='task-transitions'),
+    path('my/events/', TaskEventsView.as_view(), name='task-events'),
+    path('my/ingest/<uuid:tracking_id>/', TaskIngestStatusView.as_view(), name='task-ingest-status'),
     path('all/', AdminTaskListView.as_view(), name='admin-task-list'),
 ]
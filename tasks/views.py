@@ -1,440 +1,484 @@
 import logging
-from datetime import datetime, timedelta
+from datetime import timedelta
 
+from rest_framework.exceptions import ParseError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.core.cache import cache
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
-from .models import TaskModel
-from .serializers import TaskSerializer
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+from redis.exceptions import RedisError
+from ustudy_test_task.docs import lazy_swagger_auto_schema
+from ustudy_test_task.renderers import EventStreamRenderer
+from . import recurrence
+from .cache import cache_task, get_tasks, invalidate_tasks
+from .deletion import delete_task
+from .events import (TASK_CREATED, TASK_DELETED, TASK_UPDATED, publish_task_event, publish_task_events,
+                     stream_task_events)
+from .filters import TaskFilterBackend
+from .ingest import enqueue_task, ingestion_status
+from .models import TaskModel, TaskTombstone
+from .serializers import TaskSerializer, TaskTransitionSerializer
 
 logger = logging.getLogger(__name__)
 
 
 class TaskListView(APIView):
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='List tasks',
-        operation_description='List all tasks',
-        manual_parameters=[
-            openapi.Parameter(
-                'status', openapi.IN_QUERY,
-                description="Filter tasks by status (new, in progress, completed)",
-                type=openapi.TYPE_STRING
-            ),
-            openapi.Parameter(
-                'year', openapi.IN_QUERY,
-                description="Filter tasks by year",
-                type=openapi.TYPE_INTEGER
-            ),
-            openapi.Parameter(
-                'month', openapi.IN_QUERY,
-                description="Filter tasks by month",
-                type=openapi.TYPE_INTEGER
-            ),
-            openapi.Parameter(
-                'day', openapi.IN_QUERY,
-                description="Filter tasks by day",
-                type=openapi.TYPE_INTEGER
-            )
-        ],
-        responses={
-            200: openapi.Response('List of tasks', TaskSerializer(many=True)),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-            404: openapi.Response('No tasks found', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='No tasks found')
-                }
-            )),
-            500: openapi.Response('Internal server error', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Internal server error')
-                }
-            )),
-        }
-    )
+    filter_backend = TaskFilterBackend()
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_list_get')
     def get(self, request):
+        if 'ids' in request.query_params:
+            return self.multi_get(request, request.query_params['ids'])
         try:
-            tasks = TaskModel.objects.filter(user=request.user)
+            tasks = self.filter_backend.filter_queryset(request, TaskModel.objects.filter(user=request.user), self)
 
-            status_filter = request.query_params.get('status')
-            year = request.query_params.get('year')
-            month = request.query_params.get('month')
-            day = request.query_params.get('day')
+            if request.query_params.get('updated_since'):
+                return self.sync(request, tasks)
 
-            # Validate and apply status filter
-            if status_filter:
-                if status_filter not in ['new', 'in_progress', 'completed']:
-                    return Response({'detail': 'Invalid status filter'}, status=status.HTTP_400_BAD_REQUEST)
-                tasks = tasks.filter(status=status_filter)
-
-            if year:
-                try:
-                    start_date = datetime(year=int(year), month=1, day=1)
-                    end_date = datetime(year=int(year) + 1, month=1, day=1)
-                    tasks = tasks.filter(deadline__range=[start_date, end_date])
-                except ValueError:
-                    return Response({'detail': 'Invalid year format. Year must be an integer.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-
-            if month:
-                try:
-                    if not year:
-                        return Response({'detail': 'Year must be provided with month.'},
-                                        status=status.HTTP_400_BAD_REQUEST)
-                    start_date = datetime(year=int(year), month=int(month), day=1)
-                    # Calculate the last day of the month
-                    next_month = start_date.replace(day=28) + timedelta(days=4)
-                    end_date = next_month - timedelta(days=next_month.day)
-                    tasks = tasks.filter(deadline__range=[start_date, end_date])
-                except ValueError:
-                    return Response({'detail': 'Invalid month format. Month must be an integer between 1 and 12.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                except TypeError:
-                    return Response({'detail': 'Year and month must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            if day:
-                try:
-                    if not year or not month:
-                        return Response({'detail': 'Year and month must be provided with day.'},
-                                        status=status.HTTP_400_BAD_REQUEST)
-                    start_date = datetime(year=int(year), month=int(month), day=int(day))
-                    end_date = start_date + timedelta(days=1)
-                    tasks = tasks.filter(deadline__range=[start_date, end_date])
-                except ValueError:
-                    return Response({'detail': 'Invalid day format. Day must be an integer.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                except TypeError:
-                    return Response({'detail': 'Year, month, and day must be integers.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
+            # A deadline range with both ends asked for, occurrences of recurring tasks in it are expanded
+            start, end = self.filter_backend.range(request.query_params, 'deadline')
+            if start and end:
+                series = self.filter_backend.filter_shared(
+                    request, TaskModel.objects.filter(user=request.user).exclude(recurrence=''),
+                )
+                return self.expand(request, tasks, series, start, end)
 
             if not tasks.exists():
                 return Response({'detail': 'No tasks found'}, status=status.HTTP_404_NOT_FOUND)
 
-            serializer = TaskSerializer(tasks, many=True)
+            # Streamed from a named server-side cursor instead of loading every row at once
+            serializer = TaskSerializer(tasks.iterator(chunk_size=settings.TASK_LIST_CHUNK_SIZE), many=True)
             return Response(serializer.data)
+        except ParseError as e:
+            return Response({'detail': e.detail}, status=status.HTTP_400_BAD_REQUEST)
         except TaskModel.DoesNotExist:
             return Response({'detail': 'No tasks found'}, status=status.HTTP_404_NOT_FOUND)
         except Exception:
             return Response({'detail': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='Create a task',
-        operation_description='Create a task',
-        request_body=TaskSerializer,
-        responses={
-            201: openapi.Response('Task created', TaskSerializer),
-            400: openapi.Response('Validation error', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
-                }
-            )),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-        }
-    )
+    def expand(self, request, tasks, series, start, end):
+        """
+        Return the tasks in `[start, end)`, with the occurrences of recurring tasks in it in place of the series.
+
+        Occurrences follow the rows in chronological order, or are sorted in among them by `?ordering=`.
+        """
+        # Occurrences are expanded up to and including their end
+        last = end - timedelta(microseconds=1)
+        overdue = self.filter_backend.overdue(request.query_params)
+        data = [*TaskSerializer(tasks.filter(recurrence=''), many=True).data,
+                *recurrence.expand(series.filter(deadline__lt=end), start, last, overdue=overdue)]
+        self.filter_backend.sort(request.query_params, data)
+        if not data:
+            return Response({'detail': 'No tasks found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(data)
+
+    def multi_get(self, request, ids):
+        """Return the user's tasks among `ids` in the requested order, served from the task cache."""
+        try:
+            pks = [int(pk) for pk in ids.split(',')]
+        except ValueError:
+            return Response({'detail': 'Invalid ids format. Ids must be comma-separated integers.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(pks) > settings.TASK_MULTI_GET_MAX_IDS:
+            return Response({'detail': f'At most {settings.TASK_MULTI_GET_MAX_IDS} ids can be requested at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(get_tasks(request.user, pks))
+
+    def sync(self, request, tasks):
+        """
+        Return only the tasks changed and deleted after the `updated_since` cursor.
+
+        Changes are stamped when they are saved, a transaction may commit after a later cursor was handed out. So the
+        cursor lags TASK_SYNC_OVERLAP_SECONDS behind, and clients apply changes they already have again by id.
+        """
+        filters = [name for name in self.filter_backend.parameters() if name in request.query_params]
+        if filters:
+            # A task changed to no longer match them would drop out of the sync without a tombstone
+            return Response({'detail': f'updated_since cannot be combined with filters: {", ".join(filters)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        since = self.filter_backend.bound(request.query_params, 'updated_since')
+
+        # Captured before querying, so changes made while we read, or committed late, are included in the next sync
+        now = timezone.now()
+        cursor = now - timedelta(seconds=settings.TASK_SYNC_OVERLAP_SECONDS)
+        if since < now - timedelta(days=settings.TASK_TOMBSTONE_RETENTION_DAYS):
+            return Response({'detail': 'Sync cursor expired, re-download all tasks'}, status=status.HTTP_410_GONE)
+
+        tasks = tasks.filter(updated_at__gt=since)
+        deleted = TaskTombstone.objects.filter(user=request.user, deleted_at__gt=since).values_list('task_id', flat=True)
+        return Response({
+            'tasks': TaskSerializer(tasks, many=True).data,
+            'deleted': list(deleted),
+            'cursor': cursor.isoformat(),
+        })
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_list_post')
     def post(self, request):
         serializer = TaskSerializer(data=request.data, context={'request': request})
         if serializer.is_valid():
+            if self.prefers_async(request):
+                try:
+                    return self.enqueue(request, serializer.validated_data)
+                except RedisError as e:
+                    logger.error('Task ingestion queue is unavailable, creating task synchronously', exc_info=e)
             serializer.save()
             logger.info(f'Task created: title={serializer.data["title"]} by user={request.user.username}')
+            publish_task_event(request.user.pk, TASK_CREATED, serializer.data)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         logger.error(f'Error while creating task: {serializer.errors}')
         return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def prefers_async(request):
+        preferences = request.headers.get('Prefer', '').split(',')
+        return 'respond-async' in (preference.strip().lower() for preference in preferences)
+
+    @staticmethod
+    def enqueue(request, validated_data):
+        tracking_id = enqueue_task(request.user.pk, validated_data)
+        logger.info(f'Task queued: tracking_id={tracking_id} by user={request.user.username}')
+        response = Response({'tracking_id': tracking_id, 'status': 'pending'}, status=status.HTTP_202_ACCEPTED)
+        response['Location'] = reverse('task-ingest-status', args=[tracking_id])
+        response['Preference-Applied'] = 'respond-async'
+        return response
+
 
 class TaskDetailView(APIView):
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='Get a task',
-        operation_description='Get a task',
-        responses={
-            200: openapi.Response('Task details', TaskSerializer),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-            404: openapi.Response('Task does not exist', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
-                }
-            )),
-        }
-    )
+    @lazy_swagger_auto_schema('tasks.schemas.task_detail_get')
     def get(self, request, pk):
-        try:
-            task = TaskModel.objects.get(pk=pk, user=request.user)
-            serializer = TaskSerializer(task)
-            logger.info(f'Task details retrieved: title={serializer.data["title"]} by user={request.user.username}')
-            return Response(serializer.data)
-        except TaskModel.DoesNotExist:
+        tasks = get_tasks(request.user, [pk])
+        if not tasks:
             logger.error(f'Task does not exist: pk={pk}')
             return Response({'detail': 'Task does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f'Task details retrieved: title={tasks[0]["title"]} by user={request.user.username}')
+        return Response(tasks[0])
 
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='Update a task',
-        operation_description='Update a task',
-        request_body=TaskSerializer,
-        responses={
-            200: openapi.Response('Task updated', TaskSerializer),
-            400: openapi.Response('Validation error', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
-                }
-            )),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-            404: openapi.Response('Task does not exist', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
-                }
-            )),
-        }
-    )
+    @lazy_swagger_auto_schema('tasks.schemas.task_detail_put')
     def put(self, request, pk):
+        return self.update(request, pk)
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_detail_patch')
+    def patch(self, request, pk):
+        return self.update(request, pk, partial=True)
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_detail_delete')
+    def delete(self, request, pk):
         try:
-            task = TaskModel.objects.get(pk=pk, user=request.user)
-            logger.info(f'Task details retrieved for update: title={task.title} by user={request.user.username}')
-        except TaskModel.DoesNotExist:
+            deleted = delete_task(pk, request.user.pk)
+        except Exception as e:
+            logger.error('Internal server error', exc_info=e)
+            return Response({'detail': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        if not deleted:
             logger.error(f'Task does not exist: pk={pk}')
             return Response({'detail': 'Task does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        logger.info(f'Task deleted: pk={pk} by user={request.user.username}')
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        serializer = TaskSerializer(task, data=request.data, context={'request': request})
-        if serializer.is_valid():
-            serializer.save()
-            logger.info(f'Task updated: title={serializer.data["title"]} by user={request.user.username}')
-            return Response(serializer.data)
-        return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+    def update(self, request, pk, partial=False):
+        """Write only the submitted columns with one UPDATE ... RETURNING, scoped to the user's task."""
+        serializer = TaskSerializer(data=request.data, context={'request': request, 'task_id': pk}, partial=partial)
+        if not serializer.is_valid():
+            return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='Partial update a task',
-        operation_description='Partial update a task',
-        request_body=TaskSerializer,
-        responses={
-            200: openapi.Response('Task updated', TaskSerializer),
-            400: openapi.Response('Validation error', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
-                }
-            )),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-            404: openapi.Response('Task does not exist', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
-                }
-            )),
-        }
-    )
-    def patch(self, request, pk):
-        try:
-            task = TaskModel.objects.get(pk=pk, user=request.user)
-            logger.info(
-                f'Task details retrieved for partial update: title={task.title} by user={request.user.username}')
-        except TaskModel.DoesNotExist:
+        updated = TaskModel.objects.filter(pk=pk, user=request.user).update_returning(**serializer.validated_data)
+        if not updated:
+            logger.error(f'Task does not exist: pk={pk}')
             return Response({'detail': 'Task does not exist'}, status=status.HTTP_404_NOT_FOUND)
 
-        serializer = TaskSerializer(task, data=request.data, context={'request': request}, partial=True)
-        if serializer.is_valid():
-            serializer.save()
-            logger.info(f'Task updated: title={serializer.data["title"]} by user={request.user.username}')
-            return Response(serializer.data)
-        return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        data = TaskSerializer(updated[0]).data
+        cache_task(data)
+        logger.info(f'Task updated: title={data["title"]} by user={request.user.username}')
+        publish_task_event(request.user.pk, TASK_UPDATED, data)
+        return Response(data)
 
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='Delete a task',
-        operation_description='Delete a task',
-        responses={
-            204: openapi.Response('Task deleted', None),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-            404: openapi.Response('Task does not exist', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Task does not exist')
-                }
-            )),
-            500: openapi.Response('Internal server error', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Internal server error')
-                }
-            )),
-        }
-    )
-    def delete(self, request, pk):
-        try:
-            task = TaskModel.objects.get(pk=pk, user=request.user)
-            logger.info(f'Task details retrieved for deletion: title={task.title} by user={request.user.username}')
-        except TaskModel.DoesNotExist:
+
+class TaskOccurrenceView(APIView):
+    """An occurrence of a recurring task, addressed by its UTC start like `20250301T040000Z`."""
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_occurrence_put')
+    def put(self, request, pk, occurrence):
+        return self.update(request, pk, occurrence)
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_occurrence_patch')
+    def patch(self, request, pk, occurrence):
+        return self.update(request, pk, occurrence, partial=True)
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_occurrence_delete')
+    def delete(self, request, pk, occurrence):
+        series, occurrence = self.get_occurrence(request, pk, occurrence)
+        if series is None:
+            return Response({'detail': 'Occurrence does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        with transaction.atomic():
+            recurrence.exclude_occurrence(series.pk, occurrence)
+            changed = list(TaskModel.objects.filter(series=series, occurrence=occurrence).values_list('pk', flat=True))
+            if changed:
+                TaskModel.objects.filter(pk__in=changed).delete()
+                TaskTombstone.objects.bulk_create([TaskTombstone(task_id=task_id, user=request.user)
+                                                   for task_id in changed])
+        invalidate_tasks([series.pk, *changed])
+        logger.info(f'Occurrence deleted: series={series.pk} occurrence={occurrence.isoformat()} '
+                    f'by user={request.user.username}')
+        publish_task_events(request.user.pk, TASK_DELETED, [{'id': task_id} for task_id in changed])
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @staticmethod
+    def get_occurrence(request, pk, key):
+        """Return the user's recurring task and the occurrence the key stands for, or None if either doesn't exist."""
+        occurrence = recurrence.parse_occurrence_key(key)
+        series = TaskModel.objects.filter(pk=pk, user=request.user).exclude(recurrence='').first()
+        if occurrence is None or series is None or not recurrence.is_occurrence(series, occurrence):
+            logger.error(f'Occurrence does not exist: pk={pk} occurrence={key}')
+            return None, None
+        return series, occurrence
+
+    def update(self, request, pk, key, partial=False):
+        """Change one occurrence, which stores it as a task of its own the first time."""
+        series, occurrence = self.get_occurrence(request, pk, key)
+        if series is None:
+            return Response({'detail': 'Occurrence does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        serializer = TaskSerializer(data=request.data, context={'request': request}, partial=partial)
+        if not serializer.is_valid():
+            return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        # An occurrence doesn't recur itself
+        fields = {name: value for name, value in serializer.validated_data.items() if name != 'recurrence'}
+
+        event = TASK_UPDATED
+        updated = TaskModel.objects.filter(series=series, occurrence=occurrence).update_returning(**fields)
+        if not updated:
+            values = {
+                'title': series.title, 'description': series.description, 'priority': series.priority,
+                'status': series.status, 'tags': series.tags, 'deadline': occurrence, **fields,
+            }
+            values.setdefault('overdue', values['deadline'] < timezone.now() and values['status'] != 'completed')
+            try:
+                with transaction.atomic():
+                    updated = [TaskModel.objects.create(user=request.user, series=series, occurrence=occurrence,
+                                                        **values)]
+                event = TASK_CREATED
+            except IntegrityError:
+                # Stored by a concurrent request in the meantime
+                updated = TaskModel.objects.filter(series=series, occurrence=occurrence).update_returning(**fields)
+
+        data = TaskSerializer(updated[0]).data
+        cache_task(data)
+        logger.info(f'Occurrence updated: series={series.pk} occurrence={key} by user={request.user.username}')
+        publish_task_event(request.user.pk, event, data)
+        return Response(data)
+
+
+class TaskSubtreeView(APIView):
+    @lazy_swagger_auto_schema('tasks.schemas.task_subtree_get')
+    def get(self, request, pk):
+        """Return a task with its subtasks nested under it at every level, each with its progress."""
+        tasks = TaskModel.objects.subtree(pk, request.user.pk)
+        if not tasks:
             logger.error(f'Task does not exist: pk={pk}')
             return Response({'detail': 'Task does not exist'}, status=status.HTTP_404_NOT_FOUND)
-        except Exception as e:
-            logger.error('Internal server error', exc_info=e)
-            return Response({'detail': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-        task.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+
+        nodes = {}
+        for task, data in zip(tasks, TaskSerializer(tasks, many=True).data):
+            nodes[task.pk] = {**data, 'subtasks': []}
+            if task.depth:
+                nodes[task.parent_id]['subtasks'].append(nodes[task.pk])
+        # Subtasks come after their parents, so in reverse every node's subtasks are rolled up before it
+        for task in reversed(tasks):
+            subtasks = nodes[task.pk]['subtasks']
+            nodes[task.pk]['progress'] = {
+                'subtasks': len(subtasks),
+                'subtasks_completed': sum(subtask['status'] == 'completed' for subtask in subtasks),
+                'descendants': sum(1 + subtask['progress']['descendants'] for subtask in subtasks),
+                'descendants_completed': sum((subtask['status'] == 'completed')
+                                             + subtask['progress']['descendants_completed'] for subtask in subtasks),
+            }
+        return Response(nodes[pk])
+
+
+class TaskProgressView(APIView):
+    @lazy_swagger_auto_schema('tasks.schemas.task_progress_get')
+    def get(self, request, pk):
+        progress = TaskModel.objects.subtree_progress(pk, request.user.pk)
+        if progress is None:
+            logger.error(f'Task does not exist: pk={pk}')
+            return Response({'detail': 'Task does not exist'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(progress)
+
+
+class TaskSubtreeStatusView(APIView):
+    @lazy_swagger_auto_schema('tasks.schemas.task_subtree_status_post')
+    def post(self, request, pk):
+        """Set the status of a task and all of its subtasks with a single UPDATE."""
+        serializer = TaskSerializer(data={'status': request.data.get('status')}, partial=True)
+        if not serializer.is_valid():
+            return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        updated = TaskModel.objects.filter(pk__in=TaskModel.objects.subtree_ids(pk, request.user.pk)) \
+            .update_returning(**serializer.validated_data)
+        if not updated:
+            logger.error(f'Task does not exist: pk={pk}')
+            return Response({'detail': 'Task does not exist'}, status=status.HTTP_404_NOT_FOUND)
+
+        invalidate_tasks([task.pk for task in updated])
+        publish_task_events(request.user.pk, TASK_UPDATED, TaskSerializer(updated, many=True).data)
+        logger.info(f'Subtree status set: pk={pk} status={serializer.validated_data["status"]} '
+                    f'tasks={len(updated)} by user={request.user.username}')
+        return Response({'updated': len(updated)})
+
+
+def transition_tasks(request, data):
+    """
+    Move the user's tasks in `data['ids']` to `data['status']`, all of them or, if any conflicts, none.
+
+    Moving them is one conditional UPDATE. Only ids it didn't move are looked up, to tell tasks already in the status,
+    which are left as they are, from conflicts and unknown ids.
+    """
+    serializer = TaskTransitionSerializer(data=data)
+    if not serializer.is_valid():
+        return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+    ids = serializer.validated_data['ids']
+    target = serializer.validated_data['status']
+
+    with transaction.atomic():
+        updated = TaskModel.objects.filter(user=request.user, pk__in=ids) \
+            .transition(target, serializer.validated_data.get('expected'))
+        moved = {task.pk for task in updated}
+        current = {}
+        if len(moved) < len(ids):
+            current = dict(TaskModel.objects.filter(user=request.user, pk__in=[pk for pk in ids if pk not in moved])
+                           .values_list('pk', 'status'))
+        missing = [pk for pk in ids if pk not in moved and pk not in current]
+        conflicts = [{'id': pk, 'status': current[pk]} for pk in ids if current.get(pk, target) != target]
+        if missing or conflicts:
+            transaction.set_rollback(True)
+
+    if missing:
+        return Response({'detail': 'Task does not exist', 'ids': missing}, status=status.HTTP_404_NOT_FOUND)
+    if conflicts:
+        return Response({'detail': 'Task status changed or the transition is not allowed', 'conflicts': conflicts},
+                        status=status.HTTP_409_CONFLICT)
+
+    data = TaskSerializer(updated, many=True).data
+    if updated:
+        invalidate_tasks(list(moved))
+        publish_task_events(request.user.pk, TASK_UPDATED, data)
+        logger.info(f'Tasks moved to {target}: ids={sorted(moved)} by user={request.user.username}')
+    return Response({'updated': data, 'unchanged': [pk for pk in ids if pk in current]})
+
+
+class TaskTransitionView(APIView):
+    @lazy_swagger_auto_schema('tasks.schemas.task_transition_post')
+    def post(self, request, pk):
+        """Move a task to another status, optionally only if it is still in `expected`."""
+        return transition_tasks(request, {
+            **{key: request.data[key] for key in ('status', 'expected') if key in request.data},
+            'ids': [pk],
+        })
+
+
+class TaskTransitionsView(APIView):
+    @lazy_swagger_auto_schema('tasks.schemas.task_transitions_post')
+    def post(self, request):
+        """Move many tasks to another status at once, see `transition_tasks`."""
+        return transition_tasks(request, request.data)
+
+
+class TaskEventsView(APIView):
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, EventStreamRenderer]
+
+    @lazy_swagger_auto_schema('tasks.schemas.task_events_get')
+    def get(self, request):
+        # The async generator is consumed by the ASGI event loop, so idle connections hold no worker thread
+        response = StreamingHttpResponse(
+            stream_task_events(request.user.pk, request.headers.get('Last-Event-ID')),
+            content_type='text/event-stream',
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class TaskIngestStatusView(APIView):
+    @lazy_swagger_auto_schema('tasks.schemas.task_ingest_status_get')
+    def get(self, request, tracking_id):
+        result = ingestion_status(request.user.pk, tracking_id)
+        if result is None:
+            return Response({'detail': 'Unknown tracking id'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(result)
 
 
 class AdminTaskListView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure only super admins can access this view
+    filter_backend = TaskFilterBackend()
 
-    @swagger_auto_schema(
-        tags=['Tasks'],
-        operation_id='List all tasks (admin)',
-        operation_description='List all tasks for super admin',
-        manual_parameters=[
-            openapi.Parameter(
-                'status', openapi.IN_QUERY,
-                description="Filter tasks by status (new, in progress, completed)",
-                type=openapi.TYPE_STRING
-            ),
-            openapi.Parameter(
-                'year', openapi.IN_QUERY,
-                description="Filter tasks by year",
-                type=openapi.TYPE_INTEGER
-            ),
-            openapi.Parameter(
-                'month', openapi.IN_QUERY,
-                description="Filter tasks by month",
-                type=openapi.TYPE_INTEGER
-            ),
-            openapi.Parameter(
-                'day', openapi.IN_QUERY,
-                description="Filter tasks by day",
-                type=openapi.TYPE_INTEGER
-            )
-        ],
-        responses={
-            200: openapi.Response('List of all tasks', TaskSerializer(many=True)),
-            401: openapi.Response('Unauthorized', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING,
-                                             description='Authentication credentials were not provided.')
-                }
-            )),
-            403: openapi.Response('Forbidden', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='You do not have permission to perform this action.')
-                }
-            )),
-            404: openapi.Response('No tasks found', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='No tasks found')
-                }
-            )),
-            500: openapi.Response('Internal server error', openapi.Schema(
-                type=openapi.TYPE_OBJECT,
-                properties={
-                    'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Internal server error')
-                }
-            )),
-        }
-    )
+    @lazy_swagger_auto_schema('tasks.schemas.admin_task_list_get')
     def get(self, request):
         try:
-            tasks = TaskModel.objects.all()  # Get all tasks regardless of user
+            # All tasks regardless of user
+            tasks = self.filter_backend.filter_queryset(request, TaskModel.objects.all(), self)
+            if any(request.query_params.get(name) for name in ('limit', 'after', 'page')):
+                page, next_params = self.paginate(request.query_params, tasks)
+                # Of all the matching tasks, not just the page
+                total, exact = tasks.estimated_count(settings.ADMIN_TASK_EXACT_COUNT_THRESHOLD)
+            else:
+                # Without a page asked for every matching task is returned, so the total is what the body holds
+                page, next_params = list(tasks), None
+                total, exact = len(page), True
+            if not page:
+                return Response({'detail': 'No tasks found'}, status=status.HTTP_404_NOT_FOUND)
 
-            status_filter = request.query_params.get('status')
-            year = request.query_params.get('year')
-            month = request.query_params.get('month')
-            day = request.query_params.get('day')
+            response = Response(TaskSerializer(page, many=True).data)
+            response['X-Total-Count'] = str(total)
+            response['X-Total-Count-Exact'] = str(exact).lower()
+            next_url = None
+            if next_params:
+                params = request.query_params.copy()
+                for name in ('after', 'page'):
+                    params.pop(name, None)
+                params.update(next_params)
+                next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+                response['Link'] = f'<{next_url}>; rel="next"'
+            response.metadata = {'total': total, 'total_is_exact': exact, 'next': next_url}
+            return response
+        except ParseError as e:
+            return Response({'detail': e.detail}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception:
+            return Response({'detail': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            if status_filter:
-                if status_filter not in ['new', 'in_progress', 'completed']:
-                    return Response({'detail': 'Invalid status filter'}, status=status.HTTP_400_BAD_REQUEST)
-                tasks = tasks.filter(status=status_filter)
+    @staticmethod
+    def paginate(params, tasks):
+        """
+        Return a page of `?limit=` tasks, ADMIN_TASK_PAGE_SIZE by default, and the query parameters of the next page,
+        None on the last one.
 
-            if year:
-                try:
-                    start_date = datetime(year=int(year), month=1, day=1)
-                    end_date = datetime(year=int(year) + 1, month=1, day=1)
-                    tasks = tasks.filter(deadline__range=[start_date, end_date])
-                except ValueError:
-                    return Response({'detail': 'Invalid year format. Year must be an integer.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-
-            if month:
-                try:
-                    if not year:
-                        return Response({'detail': 'Year must be provided with month.'},
-                                        status=status.HTTP_400_BAD_REQUEST)
-                    start_date = datetime(year=int(year), month=int(month), day=1)
-                    next_month = start_date.replace(day=28) + timedelta(days=4)
-                    end_date = next_month - timedelta(days=next_month.day)
-                    tasks = tasks.filter(deadline__range=[start_date, end_date])
-                except ValueError:
-                    return Response({'detail': 'Invalid month format. Month must be an integer between 1 and 12.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                except TypeError:
-                    return Response({'detail': 'Year and month must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
-
-            if day:
-                try:
-                    if not year or not month:
-                        return Response({'detail': 'Year and month must be provided with day.'},
-                                        status=status.HTTP_400_BAD_REQUEST)
-                    start_date = datetime(year=int(year), month=int(month), day=int(day))
-                    end_date = start_date + timedelta(days=1)
-                    tasks = tasks.filter(deadline__range=[start_date, end_date])
-                except ValueError:
-                    return Response({'detail': 'Invalid day format. Day must be an integer.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
-                except TypeError:
-                    return Response({'detail': 'Year, month, and day must be integers.'},
-                                    status=status.HTTP_400_BAD_REQUEST)
+        Pages follow each other by id with `?after=<id>`, a keyset condition instead of an OFFSET. Lists sorted with
+        `?ordering=` fall back to numbered pages, `?page=`, like the Django admin's.
+        """
+        def positive(name, default):
+            value = params.get(name)
+            if not value:
+                return default
+            if not value.isdigit() or int(value) < 1:
+                raise ParseError(f'Invalid {name}. Use a positive integer.')
+            return int(value)
 
-            if not tasks.exists():
-                return Response({'detail': 'No tasks found'}, status=status.HTTP_404_NOT_FOUND)
+        limit = positive('limit', settings.ADMIN_TASK_PAGE_SIZE)
+        if limit > settings.ADMIN_TASK_MAX_PAGE_SIZE:
+            raise ParseError(f'Invalid limit. At most {settings.ADMIN_TASK_MAX_PAGE_SIZE} tasks fit in a page.')
+        # One row more than a page tells whether there is a next one
+        if params.get('ordering'):
+            number = positive('page', 1)
+            rows = list(tasks[(number - 1) * limit:number * limit + 1])
+        else:
+            after = positive('after', None)
+            if after:
+                tasks = tasks.filter(pk__gt=after)
+            rows = list(tasks.order_by('pk')[:limit + 1])
 
-            serializer = TaskSerializer(tasks, many=True)
-            return Response(serializer.data)
-        except Exception:
-            return Response({'detail': 'Internal server error'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        if len(rows) <= limit:
+            return rows, None
+        return rows[:limit], {'page': number + 1} if params.get('ordering') else {'after': rows[limit - 1].pk}
@@ -1,3 +1,25 @@
 from django.contrib import admin
+from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 
-# Register your models here.
+from ustudy_test_task.admin import ScalableAdminMixin
+from .models import UserModel
+
+
+@admin.register(UserModel)
+class UserAdmin(ScalableAdminMixin, BaseUserAdmin):
+    list_display = ('id', 'username', 'email', 'is_staff', 'is_active', 'date_joined')
+    list_filter = ('is_staff', 'is_superuser', 'is_active')
+    # A prefix match can use the username's varchar_pattern_ops index, `icontains` on four columns can't. Also what the
+    # user autocomplete of the task admin searches.
+    search_fields = ('username__startswith',)
+    actions = ('activate', 'deactivate')
+
+    @admin.action(description='Deactivate selected users')
+    def deactivate(self, request, queryset):
+        updated = queryset.update(is_active=False)
+        self.message_user(request, f'{updated} user(s) deactivated.')
+
+    @admin.action(description='Activate selected users')
+    def activate(self, request, queryset):
+        updated = queryset.update(is_active=True)
+        self.message_user(request, f'{updated} user(s) activated.')
@@ -0,0 +1,105 @@
+"""
+Username availability checks backed by a Bloom filter in Redis.
+
+The filter is a Redis bitmap holding every taken username. A username it doesn't contain is definitely free and is
+answered without the database; one it contains may be a false positive, about USERNAME_FILTER_ERROR_RATE of free
+usernames are, and is looked up on the unique index. Usernames are only ever added, so a deleted user's name stays a
+false positive until `rebuild_username_filter` runs. The unique constraint stays the final arbiter of registrations.
+"""
+import hashlib
+import logging
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from .models import UserModel
+
+logger = logging.getLogger(__name__)
+
+# Sets the bits only if the filter exists, a filter created by adding to a missing key would lack every other username
+ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for _, offset in ipairs(ARGV) do
+        redis.call('SETBIT', KEYS[1], offset, 1)
+    end
+end
+"""
+
+
+def dimensions():
+    """Return `(bits, hashes)` of a filter for USERNAME_FILTER_CAPACITY usernames at USERNAME_FILTER_ERROR_RATE."""
+    capacity, error_rate = settings.USERNAME_FILTER_CAPACITY, settings.USERNAME_FILTER_ERROR_RATE
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    return bits, max(round(bits / capacity * math.log(2)), 1)
+
+
+def filter_key():
+    # Named after its dimensions, so that after they change checks go to the database until the filter is rebuilt
+    return 'username-filter:{}:{}'.format(*dimensions())
+
+
+def offsets(username):
+    """The bits of a username, derived from one digest by double hashing."""
+    bits, hashes = dimensions()
+    digest = hashlib.blake2b(username.encode(), digest_size=16).digest()
+    first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big') | 1
+    return [(first + i * second) % bits for i in range(hashes)]
+
+
+def might_be_taken(username):
+    """False only if the username is definitely free. Without the filter, or Redis, every username might be taken."""
+    key = filter_key()
+    try:
+        pipe = get_redis_connection('default').pipeline(transaction=False)
+        pipe.exists(key)
+        for offset in offsets(username):
+            pipe.getbit(key, offset)
+        exists, *bits = pipe.execute()
+    except RedisError as e:
+        logger.error('Username filter is unavailable, checking the database', exc_info=e)
+        return True
+    return not exists or all(bits)
+
+
+def is_taken(username):
+    return might_be_taken(username) and UserModel.objects.filter(username=username).exists()
+
+
+def add_username(username):
+    """Add a taken username to the filter, best effort: a username missing from it only fails at the unique index."""
+    try:
+        get_redis_connection('default').eval(ADD_SCRIPT, 1, filter_key(), *offsets(username))
+    except RedisError as e:
+        logger.error(f'Error while adding to the username filter: username={username}', exc_info=e)
+
+
+def rebuild(chunk_size=10000):
+    """
+    Build the filter from the users table and swap it in, returning the number of usernames added.
+
+    The bitmap is built in memory and written with a single SET, then renamed over the old filter, so checks never see
+    a partial one. Users registered while it was built are added to it afterwards, by when they joined rather than
+    by id, as a registration can take an id the scan has passed and commit later.
+    """
+    started = timezone.now() - timedelta(seconds=settings.USERNAME_FILTER_REBUILD_OVERLAP_SECONDS)
+    bits, _ = dimensions()
+    bitmap = bytearray(math.ceil(bits / 8))
+    count = 0
+    for username in UserModel.objects.order_by('pk').values_list('username', flat=True).iterator(chunk_size=chunk_size):
+        for offset in offsets(username):
+            # Redis numbers the bits of a byte from the most significant one
+            bitmap[offset // 8] |= 0x80 >> offset % 8
+        count += 1
+
+    key = filter_key()
+    redis = get_redis_connection('default')
+    redis.set(f'{key}:rebuild', bytes(bitmap))
+    redis.rename(f'{key}:rebuild', key)
+    # Overlaps the scan, adding a username twice sets the same bits
+    for username in UserModel.objects.filter(date_joined__gte=started).values_list('username', flat=True):
+        add_username(username)
+    return count
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from users import availability
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the Bloom filter of taken usernames from the users table, dropping deleted and renamed users'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=10000,
+            help='Usernames read per query (default: 10000)'
+        )
+
+    def handle(self, *args, **options):
+        count = availability.rebuild(chunk_size=options['chunk_size'])
+        bits, hashes = availability.dimensions()
+        self.stdout.write(self.style.SUCCESS(f'Added {count} usernames to the filter ({bits} bits, {hashes} hashes)'))
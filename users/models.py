@@ -9,6 +9,15 @@ class UserModel(AbstractUser):
     def __str__(self):
         return self.username
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'username' in update_fields:
+            # Imported here as the filter is rebuilt from this model. Added before the commit, a rollback only leaves
+            # a false positive behind.
+            from .availability import add_username
+            add_username(self.username)
+
     class Meta:
         ordering = ['username']
         indexes = [
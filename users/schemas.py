@@ -0,0 +1,129 @@
+"""
+OpenAPI descriptions of the user views, imported only when the API docs are generated, see ustudy_test_task/docs.py.
+
+Each is the keyword arguments of drf_yasg's `swagger_auto_schema` for one view method.
+"""
+from drf_yasg import openapi
+
+from .serializers import LoginSerializer, UserSerializer
+
+
+register_post = dict(
+    tags=['Users'],
+    operation_id='Register a new user',
+    operation_summary='Register a new user',
+    operation_description='Register a new user with the provided details',
+    request_body=UserSerializer,
+    responses={
+        201: UserSerializer(),
+    }
+)
+
+
+register_get = dict(
+    tags=['Users'],
+    operation_id='Get all users',
+    operation_summary='Get all users',
+    operation_description='Get all users',
+    responses={
+        200: UserSerializer(many=True),
+    }
+)
+
+
+username_availability_get = dict(
+    tags=['Users'],
+    operation_id='Check username availability',
+    operation_summary='Check username availability',
+    operation_description='Check whether a username is free to register. Most free usernames are answered from a Bloom '
+                          'filter without a database query. Registration may still fail if it is taken in between.',
+    manual_parameters=[
+        openapi.Parameter('username', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+    ],
+    responses={
+        200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'username': openapi.Schema(type=openapi.TYPE_STRING),
+                'available': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+            }
+        ),
+        400: 'Missing or too long username',
+    }
+)
+
+
+login_post = dict(
+    tags=['Users'],
+    operation_id='Login',
+    operation_summary='Login',
+    operation_description='Login with the provided username and password. With sliding tokens, a single `token` '
+                          'is returned instead of `refresh` and `access`.',
+    request_body=LoginSerializer,
+    responses={200: openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'username': openapi.Schema(type=openapi.TYPE_STRING),
+            'refresh': openapi.Schema(type=openapi.TYPE_STRING),
+            'access': openapi.Schema(type=openapi.TYPE_STRING),
+            'token': openapi.Schema(type=openapi.TYPE_STRING, description='Sliding token'),
+        }
+    )}
+)
+
+
+token_refresh_post = dict(
+    tags=['Users'],
+    operation_id='Refresh token',
+    operation_summary='Refresh token',
+    operation_description='Exchange a refresh token for a new access token, and a new refresh token while the old one '
+                          'is blacklisted if rotation is on. With sliding tokens, send `token` to extend it instead.',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'refresh': openapi.Schema(type=openapi.TYPE_STRING),
+            'token': openapi.Schema(type=openapi.TYPE_STRING, description='Sliding token'),
+        }
+    ),
+    responses={
+        200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'access': openapi.Schema(type=openapi.TYPE_STRING),
+                'refresh': openapi.Schema(type=openapi.TYPE_STRING, description='With rotation'),
+                'token': openapi.Schema(type=openapi.TYPE_STRING, description='Sliding token'),
+            }
+        ),
+        401: 'Token is invalid, expired or blacklisted',
+        503: 'Token blacklist is unavailable',
+    }
+)
+
+
+token_blacklist_post = dict(
+    tags=['Users'],
+    operation_id='Logout',
+    operation_summary='Logout',
+    operation_description='Blacklist a refresh token, or a sliding token, so that it can no longer be used',
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        properties={
+            'refresh': openapi.Schema(type=openapi.TYPE_STRING),
+            'token': openapi.Schema(type=openapi.TYPE_STRING, description='Sliding token'),
+        }
+    ),
+    responses={
+        200: 'Token blacklisted',
+        401: 'Token is invalid or expired',
+        503: 'Token blacklist is unavailable',
+    }
+)
+
+
+me_get = dict(
+    tags=['Users'],
+    operation_id='Get my user details',
+    operation_summary='Get my user details',
+    operation_description='Get the details of the currently logged in user',
+    responses={200: UserSerializer()}
+)
@@ -1,8 +1,13 @@
 from django.contrib.auth import authenticate
+from django.db import IntegrityError, transaction
 from django.contrib.auth.handlers.modwsgi import check_password
 from rest_framework import serializers
 from .models import UserModel
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from .availability import is_taken
+from .tokens import RefreshToken, SlidingToken
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,7 +21,8 @@ class UserSerializer(serializers.ModelSerializer):
         }
 
     def validate_username(self, value):
-        if UserModel.objects.filter(username=value).exists():
+        # Usernames the filter rules out are never looked up
+        if is_taken(value):
             raise serializers.ValidationError('This username is already taken.')
         return value
 
@@ -25,10 +31,19 @@ class UserSerializer(serializers.ModelSerializer):
         return data
 
     def create(self, validated_data):
-        user = UserModel.objects.create_user(**validated_data)
+        try:
+            with transaction.atomic():
+                user = UserModel.objects.create_user(**validated_data)
+        except IntegrityError:
+            # Taken after it was checked, or missing from the filter, the unique index has the last word
+            raise serializers.ValidationError({'username': ['This username is already taken.']})
         return user
 
 
+class UsernameAvailabilitySerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150)
+
+
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
     password = serializers.CharField(max_length=500, write_only=True)
@@ -43,9 +58,64 @@ class LoginSerializer(serializers.Serializer):
         user = authenticate(username=username, password=password)
         if user is None:
             raise serializers.ValidationError('A user with this username and password was not found.')
+        # The only place passwords are hashed, sessions are kept alive with the tokens below
+        if settings.JWT_SLIDING_TOKENS:
+            return {'username': user.username, 'token': str(SlidingToken.for_user(user))}
         refresh = RefreshToken.for_user(user)
         return {
             'username': user.username,
             'refresh': str(refresh),
             'access': str(refresh.access_token),
         }
+
+
+class TokenRefreshSerializer(serializers.Serializer):
+    """
+    Exchange a refresh token for an access token, and for a new refresh token if ROTATE_REFRESH_TOKENS is set.
+
+    Checked by signature, expiry and the Redis blacklist alone, without the database.
+    """
+    refresh = serializers.CharField()
+
+    def validate(self, data):
+        refresh = RefreshToken(data['refresh'])
+        tokens = {'access': str(refresh.access_token)}
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            # A rotated token can't be used again, not even by a concurrent request
+            if jwt_settings.BLACKLIST_AFTER_ROTATION and not refresh.blacklist():
+                raise TokenError('Token is blacklisted')
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            tokens['refresh'] = str(refresh)
+        return tokens
+
+
+class SlidingTokenRefreshSerializer(serializers.Serializer):
+    """Extend a sliding token's expiry, up to SLIDING_TOKEN_REFRESH_LIFETIME after the login."""
+    token = serializers.CharField()
+
+    def validate(self, data):
+        token = SlidingToken(data['token'])
+        token.check_exp(jwt_settings.SLIDING_TOKEN_REFRESH_EXP_CLAIM)
+        token.set_exp()
+        token.set_iat()
+        return {'token': str(token)}
+
+
+class TokenBlacklistSerializer(serializers.Serializer):
+    """Log out by blacklisting the refresh token."""
+    refresh = serializers.CharField()
+
+    def validate(self, data):
+        RefreshToken(data['refresh']).blacklist()
+        return {}
+
+
+class SlidingTokenBlacklistSerializer(serializers.Serializer):
+    """Log out by blacklisting the sliding token, which takes effect on the next request."""
+    token = serializers.CharField()
+
+    def validate(self, data):
+        SlidingToken(data['token']).blacklist()
+        return {}
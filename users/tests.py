@@ -1,8 +1,16 @@
-from django.test import TestCase
+from django.db import connection
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from . import availability
 from .models import UserModel
+from .tokens import RefreshToken, SlidingToken
 
 
 class UserTests(TestCase):
@@ -60,3 +68,173 @@ class UserTests(TestCase):
         response = self.client.get(self.me_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['username'], self.user_data['username'])
+
+
+# The filter is named after its dimensions, so the tests build and drop a filter of their own, never the app's
+@override_settings(USERNAME_FILTER_CAPACITY=1000)
+class UsernameAvailabilityTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        UserModel.objects.create_user(username='taken', password='testpassword123')
+        availability.rebuild()
+        self.addCleanup(get_redis_connection('default').delete, availability.filter_key())
+
+    def check(self, username):
+        return self.client.get(reverse('username-availability'), {'username': username})
+
+    def test_free_username_needs_no_query(self):
+        with self.assertNumQueries(0):
+            response = self.check('free')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'username': 'free', 'available': True})
+
+    def test_taken_username_is_confirmed_by_database(self):
+        with self.assertNumQueries(1):
+            response = self.check('taken')
+        self.assertFalse(response.data['available'])
+
+    def test_missing_filter_falls_back_to_database(self):
+        get_redis_connection('default').delete(availability.filter_key())
+        with self.assertNumQueries(1):
+            self.assertTrue(self.check('free').data['available'])
+        self.assertFalse(self.check('taken').data['available'])
+        # Users saved meanwhile don't create a filter that lacks everyone else
+        UserModel.objects.create_user(username='another', password='testpassword123')
+        self.assertTrue(availability.might_be_taken('free'))
+
+    def test_registered_username_is_added(self):
+        self.client.post(reverse('register'), {'username': 'newuser', 'password': 'newpassword123'}, format='json')
+        self.assertTrue(availability.might_be_taken('newuser'))
+        self.assertFalse(self.check('newuser').data['available'])
+
+    def test_rebuild_drops_deleted_users(self):
+        UserModel.objects.filter(username='taken').delete()
+        self.assertTrue(availability.might_be_taken('taken'))
+        availability.rebuild()
+        self.assertFalse(availability.might_be_taken('taken'))
+
+    def test_rebuild_adds_users_committed_during_scan(self):
+        UserModel.objects.create_user(username='late', password='testpassword123')
+        UserModel.objects.create_user(username='later', password='testpassword123')
+        # The scan misses 'late', as if its registration committed after the scan had passed its id
+        scanned = []
+        real_offsets = availability.offsets
+
+        def offsets(username):
+            if username == 'late' and username not in scanned:
+                scanned.append(username)
+                return []
+            return real_offsets(username)
+
+        with mock.patch.object(availability, 'offsets', side_effect=offsets):
+            availability.rebuild()
+        self.assertTrue(availability.might_be_taken('late'))
+
+    def test_unique_constraint_is_final(self):
+        with mock.patch('users.serializers.is_taken', return_value=False):
+            response = self.client.post(reverse('register'), {'username': 'taken', 'password': 'newpassword123'},
+                                        format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+
+    def test_username_is_required(self):
+        self.assertEqual(self.check('').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TokenTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user_data = {'username': 'testuser', 'password': 'testpassword123'}
+        UserModel.objects.create_user(**self.user_data)
+
+    def login(self):
+        return self.client.post(reverse('login'), self.user_data, format='json').data
+
+    def test_refresh_rotates_without_database_queries(self):
+        tokens = self.login()
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response.data['refresh'], tokens['refresh'])
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + response.data['access'])
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_200_OK)
+
+    def test_rotated_refresh_token_is_rejected(self):
+        tokens = self.login()
+        self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json')
+        response = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_ignores_expired_access_token(self):
+        tokens = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer invalid')
+        response = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_logout_blacklists_refresh_token(self):
+        tokens = self.login()
+        response = self.client.post(reverse('token-blacklist'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_blacklist_is_claimed_once(self):
+        token = RefreshToken(self.login()['refresh'])
+        self.assertTrue(token.blacklist())
+        self.assertFalse(token.blacklist())
+
+    def test_unavailable_blacklist_is_a_503(self):
+        tokens = self.login()
+        with mock.patch('users.tokens.get_redis_connection', side_effect=RedisError):
+            response = self.client.post(reverse('token-refresh'), {'refresh': tokens['refresh']}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            response = self.client.post(reverse('token-blacklist'), {'refresh': tokens['refresh']}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_invalid_token_is_rejected(self):
+        response = self.client.post(reverse('token-refresh'), {'refresh': 'invalid'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post(reverse('token-refresh'), {}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(JWT_SLIDING_TOKENS=True)
+    # What AUTH_TOKEN_CLASSES is with JWT_SLIDING_TOKENS, simplejwt's modules keep the settings they imported
+    @mock.patch('rest_framework_simplejwt.authentication.api_settings.AUTH_TOKEN_CLASSES', (SlidingToken,))
+    def test_sliding_token(self):
+        token = self.login()['token']
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_200_OK)
+
+        with self.assertNumQueries(0):
+            response = self.client.post(reverse('token-refresh'), {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        token = response.data['token']
+
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer ' + token)
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_200_OK)
+        response = self.client.post(reverse('token-blacklist'), {'token': token}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(reverse('me')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserAdminTests(TestCase):
+    def setUp(self):
+        self.staff = UserModel.objects.create_superuser(username='admin', password='adminpassword123')
+        self.client.force_login(self.staff)
+        for username in ('alice', 'alfred', 'bob'):
+            UserModel.objects.create_user(username=username, password='testpassword123')
+
+    def test_search_matches_username_prefixes(self):
+        response = self.client.get(reverse('admin:users_usermodel_changelist'), {'q': 'al'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(sorted(user.username for user in response.context['cl'].result_list), ['alfred', 'alice'])
+
+    def test_bulk_actions_are_single_updates(self):
+        users = UserModel.objects.exclude(pk=self.staff.pk)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(reverse('admin:users_usermodel_changelist'), {
+                'action': 'deactivate', '_selected_action': [user.pk for user in users],
+            })
+        self.assertEqual(sum(query['sql'].startswith('UPDATE') for query in queries), 1)
+        self.assertFalse(users.filter(is_active=True).exists())
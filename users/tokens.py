@@ -0,0 +1,57 @@
+"""
+JWTs with their blacklist in Redis.
+
+simplejwt's blacklist app stores every issued token in the database and looks blacklisted ones up there. Here a
+blacklisted token is a Redis key named after its `jti` that expires when the token would, so a lookup is one `EXISTS`
+and the database is never involved.
+"""
+import logging
+import time
+
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework_simplejwt import tokens
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+
+def blacklist_key(jti):
+    return f'token-blacklist:{jti}'
+
+
+class RedisBlacklistMixin:
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        self.check_blacklist()
+
+    def check_blacklist(self):
+        try:
+            blacklisted = get_redis_connection('default').exists(blacklist_key(self[api_settings.JTI_CLAIM]))
+        except RedisError as e:
+            # Revocation is given up rather than every session while Redis is down, tokens still expire
+            logger.error('Token blacklist is unavailable, accepting token', exc_info=e)
+            return
+        if blacklisted:
+            raise TokenError('Token is blacklisted')
+
+    def blacklist(self):
+        """
+        Blacklist the token until it expires, returning False if it already was.
+
+        Set with `NX`, so that of two concurrent rotations of a refresh token only one succeeds.
+        """
+        # A sliding token keeps its jti when refreshed, so it is blacklisted until it can't be refreshed anymore
+        expires = max(self.payload.get(claim, 0) for claim in ('exp', api_settings.SLIDING_TOKEN_REFRESH_EXP_CLAIM))
+        timeout = max(int(expires - time.time()), 1)
+        return bool(get_redis_connection('default').set(blacklist_key(self[api_settings.JTI_CLAIM]), 1,
+                                                         ex=timeout, nx=True))
+
+
+class RefreshToken(RedisBlacklistMixin, tokens.RefreshToken):
+    pass
+
+
+class SlidingToken(RedisBlacklistMixin, tokens.SlidingToken):
+    """Authenticates and is refreshed itself, checked against the blacklist on every request, see JWT_SLIDING_TOKENS."""
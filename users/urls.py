@@ -1,8 +1,11 @@
 from django.urls import path
-from .views import RegisterView, LoginView, MeView
+from .views import RegisterView, UsernameAvailabilityView, LoginView, TokenRefreshView, TokenBlacklistView, MeView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
+    path('available/', UsernameAvailabilityView.as_view(), name='username-availability'),
     path('login/', LoginView.as_view(), name='login'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/blacklist/', TokenBlacklistView.as_view(), name='token-blacklist'),
     path('me/', MeView.as_view(), name='me'),
 ]
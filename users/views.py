@@ -1,11 +1,19 @@
+import logging
+
+from django.conf import settings
+from redis.exceptions import RedisError
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .serializers import UserSerializer, LoginSerializer
+from rest_framework_simplejwt.exceptions import TokenError
+from .availability import is_taken
+from .serializers import (UserSerializer, LoginSerializer, TokenRefreshSerializer, SlidingTokenRefreshSerializer,
+                          TokenBlacklistSerializer, SlidingTokenBlacklistSerializer, UsernameAvailabilitySerializer)
 from .models import UserModel
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from drf_yasg.utils import swagger_auto_schema
-from drf_yasg import openapi
+from ustudy_test_task.docs import lazy_swagger_auto_schema
+
+logger = logging.getLogger(__name__)
 
 
 class RegisterView(APIView):
@@ -14,16 +22,7 @@ class RegisterView(APIView):
             return [AllowAny()]
         return [IsAuthenticated()]
 
-    @swagger_auto_schema(
-        tags=['Users'],
-        operation_id='Register a new user',
-        operation_summary='Register a new user',
-        operation_description='Register a new user with the provided details',
-        request_body=UserSerializer,
-        responses={
-            201: UserSerializer(),
-        }
-    )
+    @lazy_swagger_auto_schema('users.schemas.register_post')
     def post(self, request):
         serializer = UserSerializer(data=request.data)
         if serializer.is_valid():
@@ -31,39 +30,31 @@ class RegisterView(APIView):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    @swagger_auto_schema(
-        tags=['Users'],
-        operation_id='Get all users',
-        operation_summary='Get all users',
-        operation_description='Get all users',
-        responses={
-            200: UserSerializer(many=True),
-        }
-    )
+    @lazy_swagger_auto_schema('users.schemas.register_get')
     def get(self, request):
         users = UserModel.objects.all()
         serializer = UserSerializer(users, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+class UsernameAvailabilityView(APIView):
+    # Checked on every keystroke of the sign up form, most answers come from the filter without a query
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @lazy_swagger_auto_schema('users.schemas.username_availability_get')
+    def get(self, request):
+        serializer = UsernameAvailabilitySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        username = serializer.validated_data['username']
+        return Response({'username': username, 'available': not is_taken(username)}, status=status.HTTP_200_OK)
+
+
 class LoginView(APIView):
     permission_classes = [AllowAny]
 
-    @swagger_auto_schema(
-        tags=['Users'],
-        operation_id='Login',
-        operation_summary='Login',
-        operation_description='Login with the provided username and password',
-        request_body=LoginSerializer,
-        responses={200: openapi.Schema(
-            type=openapi.TYPE_OBJECT,
-            properties={
-                'username': openapi.Schema(type=openapi.TYPE_STRING),
-                'refresh': openapi.Schema(type=openapi.TYPE_STRING),
-                'access': openapi.Schema(type=openapi.TYPE_STRING),
-            }
-        )}
-    )
+    @lazy_swagger_auto_schema('users.schemas.login_post')
     def post(self, request):
         serializer = LoginSerializer(data=request.data)
         if serializer.is_valid():
@@ -71,16 +62,47 @@ class LoginView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+def token_response(serializer):
+    try:
+        if serializer.is_valid():
+            return Response(serializer.validated_data, status=status.HTTP_200_OK)
+    except TokenError as e:
+        return Response({'detail': str(e)}, status=status.HTTP_401_UNAUTHORIZED)
+    except RedisError as e:
+        # Rotating or logging out without blacklisting the old token would leave it usable
+        logger.error('Token blacklist is unavailable', exc_info=e)
+        return Response({'detail': 'Token blacklist is unavailable, retry later'},
+                        status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TokenRefreshView(APIView):
+    # The token in the body is the credential, an expired access token in the header must not get in the way
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @lazy_swagger_auto_schema('users.schemas.token_refresh_post')
+    def post(self, request):
+        if settings.JWT_SLIDING_TOKENS:
+            return token_response(SlidingTokenRefreshSerializer(data=request.data))
+        return token_response(TokenRefreshSerializer(data=request.data))
+
+
+class TokenBlacklistView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    @lazy_swagger_auto_schema('users.schemas.token_blacklist_post')
+    def post(self, request):
+        if settings.JWT_SLIDING_TOKENS:
+            return token_response(SlidingTokenBlacklistSerializer(data=request.data))
+        return token_response(TokenBlacklistSerializer(data=request.data))
+
+
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @swagger_auto_schema(
-        tags=['Users'],
-        operation_id='Get my user details',
-        operation_summary='Get my user details',
-        operation_description='Get the details of the currently logged in user',
-        responses={200: UserSerializer()}
-    )
+    @lazy_swagger_auto_schema('users.schemas.me_get')
     def get(self, request):
         serializer = UserSerializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
@@ -1,5 +1,13 @@
 from __future__ import absolute_import, unicode_literals
-# This will make sure the app is always imported when Django starts so that shared_task will use this app.
-from .celery import app as celery_app
 
-__all__ = ('celery_app',)
\ No newline at end of file
+
+def __getattr__(name):
+    # Celery takes a tenth of a second to import and web workers never send tasks, so the app is only imported by
+    # `celery -A ustudy_test_task` and by modules declaring tasks, see tasks/tasks.py
+    if name == 'celery_app':
+        from .celery import app
+        return app
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+__all__ = ('celery_app',)
@@ -0,0 +1,94 @@
+"""
+Django admin changelists for tables too big to count exactly or to page through with OFFSET.
+"""
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+from .querysets import estimated_count
+
+CURSOR_VAR = 'after'
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts with the planner's estimate instead of ``COUNT(*)`` above ADMIN_EXACT_COUNT_THRESHOLD rows."""
+
+    @cached_property
+    def estimate(self):
+        return estimated_count(self.object_list, settings.ADMIN_EXACT_COUNT_THRESHOLD)
+
+    @property
+    def count(self):
+        return self.estimate[0]
+
+    @property
+    def count_is_exact(self):
+        return self.estimate[1]
+
+
+class CursorChangeList(ChangeList):
+    """
+    Pages with ``?after=<pk>``, a keyset condition on the primary key, instead of ``?p=`` and an OFFSET that reads and
+    throws away every row before the page. Lists sorted by another column fall back to numbered pages.
+    """
+
+    def get_filters_params(self, params=None):
+        params = super().get_filters_params(params)
+        params.pop(CURSOR_VAR, None)
+        return params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Changing the filters or the sort starts over from the first page
+        new_params = new_params or {}
+        if CURSOR_VAR not in new_params:
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_results(self, request):
+        self.pages_by_cursor = ORDER_VAR not in self.params and not self.show_all
+        if not self.pages_by_cursor:
+            return super().get_results(request)
+
+        queryset = self.queryset
+        self.cursor = self.params.get(CURSOR_VAR)
+        if self.cursor:
+            try:
+                queryset = queryset.filter(pk__lt=self.cursor)
+            except (ValueError, ValidationError) as e:
+                raise IncorrectLookupParameters(e)
+
+        # One row more than a page tells whether there is a next one without counting
+        rows = list(queryset[:self.list_per_page + 1])
+        self.result_list = rows[:self.list_per_page]
+        self.next_cursor = self.result_list[-1].pk if len(rows) > self.list_per_page else None
+        self.next_page_url = self.get_query_string({CURSOR_VAR: self.next_cursor})
+        self.first_page_url = self.get_query_string()
+
+        self.paginator = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        self.result_count = self.paginator.count
+        self.result_count_is_exact = self.paginator.count_is_exact
+        self.full_result_count = None
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.can_show_all = False
+        self.multi_page = bool(self.cursor or self.next_cursor)
+
+
+class ScalableAdminMixin:
+    """
+    ModelAdmin options for big tables: estimated counts, no facet counts and keyset pages ordered by the primary key.
+
+    Filters should be backed by indexes that can be read in primary key order, like ``(status, id)``.
+    """
+    ordering = ('-pk',)
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    show_facets = admin.ShowFacets.NEVER
+    change_list_template = 'admin/cursor_change_list.html'
+
+    def get_changelist(self, request, **kwargs):
+        return CursorChangeList
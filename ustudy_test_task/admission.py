@@ -0,0 +1,173 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from http import HTTPStatus
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+logger = logging.getLogger(__name__)
+
+# Admit a request only if every key (route, global) has room. KEYS are sorted sets of in-flight slots scored
+# by start time; slots older than the timeout belong to crashed workers and are dropped.
+# ARGV: now, stale_before, slot, ttl, then one limit per key.
+ACQUIRE_SLOT_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', ARGV[2])
+    if redis.call('ZCARD', key) >= tonumber(ARGV[i + 4]) then
+        return 0
+    end
+end
+for i, key in ipairs(KEYS) do
+    redis.call('ZADD', key, ARGV[1], ARGV[3])
+    redis.call('EXPIRE', key, ARGV[4])
+end
+return 1
+"""
+
+# Token bucket refilled continuously at `rate` per second up to `burst`.
+# ARGV: now, rate, burst. Returns 0 when a token was taken, otherwise the seconds until the next one.
+TAKE_TOKEN_SCRIPT = """
+local now, rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or burst
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated_at) * rate)
+local wait = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+def route_policy(url_name):
+    """Return the priority class and concurrency limit (or None) of a route."""
+    policy = settings.ADMISSION_ROUTES.get(url_name, {})
+    return policy.get('priority', settings.ADMISSION_DEFAULT_PRIORITY), policy.get('concurrency')
+
+
+def acquire_slot(url_name, priority, concurrency):
+    """
+    Take an in-flight slot for the route, or return None when it is at capacity.
+
+    Lower priority classes may only fill part of the global capacity, which keeps the rest free for cheap,
+    high priority requests.
+    """
+    share = settings.ADMISSION_PRIORITY_CLASSES[priority]['capacity']
+    keys = ['admission:global']
+    limits = [max(1, int(settings.ADMISSION_MAX_CONCURRENCY * share))]
+    if concurrency is not None:
+        keys.append(f'admission:route:{url_name}')
+        limits.append(concurrency)
+
+    slot = uuid.uuid4().hex
+    now = time.time()
+    timeout = settings.ADMISSION_SLOT_TIMEOUT
+    redis = get_redis_connection('default')
+    admitted = redis.eval(ACQUIRE_SLOT_SCRIPT, len(keys), *keys, now, now - timeout, slot, timeout, *limits)
+    return slot if admitted else None
+
+
+def release_slot(url_name, slot):
+    pipe = get_redis_connection('default').pipeline()
+    pipe.zrem('admission:global', slot)
+    pipe.zrem(f'admission:route:{url_name}', slot)
+    pipe.execute()
+
+
+def take_token(identity):
+    """Take a token from the identity's bucket, returning 0 or the seconds to wait for the next one."""
+    redis = get_redis_connection('default')
+    return float(redis.eval(TAKE_TOKEN_SCRIPT, 1, f'admission:bucket:{identity}', time.time(),
+                            settings.ADMISSION_USER_RATE, settings.ADMISSION_USER_BURST))
+
+
+class Rejected(Exception):
+    """A request turned away by admission control, with the status, detail and Retry-After of its response."""
+
+    def __init__(self, status_code, detail, retry_after):
+        super().__init__(detail)
+        self.status_code, self.detail, self.retry_after = status_code, detail, retry_after
+
+
+@contextmanager
+def admit(identity, url_name):
+    """
+    Charge a request to its identity's token bucket and hold an in-flight slot of its route while the body runs.
+
+    Raises Rejected when the identity ran out of tokens (429), or the route or the share of global capacity of its
+    priority class is full (503). If Redis is unavailable the request is admitted.
+    """
+    priority, concurrency = route_policy(url_name)
+    try:
+        wait = take_token(identity)
+        if wait:
+            raise Rejected(HTTPStatus.TOO_MANY_REQUESTS, 'Request was throttled.', wait)
+        slot = acquire_slot(url_name, priority, concurrency)
+    except RedisError as e:
+        logger.error('Admission control is unavailable, admitting request', exc_info=e)
+        slot = None
+    else:
+        if slot is None:
+            logger.warning(f'Shedding {url_name}: no capacity left for priority {priority}')
+            raise Rejected(HTTPStatus.SERVICE_UNAVAILABLE, 'Server is overloaded, retry later.',
+                           settings.ADMISSION_RETRY_AFTER)
+
+    try:
+        yield
+    finally:
+        if slot is not None:
+            try:
+                release_slot(url_name, slot)
+            except RedisError as e:
+                # The slot expires after ADMISSION_SLOT_TIMEOUT
+                logger.error('Error while releasing admission slot', exc_info=e)
+
+
+def queueing_delay(request):
+    """
+    Seconds the request waited for a worker, from the `X-Request-Start` header set by the proxy.
+
+    Accepts `t=<seconds>` (nginx `$msec`) and plain seconds, milliseconds or microseconds since the epoch.
+    """
+    header = request.headers.get('X-Request-Start', '').removeprefix('t=')
+    try:
+        started = float(header)
+    except ValueError:
+        return 0
+    # Scale milliseconds and microseconds down to seconds
+    while started > 1e11:
+        started /= 1000
+    return max(0.0, time.time() - started)
+
+
+def request_identity(request):
+    """The JWT user id, read without a database query, or the client address for anonymous requests."""
+    authentication = JWTAuthentication()
+    header = authentication.get_header(request)
+    try:
+        raw_token = authentication.get_raw_token(header) if header is not None else None
+        if raw_token is not None:
+            return f'user:{authentication.get_validated_token(raw_token)[jwt_settings.USER_ID_CLAIM]}'
+    except (AuthenticationFailed, KeyError):
+        pass
+    return f'ip:{client_address(request)}'
+
+
+def client_address(request):
+    """The address the outermost trusted proxy saw the request from, REMOTE_ADDR without trusted proxies."""
+    forwarded_for = [entry.strip() for entry in request.headers.get('X-Forwarded-For', '').split(',') if entry.strip()]
+    if settings.TRUSTED_PROXY_COUNT and forwarded_for:
+        # A client sending fewer hops than there are proxies is as far out as can be told
+        return forwarded_for[-min(settings.TRUSTED_PROXY_COUNT, len(forwarded_for))]
+    return request.META.get('REMOTE_ADDR')
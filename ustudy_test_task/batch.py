@@ -0,0 +1,145 @@
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import connections, transaction
+from django.urls import Resolver404, resolve
+from rest_framework import serializers, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import admission
+from .docs import lazy_swagger_auto_schema
+from .middleware import ReplicaRoutingMiddleware
+from .routers import use_replicas
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class SubRequestSerializer(serializers.Serializer):
+    method = serializers.ChoiceField(choices=['GET', 'POST', 'PUT', 'PATCH', 'DELETE'])
+    path = serializers.RegexField(r'^/', max_length=2048)
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = serializers.ListField(child=SubRequestSerializer(), min_length=1,
+                                     max_length=settings.BATCH_MAX_REQUESTS)
+    atomic = serializers.BooleanField(default=False)
+
+
+class BatchView(APIView):
+    """
+    Sub-requests skip the middleware, so the parts of it that apply per request are applied to each of them here:
+    they are charged to the user's token bucket and take a slot of their own route, see AdmissionControlMiddleware,
+    and reads go to replicas unless the client is pinned to the primary or the batch wrote before them, see
+    ReplicaRoutingMiddleware.
+    """
+
+    @lazy_swagger_auto_schema('ustudy_test_task.schemas.batch_post')
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        sub_requests = serializer.validated_data['requests']
+        identity = admission.request_identity(request) if settings.ADMISSION_CONTROL_ENABLED else None
+        pinned = ReplicaRoutingMiddleware.is_pinned(request)
+        committed = True
+
+        if serializer.validated_data['atomic']:
+            with transaction.atomic():
+                # Reads see the transaction's writes only on the primary
+                results = [self.dispatch_sub_request(request, sub_request, identity, replicas=False)
+                           for sub_request in sub_requests]
+                if any(result['status'] >= 400 for result in results):
+                    transaction.set_rollback(True)
+                    committed = False
+        elif all(sub_request['method'] in SAFE_METHODS for sub_request in sub_requests) and len(sub_requests) > 1:
+            # Worker threads start with an empty context, each sub-request runs in a copy of this one
+            contexts = [contextvars.copy_context() for _ in sub_requests]
+            with ThreadPoolExecutor(max_workers=settings.BATCH_MAX_WORKERS) as executor:
+                results = list(executor.map(
+                    lambda context, sub_request: context.run(self.dispatch_concurrently, request, sub_request,
+                                                             identity, not pinned),
+                    contexts, sub_requests,
+                ))
+        else:
+            results = []
+            for sub_request in sub_requests:
+                safe = sub_request['method'] in SAFE_METHODS
+                results.append(self.dispatch_sub_request(request, sub_request, identity, replicas=safe and not pinned))
+                # Later reads see the batch's own writes
+                pinned = pinned or (not safe and results[-1]['status'] < 400)
+
+        logger.info(f'Batch of {len(sub_requests)} requests by user={request.user.username}')
+        response = Response(results)
+        response.pins_primary = committed and any(
+            sub_request['method'] not in SAFE_METHODS and result['status'] < 400
+            for sub_request, result in zip(sub_requests, results)
+        )
+        return response
+
+    def dispatch_concurrently(self, request, sub_request, identity, replicas):
+        try:
+            return self.dispatch_sub_request(request, sub_request, identity, replicas)
+        finally:
+            # Worker threads open their own connections
+            connections.close_all()
+
+    @staticmethod
+    def dispatch_sub_request(request, sub_request, identity, replicas):
+        """
+        Run one sub-request through the URL resolver as the already authenticated user.
+
+        `identity` is charged for it if admission control is enabled, `replicas` lets its reads go to a replica.
+        """
+        url = urlsplit(sub_request['path'])
+        try:
+            match = resolve(url.path)
+        except Resolver404:
+            return {'status': status.HTTP_404_NOT_FOUND, 'data': {'detail': 'Not found.'}}
+        if not issubclass(getattr(match.func, 'cls', object), APIView) or \
+                match.url_name in settings.BATCH_EXCLUDED_URL_NAMES:
+            return {'status': status.HTTP_400_BAD_REQUEST, 'data': {'detail': 'This path cannot be batched.'}}
+
+        body = json.dumps(sub_request['body']).encode() if 'body' in sub_request else b''
+        environ = {key: value for key, value in request.META.items() if key.startswith('HTTP_')}
+        environ.pop('HTTP_AUTHORIZATION', None)
+        environ.update({
+            'REQUEST_METHOD': sub_request['method'],
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'CONTENT_TYPE': 'application/json',
+            'CONTENT_LENGTH': str(len(body)),
+            'SERVER_NAME': request.META.get('SERVER_NAME', 'localhost'),
+            'SERVER_PORT': request.META.get('SERVER_PORT', '80'),
+            'REMOTE_ADDR': request.META.get('REMOTE_ADDR', ''),
+            'wsgi.input': BytesIO(body),
+            'wsgi.url_scheme': request.scheme,
+        })
+        http_request = WSGIRequest(environ)
+        # DRF authenticates requests carrying these as the given user, skipping JWT decoding
+        http_request._force_auth_user = request.user
+        http_request._force_auth_token = request.auth
+        http_request.resolver_match = match
+
+        token = use_replicas.set(replicas)
+        try:
+            with admission.admit(identity, match.url_name) if identity is not None else nullcontext():
+                response = match.func(http_request, *match.args, **match.kwargs)
+        except admission.Rejected as e:
+            return {'status': int(e.status_code), 'data': {'detail': e.detail}}
+        except Exception as e:
+            logger.error(f'Error in batch sub-request: {sub_request["method"]} {sub_request["path"]}', exc_info=e)
+            return {'status': status.HTTP_500_INTERNAL_SERVER_ERROR, 'data': {'detail': 'Internal server error'}}
+        finally:
+            use_replicas.reset(token)
+        return {'status': response.status_code, 'data': response.data}
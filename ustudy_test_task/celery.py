@@ -1,6 +1,8 @@
 from __future__ import absolute_import, unicode_literals
 import os
 from celery import Celery
+from celery.schedules import crontab
+from celery.signals import task_postrun
 
 # set the default Django settings module for the 'celery' program.
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ustudy_test_task.settings')
@@ -13,3 +15,29 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 
 # Load task modules from all registered Django app configs.
 app.autodiscover_tasks()
+
+app.conf.beat_schedule = {
+    'purge-task-tombstones': {
+        'task': 'tasks.tasks.purge_task_tombstones',
+        'schedule': crontab(hour=3, minute=0),
+    },
+    'drain-task-ingest': {
+        'task': 'tasks.tasks.drain_task_ingest',
+        'schedule': 2.0,
+        # A run that starts late would overlap the next one
+        'options': {'expires': 2},
+    },
+    'sweep-overdue-tasks': {
+        'task': 'tasks.tasks.sweep_overdue_tasks',
+        'schedule': 60.0,
+        'options': {'expires': 60},
+    },
+}
+
+
+@task_postrun.connect
+def sync_memory_profiling(**kwargs):
+    # Celery workers follow the memory profiling flag and take snapshots between tasks, like web workers between
+    # requests
+    from . import memory
+    memory.sync()
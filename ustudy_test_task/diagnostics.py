@@ -0,0 +1,33 @@
+import logging
+
+from rest_framework import serializers, status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import memory
+from .docs import lazy_swagger_auto_schema
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryProfilingSerializer(serializers.Serializer):
+    enabled = serializers.BooleanField()
+
+
+class MemoryProfilingView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @lazy_swagger_auto_schema('ustudy_test_task.schemas.memory_profiling_get')
+    def get(self, request):
+        return Response({'enabled': memory.is_enabled(), 'workers': memory.worker_reports()})
+
+    @lazy_swagger_auto_schema('ustudy_test_task.schemas.memory_profiling_post')
+    def post(self, request):
+        serializer = MemoryProfilingSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response({'detail': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+        memory.set_enabled(serializer.validated_data['enabled'])
+        logger.info(f'Memory profiling turned {"on" if serializer.validated_data["enabled"] else "off"} '
+                    f'by user={request.user.username}')
+        return Response({'enabled': memory.is_enabled(), 'workers': memory.worker_reports()})
@@ -0,0 +1,36 @@
+"""
+API docs, loaded on the first docs request instead of at startup.
+
+drf_yasg and the openapi objects describing every view take a noticeable share of a worker's startup time. Views
+declare their schema with `lazy_swagger_auto_schema('<module>.<name>')`, the dotted path of the keyword arguments for
+drf_yasg's `swagger_auto_schema`, and the docs views below import everything when they are first served.
+"""
+from functools import cache
+
+
+def lazy_swagger_auto_schema(path):
+    """Like `swagger_auto_schema(**kwargs)`, with `kwargs` imported from `path` when the docs are generated."""
+    def decorator(view_method):
+        view_method._lazy_swagger_auto_schema = path
+        return view_method
+    return decorator
+
+
+@cache
+def docs_view(renderer=None):
+    from .swagger import schema_view
+    if renderer is None:
+        return schema_view.without_ui(cache_timeout=0)
+    return schema_view.with_ui(renderer, cache_timeout=0)
+
+
+def schema(request, format):
+    return docs_view()(request, format=format)
+
+
+def swagger_ui(request):
+    return docs_view('swagger')(request)
+
+
+def redoc(request):
+    return docs_view('redoc')(request)
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+import socket
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+ENABLED_KEY = 'memory-profiling:enabled'
+REPORTS_KEY = 'memory-profiling:reports'
+
+# Allocations made by the profiler itself and by imports are noise in a leak hunt
+SNAPSHOT_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+class WorkerState:
+    """Per process tracing state, synced with the flag in Redis at most every MEMORY_PROFILING_CHECK_INTERVAL."""
+
+    def __init__(self):
+        self.enabled = False
+        self.checked_at = float('-inf')
+        self.baseline = None
+        self.snapshot_at = float('-inf')
+
+
+state = WorkerState()
+
+
+def worker_name():
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+def set_enabled(enabled):
+    """Turn tracing on or off in every worker, within MEMORY_PROFILING_CHECK_INTERVAL."""
+    cache.set(ENABLED_KEY, enabled, None)
+    if not enabled:
+        get_redis_connection('default').delete(REPORTS_KEY)
+
+
+def sync():
+    """
+    Start or stop tracing to follow the runtime flag, and take a snapshot when one is due.
+
+    Called on every request and after every Celery task, so snapshots are only as periodic as the traffic.
+    """
+    now = time.monotonic()
+    if now - state.checked_at >= settings.MEMORY_PROFILING_CHECK_INTERVAL:
+        state.checked_at = now
+        try:
+            enabled = bool(cache.get(ENABLED_KEY, False))
+        except RedisError as e:
+            logger.error('Error while reading the memory profiling flag', exc_info=e)
+            enabled = state.enabled
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start(settings.MEMORY_PROFILING_FRAMES)
+            state.baseline = None
+            state.snapshot_at = float('-inf')
+        elif not enabled and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            state.baseline = None
+        state.enabled = enabled
+
+    if state.enabled and now - state.snapshot_at >= settings.MEMORY_PROFILING_SNAPSHOT_INTERVAL:
+        state.snapshot_at = now
+        take_snapshot()
+
+
+def take_snapshot():
+    """Diff a new snapshot against the first one taken since tracing started, and publish the top growth sites."""
+    snapshot = tracemalloc.take_snapshot().filter_traces(SNAPSHOT_FILTERS)
+    if state.baseline is None:
+        state.baseline = snapshot
+    current, peak = tracemalloc.get_traced_memory()
+    report = {
+        'taken_at': time.time(),
+        'traced_bytes': current,
+        'peak_bytes': peak,
+        'top_growth': [
+            {
+                'site': ' <- '.join(f'{frame.filename}:{frame.lineno}' for frame in stat.traceback),
+                'size_diff': stat.size_diff,
+                'size': stat.size,
+                'count_diff': stat.count_diff,
+            }
+            for stat in snapshot.compare_to(state.baseline, 'traceback')[:settings.MEMORY_PROFILING_TOP]
+        ],
+    }
+    try:
+        pipe = get_redis_connection('default').pipeline()
+        pipe.hset(REPORTS_KEY, worker_name(), json.dumps(report))
+        # Reports of workers that exited disappear once nobody is snapshotting
+        pipe.expire(REPORTS_KEY, max(60, settings.MEMORY_PROFILING_SNAPSHOT_INTERVAL * 10))
+        pipe.execute()
+    except RedisError as e:
+        logger.error('Error while publishing memory report', exc_info=e)
+    return report
+
+
+def worker_reports():
+    """Return the latest report of every tracing worker, by worker name."""
+    reports = get_redis_connection('default').hgetall(REPORTS_KEY)
+    return {worker.decode(): json.loads(report) for worker, report in reports.items()}
+
+
+def is_enabled():
+    return bool(cache.get(ENABLED_KEY, False))
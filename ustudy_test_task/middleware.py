@@ -0,0 +1,180 @@
+import logging
+import math
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack
+from http import HTTPStatus
+
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from tasks.slow_queries import SlowQueryRecorder
+
+from . import admission, memory, profiling
+from .routers import use_replicas
+
+logger = logging.getLogger(__name__)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Let safe requests read from replicas, except for clients that wrote recently.
+
+    A successful write sets a cookie holding the time until which the client is pinned to the
+    primary, so it always reads its own writes even while the replicas are lagging.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = use_replicas.set(request.method in SAFE_METHODS and not self.is_pinned(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replicas.reset(token)
+
+        # Views whose method doesn't tell whether they wrote, like /batch/, set `pins_primary` on the response
+        if getattr(response, 'pins_primary', request.method not in SAFE_METHODS and response.status_code < 400):
+            response.set_cookie(
+                settings.REPLICA_PIN_COOKIE_NAME,
+                str(time.time() + settings.REPLICA_PIN_SECONDS),
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+    @staticmethod
+    def is_pinned(request):
+        try:
+            pinned_until = float(request.COOKIES.get(settings.REPLICA_PIN_COOKIE_NAME, 0))
+        except ValueError:
+            return False
+        return pinned_until > time.time()
+
+
+class AdmissionControlMiddleware:
+    """
+    Shed load before it piles up behind the workers.
+
+    In order, a request is rejected when:
+    - it already waited longer for a worker than its priority class allows (503)
+    - its user or client address ran out of tokens (429)
+    - its route, or the share of global capacity of its priority class, is full (503)
+
+    State lives in Redis so limits hold across workers. If Redis is unavailable requests are admitted. Batch
+    sub-requests are admitted one by one as well, see ustudy_test_task/batch.py.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.ADMISSION_CONTROL_ENABLED:
+            return self.get_response(request)
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return self.get_response(request)
+
+        priority, _ = admission.route_policy(url_name)
+        queue_budget = settings.ADMISSION_PRIORITY_CLASSES[priority]['queue_budget']
+        delay = admission.queueing_delay(request)
+        if delay > queue_budget:
+            logger.warning(f'Shedding {url_name}: queued for {delay:.2f}s, budget is {queue_budget}s')
+            return self.reject(HTTPStatus.SERVICE_UNAVAILABLE, 'Server is overloaded, retry later.',
+                               settings.ADMISSION_RETRY_AFTER)
+
+        try:
+            with admission.admit(admission.request_identity(request), url_name):
+                return self.get_response(request)
+        except admission.Rejected as e:
+            return self.reject(e.status_code, e.detail, e.retry_after)
+
+    @staticmethod
+    def reject(status_code, detail, retry_after):
+        response = JsonResponse({
+            'status': status_code.phrase,
+            'code': status_code.value,
+            'errors': {'detail': detail},
+        }, status=status_code)
+        response['Retry-After'] = str(math.ceil(retry_after))
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Sample the stacks of 1 in PROFILING_SAMPLE_RATE requests, and of requests with a signed `X-Profile` header.
+
+    Traces are written in collapsed-stack format, tagged with route and latency, see `profile_report`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.PROFILING_ENABLED or not profiling.should_profile(request):
+            return self.get_response(request)
+        try:
+            url_name = resolve(request.path_info).url_name
+        except Resolver404:
+            return self.get_response(request)
+
+        sampler = profiling.StackSampler(threading.get_ident(), settings.PROFILING_INTERVAL).start()
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            latency = time.perf_counter() - started
+            stacks = sampler.stop()
+            try:
+                profiling.write_trace(stacks, url_name, latency)
+            except OSError as e:
+                logger.error('Error while writing profiling trace', exc_info=e)
+
+
+class MemoryProfilingMiddleware:
+    """
+    Keep tracemalloc in sync with the runtime flag, and log requests that allocate more than
+    MEMORY_PROFILING_REQUEST_THRESHOLD bytes while it traces.
+
+    Traced memory is process wide, so concurrent requests in the same worker blur the numbers.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        memory.sync()
+        if not tracemalloc.is_tracing():
+            return self.get_response(request)
+
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        response = self.get_response(request)
+        after, peak = tracemalloc.get_traced_memory()
+        if peak - before > settings.MEMORY_PROFILING_REQUEST_THRESHOLD:
+            logger.warning(f'{request.method} {request.path} allocated {(peak - before) / 2 ** 20:.1f} MiB at peak, '
+                           f'{(after - before) / 2 ** 20:.1f} MiB still allocated')
+        return response
+
+
+class SlowQueryMiddleware:
+    """Record queries slower than SLOW_QUERY_THRESHOLD_MS on any database, with the view that ran them."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.SLOW_QUERY_THRESHOLD_MS:
+            return self.get_response(request)
+        recorder = SlowQueryRecorder(request)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(recorder))
+            return self.get_response(request)
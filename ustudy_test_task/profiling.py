@@ -0,0 +1,124 @@
+import logging
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'X-Profile'
+TOKEN_SALT = 'ustudy_test_task.profiling'
+
+
+class StackSampler:
+    """
+    Sample the call stack of one thread at a fixed interval from a background thread.
+
+    Unlike cProfile this doesn't hook every call, so it barely slows the profiled code down, and every sample
+    is a full stack, which is what flame graph tools expect.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+
+def collapse_stack(frame):
+    """Format a stack as `outermost;...;innermost` function names, the collapsed-stack format."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{frame.f_globals.get("__name__", "?")}.{code.co_qualname}'.replace(';', ':'))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def profile_token():
+    """A signed `X-Profile` header value, valid for PROFILING_TOKEN_MAX_AGE seconds."""
+    return signing.TimestampSigner(salt=TOKEN_SALT).sign('profile')
+
+
+def should_profile(request):
+    """Profile requests carrying a valid signed `X-Profile` header, and a random 1 in PROFILING_SAMPLE_RATE."""
+    token = request.headers.get(PROFILE_HEADER)
+    if token:
+        try:
+            signing.TimestampSigner(salt=TOKEN_SALT).unsign(token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+            return True
+        except signing.BadSignature:
+            logger.warning('Ignoring invalid profiling token')
+    rate = settings.PROFILING_SAMPLE_RATE
+    return rate > 0 and random.randrange(rate) == 0
+
+
+def write_trace(stacks, url_name, latency):
+    """
+    Write a trace as `<epoch ms>-<route>-<latency ms>ms.folded` and drop the oldest beyond PROFILING_MAX_FILES.
+
+    The files load directly into speedscope and flamegraph.pl.
+    """
+    directory = Path(settings.PROFILING_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{time.time_ns() // 1_000_000}-{url_name}-{round(latency * 1000)}ms.folded'
+    path.write_text(''.join(f'{stack} {count}\n' for stack, count in stacks.items()))
+
+    traces = sorted(directory.glob('*.folded'))
+    for old in traces[:max(0, len(traces) - settings.PROFILING_MAX_FILES)]:
+        try:
+            old.unlink()
+        except FileNotFoundError:
+            # Rotated by another worker
+            pass
+    return path
+
+
+def parse_trace_name(path):
+    """Return the route and latency in milliseconds a trace file is tagged with."""
+    _, rest = path.stem.split('-', 1)
+    url_name, latency = rest.rsplit('-', 1)
+    return url_name, int(latency.removesuffix('ms'))
+
+
+def read_trace(path):
+    stacks = Counter()
+    for line in Path(path).read_text().splitlines():
+        stack, _, count = line.rpartition(' ')
+        if stack:
+            stacks[stack] += int(count)
+    return stacks
+
+
+def hot_functions(stacks):
+    """Return the self and total sample count of every function in the stacks."""
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        # Recursive functions count once per sample
+        for frame in set(frames):
+            total[frame] += count
+    return own, total
+
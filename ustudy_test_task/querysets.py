@@ -0,0 +1,31 @@
+import json
+
+from django.db import connections
+
+
+def estimated_count(queryset, exact_below):
+    """
+    Return ``(count, exact)``, using the planner's row estimate instead of ``COUNT(*)`` on PostgreSQL.
+
+    Unfiltered querysets read ``pg_class.reltuples``, filtered ones the row estimate of ``EXPLAIN``. Estimates
+    below ``exact_below`` are cheap to verify, so those are counted exactly.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count(), True
+
+    estimate = -1
+    with connection.cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            # -1 until the table is first vacuumed or analyzed
+            estimate = cursor.fetchone()[0]
+        if estimate < 0:
+            sql, params = queryset.order_by().query.get_compiler(queryset.db).as_sql()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            estimate = (json.loads(plan) if isinstance(plan, str) else plan)[0]['Plan']['Plan Rows']
+
+    if estimate < exact_below:
+        return queryset.count(), True
+    return int(estimate), False
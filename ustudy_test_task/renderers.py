@@ -1,27 +1,74 @@
+import json
 from http import HTTPStatus
-from rest_framework.renderers import JSONRenderer
+
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
 from datetime import datetime
 
-class ApiRenderer(JSONRenderer):
-    def render(self, data, accepted_media_type=None, renderer_context=None):
-        status_code = renderer_context['response'].status_code
+# Formats what the fast codecs can't natively, datetimes included, exactly like DRF's JSONRenderer
+encode_default = JSONEncoder().default
+
+
+class EnvelopeMixin:
+    def envelope(self, data, renderer_context):
+        response = renderer_context['response']
+        status_code = response.status_code
 
         # Handle error responses
         if not str(status_code).startswith('2'):
-            return super(ApiRenderer, self).render({
+            return {
                 "status": HTTPStatus(status_code).phrase,
                 "code": status_code,
                 "errors": data
-            }, accepted_media_type, renderer_context)
+            }
 
         # Handle success responses
-        response = {
+        return {
             "status": HTTPStatus(status_code).phrase,
             "code": status_code,
             "data": data,
             "metadata": {
                 "timestamp": datetime.now().isoformat(),
-                "version": "1.0"
+                "version": "1.0",
+                # Set by views, e.g. list totals
+                **getattr(response, 'metadata', {}),
             }
         }
-        return super(ApiRenderer, self).render(response, accepted_media_type, renderer_context)
\ No newline at end of file
+
+
+class ApiRenderer(EnvelopeMixin, JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return super(ApiRenderer, self).render(self.envelope(data, renderer_context), accepted_media_type,
+                                               renderer_context)
+
+
+class OrjsonApiRenderer(EnvelopeMixin, BaseRenderer):
+    media_type = 'application/json'
+    format = 'json'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Errors of list items are keyed by their index, which JSON writes as a string like the stdlib renderer
+        return orjson.dumps(self.envelope(data, renderer_context), default=encode_default,
+                            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+
+
+class MessagePackApiRenderer(EnvelopeMixin, BaseRenderer):
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return msgpack.packb(self.envelope(data, renderer_context), default=encode_default)
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        # Streams are returned as StreamingHttpResponse, so only errors are rendered here
+        return f'event: error\ndata: {json.dumps(data)}\n\n'.encode()
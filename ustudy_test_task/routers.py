@@ -0,0 +1,53 @@
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+logger = logging.getLogger(__name__)
+
+# Set by ReplicaRoutingMiddleware for the duration of a safe request that is not pinned to the primary.
+use_replicas = ContextVar('use_replicas', default=False)
+
+# alias -> (healthy, checked_at)
+_replica_health = {}
+
+
+def replica_is_healthy(alias):
+    """Check that a replica answers, caching the result for REPLICA_HEALTH_CHECK_INTERVAL seconds."""
+    healthy, checked_at = _replica_health.get(alias, (None, 0))
+    if healthy is not None and time.monotonic() - checked_at < settings.REPLICA_HEALTH_CHECK_INTERVAL:
+        return healthy
+
+    try:
+        with connections[alias].cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except DatabaseError as e:
+        logger.warning(f'Replica {alias} is unhealthy, falling back to primary: {e}')
+        healthy = False
+    _replica_health[alias] = (healthy, time.monotonic())
+    return healthy
+
+
+class ReplicaRouter:
+    """Send reads of safe, unpinned requests to a healthy replica and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not use_replicas.get():
+            return 'default'
+        replicas = [alias for alias in settings.REPLICA_DATABASES if replica_is_healthy(alias)]
+        if not replicas:
+            return 'default'
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.REPLICA_DATABASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
@@ -0,0 +1,99 @@
+"""
+OpenAPI descriptions of the project level views, imported only when the API docs are generated, see ustudy_test_task/docs.py.
+
+Each is the keyword arguments of drf_yasg's `swagger_auto_schema` for one view method.
+"""
+from drf_yasg import openapi
+
+from .batch import BatchSerializer
+from .diagnostics import MemoryProfilingSerializer
+
+memory_report_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'enabled': openapi.Schema(type=openapi.TYPE_BOOLEAN),
+        'workers': openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            description='Latest report of every tracing worker: traced and peak bytes, and the allocation sites '
+                        'that grew most since tracing started',
+        ),
+    }
+)
+
+
+batch_post = dict(
+    tags=['Batch'],
+    operation_id='Batch requests',
+    operation_description='Run several API calls in one round trip, authenticated once. Read-only batches run '
+                          'concurrently, batches with writes run in order. With atomic, all sub-requests run in '
+                          'one transaction which is rolled back if any of them fails.',
+    request_body=BatchSerializer,
+    responses={
+        200: openapi.Response('Sub-request results in request order', openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'status': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'data': openapi.Schema(type=openapi.TYPE_OBJECT),
+                }
+            )
+        )),
+        400: openapi.Response('Validation error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+            }
+        )),
+        401: openapi.Response('Unauthorized', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='Authentication credentials were not provided.')
+            }
+        )),
+    }
+)
+
+
+memory_profiling_get = dict(
+    tags=['Diagnostics'],
+    operation_id='Memory growth report',
+    operation_description='Staff only. Per worker, the allocation sites that grew most between the first '
+                          'tracemalloc snapshot and the latest one.',
+    responses={
+        200: openapi.Response('Memory growth per worker', memory_report_schema),
+        403: openapi.Response('Forbidden', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='You do not have permission to perform this action.')
+            }
+        )),
+    }
+)
+
+
+memory_profiling_post = dict(
+    tags=['Diagnostics'],
+    operation_id='Toggle memory profiling',
+    operation_description='Staff only. Turn tracemalloc on or off in all web and Celery workers without a '
+                          'restart. Turning it off drops the reports.',
+    request_body=MemoryProfilingSerializer,
+    responses={
+        200: openapi.Response('Memory growth per worker', memory_report_schema),
+        400: openapi.Response('Validation error', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING, description='Validation error')
+            }
+        )),
+        403: openapi.Response('Forbidden', openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'detail': openapi.Schema(type=openapi.TYPE_STRING,
+                                         description='You do not have permission to perform this action.')
+            }
+        )),
+    }
+)
@@ -28,6 +28,7 @@ SYSTEM_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
 ]
 
 THIRD_PARTY_APPS = [
@@ -47,6 +48,10 @@ INSTALLED_APPS = SYSTEM_APPS + THIRD_PARTY_APPS + LOCAL_APPS
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'ustudy_test_task.middleware.AdmissionControlMiddleware',
+    'ustudy_test_task.middleware.ProfilingMiddleware',
+    'ustudy_test_task.middleware.MemoryProfilingMiddleware',
+    'ustudy_test_task.middleware.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     "whitenoise.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -55,6 +60,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'ustudy_test_task.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'ustudy_test_task.urls'
@@ -62,7 +68,7 @@ ROOT_URLCONF = 'ustudy_test_task.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -80,24 +86,50 @@ WSGI_APPLICATION = 'ustudy_test_task.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+DB_PREPARE_THRESHOLD = os.getenv('DB_PREPARE_THRESHOLD', '5')
+DB_PREPARE_THRESHOLD = None if DB_PREPARE_THRESHOLD == 'None' else int(DB_PREPARE_THRESHOLD)
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': os.getenv('DB_NAME'),
         'USER': os.getenv('DB_USER'),
         'PASSWORD': os.getenv('DB_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
         'PORT': os.getenv('DB_PORT'),
+        # Large task lists are iterated with named cursors, which pgbouncer in transaction mode doesn't support
+        'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS', 'False') == 'True',
         "OPTIONS": {
+            # psycopg 3 sends parameters separately from the SQL, so a query executed `prepare_threshold` times on a
+            # connection is prepared on the server and no longer parsed and planned per request. Pooled connections
+            # keep their prepared statements. Behind pgbouncer in transaction mode set DB_PREPARE_THRESHOLD=None.
+            "server_side_binding": True,
+            "prepare_threshold": DB_PREPARE_THRESHOLD,
+            # Per process, one connection per thread running queries. A Uvicorn worker runs every concurrent
+            # request on its own thread and holds its connection until the response, so size max_size to the
+            # requests in flight per worker + BATCH_MAX_WORKERS + 1 for the slow query recorder. Requests beyond it
+            # wait up to `timeout` for a connection. See "Database" in the README.
             "pool": {
-                "min_size": 4,
-                "max_size": 50,
+                "min_size": int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                "max_size": int(os.getenv('DB_POOL_MAX_SIZE', 8)),
                 "timeout": 10,
             }
         },
     }
 }
 
+# Read replicas share the primary's credentials, e.g. DB_REPLICA_HOSTS=db-replica-1,db-replica-2
+for index, host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica_{index}'] = {**DATABASES['default'], 'HOST': host.strip()}
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias.startswith('replica_')]
+DATABASE_ROUTERS = ['ustudy_test_task.routers.ReplicaRouter']
+
+# Clients that wrote within this many seconds read from the primary
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 10))
+REPLICA_PIN_COOKIE_NAME = 'replica_pin'
+REPLICA_HEALTH_CHECK_INTERVAL = int(os.getenv('REPLICA_HEALTH_CHECK_INTERVAL', 5))
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -151,15 +183,38 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ),
     'DEFAULT_RENDERER_CLASSES': (
-        'ustudy_test_task.renderers.ApiRenderer',
+        'ustudy_test_task.renderers.OrjsonApiRenderer',
+        'ustudy_test_task.renderers.MessagePackApiRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'ustudy_test_task.parsers.OrjsonParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ),
 }
 
+# Bloom filter of taken usernames in Redis, see users/availability.py. Sized for this many users, beyond which false
+# positives, answered by the database, grow more common. Changing either takes effect after rebuild_username_filter.
+USERNAME_FILTER_CAPACITY = int(os.getenv('USERNAME_FILTER_CAPACITY', 1000000))
+USERNAME_FILTER_ERROR_RATE = float(os.getenv('USERNAME_FILTER_ERROR_RATE', 0.01))
+# A rebuild adds users who joined this long before it started once it's done, as a registration that was still
+# uncommitted may have been missed by the scan. Must cover the longest registration transaction.
+USERNAME_FILTER_REBUILD_OVERLAP_SECONDS = 60
+
+# A single sliding token, extended through /users/token/refresh/, instead of access and refresh tokens. Sliding tokens
+# are checked against the blacklist in Redis on every request, see users/tokens.py.
+JWT_SLIDING_TOKENS = os.getenv('JWT_SLIDING_TOKENS', 'False') == 'True'
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('ACCESS_TOKEN_LIFETIME', 5))),
     'REFRESH_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('REFRESH_TOKEN_LIFETIME', 30))),
-    'ROTATE_REFRESH_TOKENS': False,
+    'ROTATE_REFRESH_TOKENS': os.getenv('ROTATE_REFRESH_TOKENS', 'True') == 'True',
     'BLACKLIST_AFTER_ROTATION': True,
+    'SLIDING_TOKEN_LIFETIME': timedelta(minutes=int(os.getenv('SLIDING_TOKEN_LIFETIME', 5))),
+    'SLIDING_TOKEN_REFRESH_LIFETIME': timedelta(minutes=int(os.getenv('SLIDING_TOKEN_REFRESH_LIFETIME', 30))),
+    'AUTH_TOKEN_CLASSES': ('users.tokens.SlidingToken',) if JWT_SLIDING_TOKENS else (
+        'rest_framework_simplejwt.tokens.AccessToken',
+    ),
 }
 
 SWAGGER_SETTINGS = {
@@ -217,20 +272,120 @@ LOGGING = {
 }
 
 
+REDIS_URL = os.getenv('REDIS_URL', f'redis://{os.getenv("REDIS_HOST")}:{os.getenv("REDIS_PORT")}/1')
+
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
-        "LOCATION": os.getenv('REDIS_URL',
-                              f'redis://{os.getenv("REDIS_HOST")}:{os.getenv("REDIS_PORT")}/1'),
+        "LOCATION": REDIS_URL,
         "OPTIONS": {
             "CLIENT_CLASS": "django_redis.client.DefaultClient",
         }
     }
 }
 
+# Admission control, see ustudy_test_task/middleware.py. The proxy should send the time it received the request,
+# e.g. nginx `proxy_set_header X-Request-Start "t=${msec}";`, so that queueing delay can be measured.
+ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'False') == 'True'
+# Requests in flight across all workers. Lower priority classes may only fill a share of it and give up sooner.
+ADMISSION_MAX_CONCURRENCY = int(os.getenv('ADMISSION_MAX_CONCURRENCY', 30))
+ADMISSION_PRIORITY_CLASSES = {
+    'high': {'capacity': 1.0, 'queue_budget': 2.0},
+    'normal': {'capacity': 0.8, 'queue_budget': 1.0},
+    'low': {'capacity': 0.5, 'queue_budget': 0.25},
+}
+ADMISSION_DEFAULT_PRIORITY = 'normal'
+# URL name -> priority class and optional limit of concurrent requests
+ADMISSION_ROUTES = {
+    'task-detail': {'priority': 'high'},
+    'admin-task-list': {'priority': 'low', 'concurrency': int(os.getenv('ADMISSION_ADMIN_LIST_CONCURRENCY', 4))},
+    'login': {'priority': 'low', 'concurrency': int(os.getenv('ADMISSION_LOGIN_CONCURRENCY', 6))},
+}
+# Token bucket per user (or client address when anonymous)
+ADMISSION_USER_RATE = float(os.getenv('ADMISSION_USER_RATE', 10))
+ADMISSION_USER_BURST = int(os.getenv('ADMISSION_USER_BURST', 40))
+# Proxies in front of the app that append to X-Forwarded-For. The client address is the entry the outermost of them
+# added, counting from the right, entries to its left come from the client and can't be trusted. 0 uses REMOTE_ADDR.
+TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', 0))
+ADMISSION_RETRY_AFTER = 1
+ADMISSION_SLOT_TIMEOUT = 60
+
+# Sampling profiler, see ustudy_test_task/profiling.py. Requests with a signed `X-Profile` header are always
+# profiled, others with a 1 in PROFILING_SAMPLE_RATE chance (0 turns sampling off).
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = int(os.getenv('PROFILING_SAMPLE_RATE', 1000))
+PROFILING_INTERVAL = float(os.getenv('PROFILING_INTERVAL', 0.005))
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'logs/profiles'))
+PROFILING_MAX_FILES = int(os.getenv('PROFILING_MAX_FILES', 500))
+PROFILING_TOKEN_MAX_AGE = 3600
+
+# tracemalloc diagnostics, turned on and off at runtime through /diagnostics/memory/, see ustudy_test_task/memory.py
+MEMORY_PROFILING_CHECK_INTERVAL = 5
+MEMORY_PROFILING_SNAPSHOT_INTERVAL = int(os.getenv('MEMORY_PROFILING_SNAPSHOT_INTERVAL', 300))
+MEMORY_PROFILING_FRAMES = int(os.getenv('MEMORY_PROFILING_FRAMES', 5))
+MEMORY_PROFILING_TOP = 20
+MEMORY_PROFILING_REQUEST_THRESHOLD = int(os.getenv('MEMORY_PROFILING_REQUEST_THRESHOLD', 10 * 2 ** 20))
+
+# Slow query capture, see tasks/slow_queries.py. 0 turns it off.
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv('SLOW_QUERY_THRESHOLD_MS', 500))
+# EXPLAIN ANALYZE runs a captured SELECT again, at most once per query per interval
+SLOW_QUERY_EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'True') == 'True'
+SLOW_QUERY_EXPLAIN_INTERVAL = 3600
+SLOW_QUERY_EXPLAIN_TIMEOUT_MS = 30000
+SLOW_QUERY_MAX_ROWS = int(os.getenv('SLOW_QUERY_MAX_ROWS', 10000))
+
+# Serialized tasks cached by id, see tasks/cache.py
+TASK_CACHE_TIMEOUT = int(os.getenv('TASK_CACHE_TIMEOUT', 300))
+TASK_MULTI_GET_MAX_IDS = 100
+# Rows fetched per round trip when task lists are streamed from a server-side cursor
+TASK_LIST_CHUNK_SIZE = 2000
+# Levels of subtasks below a top-level task
+TASK_MAX_DEPTH = 50
+# Tags a task can have
+TASK_MAX_TAGS = 20
+# Tasks one request to the transition endpoint may move at most
+TASK_TRANSITION_MAX_IDS = 1000
+# Occurrences of one recurring task a list expands at most
+TASK_RECURRENCE_MAX_OCCURRENCES = 1000
+# Admin task listings count exactly below this many estimated rows, above it the planner's estimate is returned
+ADMIN_TASK_EXACT_COUNT_THRESHOLD = int(os.getenv('ADMIN_TASK_EXACT_COUNT_THRESHOLD', 10000))
+# Tasks per page of the admin task listing when a page is asked for without ?limit=, and at most with it
+ADMIN_TASK_PAGE_SIZE = int(os.getenv('ADMIN_TASK_PAGE_SIZE', 100))
+ADMIN_TASK_MAX_PAGE_SIZE = 1000
+# Django admin changelists likewise, see ustudy_test_task/admin.py
+ADMIN_EXACT_COUNT_THRESHOLD = int(os.getenv('ADMIN_EXACT_COUNT_THRESHOLD', 10000))
+
+# /batch/ endpoint, see ustudy_test_task/batch.py
+BATCH_MAX_REQUESTS = int(os.getenv('BATCH_MAX_REQUESTS', 20))
+# Threads running the sub-requests of a read-only batch concurrently
+BATCH_MAX_WORKERS = int(os.getenv('BATCH_MAX_WORKERS', 4))
+BATCH_EXCLUDED_URL_NAMES = ['batch', 'task-events']
+
+# Server-Sent Events feed of task changes, see tasks/events.py
+TASK_EVENTS_BUFFER_SIZE = int(os.getenv('TASK_EVENTS_BUFFER_SIZE', 100))
+TASK_EVENTS_KEEPALIVE_SECONDS = int(os.getenv('TASK_EVENTS_KEEPALIVE_SECONDS', 15))
+
 CELERY_BROKER_URL = f'redis://{os.getenv("REDIS_HOST")}:{os.getenv("REDIS_PORT")}/0'
 CELERY_RESULT_BACKEND = f'redis://{os.getenv("REDIS_HOST")}:{os.getenv("REDIS_PORT")}/0'
 CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Tashkent'
+# Periodic tasks are scheduled in ustudy_test_task/celery.py, which web workers don't import
+
+# Deleted task ids are returned by delta sync for this long, older cursors must re-download everything
+TASK_TOMBSTONE_RETENTION_DAYS = int(os.getenv('TASK_TOMBSTONE_RETENTION_DAYS', 30))
+# Delta sync cursors lag this far behind the clock. Rows are stamped when saved, not when committed, so this must cover
+# the longest write transaction, and the replica lag as syncs read from replicas.
+TASK_SYNC_OVERLAP_SECONDS = int(os.getenv('TASK_SYNC_OVERLAP_SECONDS', 60))
+
+# Write-behind ingestion of tasks posted with `Prefer: respond-async`
+TASK_INGEST_BATCH_SIZE = int(os.getenv('TASK_INGEST_BATCH_SIZE', 500))
+TASK_INGEST_DRAIN_SECONDS = 1.5
+# Messages not acknowledged for this long belong to a dead consumer and are delivered again
+TASK_INGEST_CLAIM_IDLE_MS = int(os.getenv('TASK_INGEST_CLAIM_IDLE_MS', 60000))
+TASK_INGEST_STATUS_TTL = int(os.getenv('TASK_INGEST_STATUS_TTL', 86400))
+
+# Overdue sweeper: tasks marked per UPDATE, which bounds how many rows one statement locks, and seconds per run
+OVERDUE_SWEEP_BATCH_SIZE = int(os.getenv('OVERDUE_SWEEP_BATCH_SIZE', 1000))
+OVERDUE_SWEEP_MAX_SECONDS = 50
@@ -0,0 +1,39 @@
+import os
+
+from django.utils.module_loading import import_string
+from drf_yasg import openapi
+from drf_yasg.generators import OpenAPISchemaGenerator
+from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.views import get_schema_view
+from dotenv import load_dotenv
+from rest_framework import permissions
+
+load_dotenv()
+
+
+class LazySchemaGenerator(OpenAPISchemaGenerator):
+    """Applies the schemas declared with `lazy_swagger_auto_schema` before reading a view's overrides."""
+
+    def get_overrides(self, view, method):
+        view_method = getattr(view, getattr(view, 'action', method.lower()), None)
+        path = getattr(view_method, '_lazy_swagger_auto_schema', None)
+        if path is not None and not hasattr(view_method, '_swagger_auto_schema'):
+            swagger_auto_schema(**import_string(path))(view_method.__func__)
+        return super().get_overrides(view, method)
+
+
+# Schema view for API documentation
+schema_view = get_schema_view(
+    openapi.Info(
+        title="Ustudy Test TaskModel API",
+        default_version='v1',
+        description="API for AralHub Restaurant Booking System",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="contact@aralhub.local"),
+        license=openapi.License(name="BSD License"),
+    ),
+    url=os.getenv('DEPLOYMENT_URL'),
+    public=True,
+    permission_classes=(permissions.AllowAny,),
+    generator_class=LazySchemaGenerator,
+)
@@ -0,0 +1,17 @@
+"""Settings for `manage.py test`, the production settings plus the databases the tests need."""
+import os
+from urllib.parse import urlsplit
+
+from .settings import *  # noqa: F403
+
+# A second local database standing in for a read replica. Only tests that list it in `databases` create and use it,
+# and it's left out of REPLICA_DATABASES so that reads go to the primary unless a test routes them to it.
+DATABASES['replica_test'] = {
+    **DATABASES['default'],
+    'TEST': {'NAME': f'test_{DATABASES["default"]["NAME"]}_replica'},
+}
+
+# Tests clear queues, rate limits and caches and rebuild the username filter, so they get a Redis database of their
+# own, by default number 15 on the app's server, instead of the live one.
+REDIS_URL = os.getenv('TEST_REDIS_URL', urlsplit(REDIS_URL)._replace(path='/15').geturl())
+CACHES['default']['LOCATION'] = REDIS_URL